@@ -0,0 +1,97 @@
+"""
+Benchmarks of the PokeData and BattleData hot paths over representative generations.
+Timings and peak memory are compared with the baselines stored in benchmarks/baselines/bench_data.json.
+
+Usage:
+python -m benchmarks.bench_data [--gens 1 4 9] [--repeat 5] [--filter matchup] [--save]
+Exit code is 1 if a benchmark regressed beyond the tolerances of benchmarks/harness.py.
+"""
+import io
+import sys
+import argparse
+import warnings
+import contextlib
+from typing import Callable, Dict, List, Tuple
+from pypkm.data import PokeData
+from pypkm.data.battle_data import BattleData
+from benchmarks.harness import measure, load_baselines, save_baselines, compare, print_results
+
+SUITE = "bench_data"
+GENS = [1, 4, 9]
+
+# Pokemons present in the movesets of every generation
+ATTACKER = "Charizard"
+DEFENDER = "Blastoise"
+# Monotype attacker (no Type2)
+MONOTYPE_ATTACKER = "Pikachu"
+TEAM = ["Venusaur", "Blastoise", "Gyarados", "Snorlax", "Golem", "Starmie", "Dragonite", "Alakazam"]
+
+def benchmarks(gen:int) -> List[Tuple[str, Callable[[], object]]]:
+    """
+    (name, callable) of each benchmark for generation `gen`
+    Inputs are built once here so that only the benchmarked call is measured
+    """
+    data = PokeData(gen = gen)
+    battle = BattleData(data)
+    attacker_base = data.base_stats(ATTACKER)
+    attacker = battle.apply_stats(attacker_base, level = 50).iloc[0]
+    defender = battle.apply_stats(data.base_stats(DEFENDER), level = 50).iloc[0]
+    team = data.pokemons[data.pokemons["Name"].isin(TEAM)]
+    types = [attacker["Type1"], attacker["Type2"]]
+
+    monotype_attacker = battle.apply_stats(data.base_stats(MONOTYPE_ATTACKER), level = 50).iloc[0]
+
+    def find_matchup():
+        # find_matchup prints its result
+        with contextlib.redirect_stdout(io.StringIO()):
+            battle.find_matchup(attacker, team)
+
+    def find_matchup_monotype():
+        with contextlib.redirect_stdout(io.StringIO()):
+            battle.find_matchup(monotype_attacker, team)
+
+    return [
+        ("PokeData", lambda: PokeData(gen = gen)),
+        ("base_stats", lambda: data.base_stats(ATTACKER)),
+        ("pretty_moveset", lambda: data.pretty_moveset(ATTACKER)),
+        ("defensive_matrix", data.defensive_matrix),
+        ("best_against", lambda: data.best_against(types)),
+        ("apply_stats", lambda: battle.apply_stats(attacker_base, nature = "Adamant", level = 50)),
+        ("apply_stats[all]", lambda: battle.apply_stats(data.pokemons, nature = "Adamant", level = 50)),
+        ("matchup", lambda: battle.matchup(attacker, defender)),
+        ("matchup_score", lambda: battle.matchup_score(attacker, defender)),
+        ("find_matchup", find_matchup),
+        ("find_matchup[monotype]", find_matchup_monotype),
+    ]
+
+def run(gens:List[int], repeat:int, name_filter:str = "") -> Dict[str, dict]:
+    results = {}
+    for gen in gens:
+        for name, func in benchmarks(gen):
+            if name_filter not in name:
+                continue
+            results[f"gen{gen}.{name}"] = measure(func, repeat)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gens", type=int, nargs="+", default=GENS, help="Generations to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per benchmark")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baselines")
+    args = parser.parse_args()
+
+    # Silence pandas warnings raised on the benchmarked paths
+    warnings.simplefilter("ignore")
+    results = run(args.gens, args.repeat, args.filter)
+    baselines = load_baselines(SUITE)
+    print_results(results, baselines)
+
+    if args.save:
+        baselines.update(results)
+        save_baselines(SUITE, baselines)
+    else:
+        regressions = compare(results, baselines)
+        if len(regressions) > 0:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
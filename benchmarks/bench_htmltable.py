@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of the html table extraction used by the pokemondb.net spiders.
+Compares `HTMLTable` (one scrapy selector per cell) with `FastHTMLTable` (single lxml XPath pass per table)
+over the html fixtures stored in benchmarks/fixtures.
+
+Usage:
+python -m benchmarks.bench_htmltable [--repeat 20]
+"""
+import os
+import argparse
+import timeit
+from scrapy import Selector
+from pypkm.data.scrapping.utils import HTMLTable, FastHTMLTable
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "fixtures")
+
+# Fixture file -> xpath of the table(s) as queried by the spiders of pokemondatabase.py
+FIXTURES = {
+    "pokemondb_moves_gen1.html": '//*[@id="moves"]',
+    "pokemondb_moveset_charizard_gen9.html": './/*[@class="data-table"]',
+}
+
+def load_fixture(filename:str) -> Selector:
+    with open(os.path.join(FIXTURES_DIR, filename), "r", encoding="utf-8") as f:
+        return Selector(text=f.read())
+
+def extract(table_class, tables) -> list:
+    # Same access pattern as the spiders: one table object per data table, rows as dicts
+    return [table_class(table).as_dicts() for table in tables]
+
+def run(repeat:int = 20) -> dict:
+    results = {}
+    for filename, xpath in FIXTURES.items():
+        tables = load_fixture(filename).xpath(xpath)
+        # Both paths must extract exactly the same rows
+        assert extract(HTMLTable, tables) == extract(FastHTMLTable, tables), f"Extraction mismatch on {filename}"
+        timings = {
+            table_class.__name__: min(timeit.repeat(lambda: extract(table_class, tables), number=1, repeat=repeat))
+            for table_class in [HTMLTable, FastHTMLTable]
+        }
+        results[filename] = timings
+        print(
+            f"{filename:<40} HTMLTable {1000*timings['HTMLTable']:8.2f} ms   "
+            f"FastHTMLTable {1000*timings['FastHTMLTable']:8.2f} ms   "
+            f"x{timings['HTMLTable']/timings['FastHTMLTable']:.1f}"
+        )
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="Number of timed runs, the best one is reported")
+    args = parser.parse_args()
+    run(args.repeat)
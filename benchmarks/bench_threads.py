@@ -0,0 +1,96 @@
+"""
+Multi-threaded throughput of the batched paths: one PokeData/BatchBattle shared by a pool of threads,
+as in the query server. Reports rows (or queries) per second and the speedup over a single thread for each thread count.
+The batch kernels release the GIL in NumPy, so matchup scoring scales with the number of cores;
+queries spend more of their time in Python and scale less.
+
+Before timing, the lazily built tables of a fresh PokeData are requested by all the threads at once
+to check that each of them is built exactly once.
+
+Usage:
+python -m benchmarks.bench_threads [--gen 9] [--threads 1 2 4 8] [--rows 20000] [--tasks 32] [--repeat 3]
+"""
+import os
+import time
+import argparse
+import warnings
+import concurrent.futures
+from typing import Callable, Dict, List
+from pypkm.data import PokeData
+from pypkm.data.batch import BatchBattle
+from pypkm.data.sampler import SetSampler
+
+THREADS = [1, 2, 4, 8]
+
+def check_single_build(gen:int, threads:int) -> None:
+    """
+    Every thread must get the same derived tables when they all ask for them first at the same time
+    """
+    data = PokeData(gen = gen)
+    def first_use(_):
+        enc = data.encoded()
+        return enc, enc.lookup(), enc.damaging_moveset(), enc.moves_by_type(), data.query().index()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(first_use, range(4 * threads)))
+    for k in range(len(results[0])):
+        assert all(r[k] is results[0][k] for r in results), "A lazily built table was built more than once"
+
+def throughput(task:Callable[[int], int], threads:int, tasks:int, repeat:int) -> float:
+    """
+    Best number of items per second processed by `tasks` calls of `task` (returning its number of items) on `threads` threads
+    """
+    best = 0.0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        # Warm up the threads
+        list(executor.map(task, range(threads)))
+        for _ in range(repeat):
+            t = time.perf_counter()
+            items = sum(executor.map(task, range(tasks)))
+            best = max(best, items / (time.perf_counter() - t))
+    return best
+
+def workloads(gen:int, rows:int) -> Dict[str, Callable[[int], int]]:
+    data = PokeData(gen = gen)
+    battle = BatchBattle(data)
+    sampler = SetSampler(data, seed = 0)
+    # One batch of sets per task slot, drawn once so that only the scoring is timed
+    attackers = [sampler.sample(rows) for _ in range(4)]
+    defenders = [sampler.sample(rows) for _ in range(4)]
+    types = data.encoded().types
+
+    def matchup_scores(i:int) -> int:
+        battle.matchup_scores(attackers[i % 4], defenders[i % 4])
+        return rows
+
+    def query(i:int) -> int:
+        data.query().types(types[i % len(types)]).min_stat("Speed", 80, level = 50).available().to_frame(level = 50)
+        return 1
+
+    return {"matchup_scores (rows/s)": matchup_scores, "query (queries/s)": query}
+
+def run(gen:int, thread_counts:List[int], rows:int, tasks:int, repeat:int) -> Dict[str, Dict[int, float]]:
+    check_single_build(gen, max(thread_counts))
+    print(f"{os.cpu_count()} cpus, lazily built tables built once under {max(thread_counts)} concurrent threads")
+    results = {}
+    for name, task in workloads(gen, rows).items():
+        results[name] = {}
+        for threads in thread_counts:
+            results[name][threads] = throughput(task, threads, tasks, repeat)
+            print(
+                f"{name:<26} threads {threads:3d} {results[name][threads]:14.1f}   "
+                f"x{results[name][threads] / results[name][thread_counts[0]]:.2f}"
+            )
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gen", type=int, default=9, help="Generation of the loaded data")
+    parser.add_argument("--threads", type=int, nargs="+", default=THREADS, help="Thread counts to benchmark")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows scored per matchup task")
+    parser.add_argument("--tasks", type=int, default=32, help="Number of tasks per timed run")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs, the best one is reported")
+    args = parser.parse_args()
+
+    # Silence pandas warnings raised on the benchmarked paths
+    warnings.simplefilter("ignore")
+    run(args.gen, args.threads, args.rows, args.tasks, args.repeat)
@@ -0,0 +1,83 @@
+"""
+Minimal benchmark harness: best/median wall time and peak memory of a callable,
+with baselines stored as json in benchmarks/baselines/ to catch regressions.
+"""
+import os
+import gc
+import json
+import time
+import statistics
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "baselines")
+
+# A benchmark is reported as a regression when it is this much slower (or bigger) than its baseline
+TIME_TOLERANCE = 1.5
+MEMORY_TOLERANCE = 1.2
+
+def measure(func:Callable[[], object], repeat:int = 5) -> Dict[str, float]:
+    """
+    Run `func` `repeat` times for timings then once under tracemalloc for the peak memory
+    (tracemalloc slows down allocations, so it is not enabled while timing)
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "time": min(times),
+        "time_median": statistics.median(times),
+        "peak_memory": peak
+    }
+
+def baseline_file(suite:str) -> str:
+    return os.path.join(BASELINES_DIR, f"{suite}.json")
+
+def load_baselines(suite:str) -> Dict[str, dict]:
+    if not os.path.isfile(baseline_file(suite)):
+        return {}
+    with open(baseline_file(suite), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baselines(suite:str, results:Dict[str, dict]) -> None:
+    os.makedirs(BASELINES_DIR, exist_ok=True)
+    with open(baseline_file(suite), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+def compare(results:Dict[str, dict], baselines:Dict[str, dict]) -> List[str]:
+    """
+    Names of the benchmarks slower or bigger than their baseline (beyond tolerances)
+    """
+    regressions = []
+    for name, r in results.items():
+        if name not in baselines:
+            continue
+        b = baselines[name]
+        if r["time"] > TIME_TOLERANCE * b["time"] or r["peak_memory"] > MEMORY_TOLERANCE * b["peak_memory"]:
+            regressions.append(name)
+    return regressions
+
+def _ratio(value:float, baseline:Optional[float]) -> str:
+    return f"x{value / baseline:5.2f}" if baseline else "   new"
+
+def print_results(results:Dict[str, dict], baselines:Dict[str, dict]) -> None:
+    print(f"{'benchmark':<36} {'time (ms)':>10} {'median':>10} {'vs base':>8} {'peak (KiB)':>11} {'vs base':>8}")
+    for name, r in results.items():
+        b = baselines.get(name, {})
+        print(
+            f"{name:<36} {1000*r['time']:10.2f} {1000*r['time_median']:10.2f} {_ratio(r['time'], b.get('time')):>8} "
+            f"{r['peak_memory']/1024:11.1f} {_ratio(r['peak_memory'], b.get('peak_memory')):>8}"
+        )
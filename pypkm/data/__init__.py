@@ -13,4 +13,10 @@ from .scrapping.pokemondatabase import (
     natures_file
 )
 
+from .scrapping.manifest import (
+    DATA_DIR,
+    manifest_file,
+    read_manifest
+)
+
 from .pokemon_data import PokeData
\ No newline at end of file
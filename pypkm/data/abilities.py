@@ -0,0 +1,133 @@
+"""
+Abilities that change type effectiveness or STAB, and the pokemon -> possible abilities index.
+
+Only the abilities whose effect only depends on the move type and on the pokemon holding them are listed,
+so that they can be folded into per-(pokemon, ability) defensive and offensive vectors (see `pypkm.data.encoded`).
+Abilities depending on both sides of a pair (Tinted Lens, Scrappy, Mold Breaker...) are not modeled.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union
+from pypkm.data.schema import TYPES
+
+# Placeholder of the scrapped table for a missing ability
+NO_ABILITY_NAME = "—"
+# Abilities were introduced in generation 3, hidden abilities in generation 5
+FIRST_ABILITY_GEN = 3
+FIRST_HIDDEN_ABILITY_GEN = 5
+
+# Defensive multiplier applied to the type factor of some attack types
+DEFENSE_TYPE_MULTIPLIERS: Dict[str, Dict[str, float]] = {
+    "Levitate": {"Ground": 0.0},
+    "Earth Eater": {"Ground": 0.0},
+    "Flash Fire": {"Fire": 0.0},
+    "Well-Baked Body": {"Fire": 0.0},
+    "Water Absorb": {"Water": 0.0},
+    "Storm Drain": {"Water": 0.0},
+    "Dry Skin": {"Water": 0.0, "Fire": 1.25},
+    "Volt Absorb": {"Electric": 0.0},
+    "Lightning Rod": {"Electric": 0.0},
+    "Motor Drive": {"Electric": 0.0},
+    "Sap Sipper": {"Grass": 0.0},
+    "Thick Fat": {"Fire": 0.5, "Ice": 0.5},
+    "Heatproof": {"Fire": 0.5},
+    "Water Bubble": {"Fire": 0.5},
+    "Purifying Salt": {"Ghost": 0.5},
+}
+
+# Defensive multiplier applied to super effective attack types
+SUPER_EFFECTIVE_MULTIPLIERS: Dict[str, float] = {
+    "Filter": 0.75,
+    "Solid Rock": 0.75,
+    "Prism Armor": 0.75,
+}
+
+# Only super effective attack types hit
+SUPER_EFFECTIVE_ONLY: List[str] = ["Wonder Guard"]
+
+# STAB factor when different from the default 1.5
+STAB_FACTORS: Dict[str, float] = {
+    "Adaptability": 2.0,
+}
+DEFAULT_STAB = 1.5
+# STAB factor of moves of the Tera type when it is also one of the original types.
+# Once terastallized, a STAB ability only applies to the Tera type: the other original types fall back to DEFAULT_STAB
+# (ex: an Adaptability Dragon pokemon terastallized Fire gets 2.0 on Fire moves and 1.5 on Dragon moves)
+TERA_STAB_FACTORS: Dict[str, float] = {
+    "Adaptability": 2.25,
+}
+DEFAULT_TERA_STAB = 2.0
+
+# Offensive multiplier applied to moves of some types
+OFFENSE_TYPE_MULTIPLIERS: Dict[str, Dict[str, float]] = {
+    "Steelworker": {"Steel": 1.5},
+    "Dragon's Maw": {"Dragon": 1.5},
+    "Transistor": {"Electric": 1.3},
+    "Rocky Payload": {"Rock": 1.5},
+}
+
+def pokemon_abilities(abilities:pd.DataFrame, gen:Union[int, str] = "all") -> Dict[str, List[str]]:
+    """
+    Possible abilities of each pokemon (main, second and hidden, in this order) from the abilities table
+    (one row per (ability, pokemon) with the pokemon's other abilities) in generation `gen`:
+    none before FIRST_ABILITY_GEN, no hidden ability before FIRST_HIDDEN_ABILITY_GEN.
+    The table is the one of the latest generation, abilities are not otherwise restricted by generation.
+    """
+    try:
+        gen = int(gen)
+    except (TypeError, ValueError):
+        gen = None
+    if gen is not None and gen < FIRST_ABILITY_GEN:
+        return {}
+    columns = ["Ability", "Second ability"]
+    if gen is None or gen >= FIRST_HIDDEN_ABILITY_GEN:
+        columns.append("Hidden ability")
+    index: Dict[str, List[str]] = {}
+    for column in columns:
+        pairs = pd.DataFrame({
+            "Pokemon": abilities["Pokemon"].astype("object"),
+            "Ability": abilities[column].astype("object")
+        }).dropna()
+        for pokemon, ability in zip(pairs["Pokemon"].str.strip(), pairs["Ability"].str.strip()):
+            if ability == NO_ABILITY_NAME or ability == "":
+                continue
+            known = index.setdefault(pokemon, [])
+            if ability not in known:
+                known.append(ability)
+    return index
+
+def defensive_vector(defensive:np.ndarray, ability:str) -> np.ndarray:
+    """
+    Type factors of each attack type (in the order of TYPES, last axis) against a pokemon with the type factors `defensive`
+    and the ability `ability`
+    """
+    vector = defensive.copy()
+    for t, m in DEFENSE_TYPE_MULTIPLIERS.get(ability, {}).items():
+        vector[..., TYPES.index(t)] *= m
+    if ability in SUPER_EFFECTIVE_MULTIPLIERS:
+        vector = np.where(vector > 1.0, vector * SUPER_EFFECTIVE_MULTIPLIERS[ability], vector)
+    if ability in SUPER_EFFECTIVE_ONLY:
+        vector = np.where(vector > 1.0, vector, 0.0)
+    return vector
+
+def offensive_vector(type1:int, type2:int, ability:Optional[str], tera:Optional[int] = None) -> np.ndarray:
+    """
+    STAB times the ability multiplier of each move type (in the order of TYPES) for a pokemon of type ids
+    `type1` and `type2` (negative if monotype) with the ability `ability` (no ability effect if None),
+    terastallized into the type id `tera` if given (original types keep the default STAB, see TERA_STAB_FACTORS)
+    """
+    vector = np.ones(len(TYPES))
+    stab = STAB_FACTORS.get(ability, DEFAULT_STAB)
+    vector[type1] = stab
+    if type2 >= 0:
+        vector[type2] = stab
+    if tera is not None:
+        own = tera == type1 or tera == type2
+        # The STAB ability only applies to the Tera type
+        vector[type1] = DEFAULT_STAB
+        if type2 >= 0:
+            vector[type2] = DEFAULT_STAB
+        vector[tera] = TERA_STAB_FACTORS.get(ability, DEFAULT_TERA_STAB) if own else stab
+    for t, m in OFFENSE_TYPE_MULTIPLIERS.get(ability, {}).items():
+        vector[TYPES.index(t)] *= m
+    return vector
@@ -0,0 +1,335 @@
+"""
+Batched (vectorized) versions of BattleData.apply_stats, BattleData.matchup and BattleData.matchup_score.
+They work on the integer-coded arrays of PokeData.encoded() and score many (attacker, defender) pairs at once,
+giving the same numbers as the DataFrame based paths.
+
+The kernels are made of NumPy calls that release the GIL (ufuncs, fancy indexing, bincount), so long batches
+can be split in chunks scored by several threads (see `map_chunks`) sharing the same read-only tables.
+
+A pokemon "set" is described as in the query service:
+{"pokemon": "Garchomp", "nature": "Adamant", "level": 50, "IVs": {"Attack": 31}, "EVs": {"Attack": 252}}
+with an optional "ability" (ex: "Rough Skin"). Without one, abilities are ignored, as in BattleData.
+"""
+import numpy as np
+import concurrent.futures
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from pypkm.data import PokeData
+from pypkm.data.schema import STATS
+from pypkm.data.encoded import EncodedTables, PHYSICAL, SPECIAL
+from pypkm.data.type_charts import ERAS
+
+STAT_IDS = {stat: i for i, stat in enumerate(STATS)}
+HP, ATTACK, DEFENSE, SP_ATK, SP_DEF, SPEED = range(len(STATS))
+
+# Stat stages -6..+6, a stage multiplies the stat by STAGE_NUMERATORS / STAGE_DENOMINATORS (rounded down)
+STAGES = np.arange(-6, 7)
+STAGE_NUMERATORS = np.maximum(2, 2 + STAGES).astype(np.float64)
+STAGE_DENOMINATORS = np.maximum(2, 2 - STAGES).astype(np.float64)
+STAGE_MULTIPLIERS = STAGE_NUMERATORS / STAGE_DENOMINATORS
+
+class PokemonSets(object):
+    """
+    A batch of pokemon sets as arrays:
+    `ids` (n,) pokemon ids, `natures` (n,) nature ids, `levels` (n,), `IVs` and `EVs` (n, 6) in the order of STATS,
+    `rows` (n,) rows of EncodedTables.defensive_sets/offensive_sets of the (pokemon, ability) (`ids` if abilities are ignored)
+    """
+    def __init__(self, ids:np.ndarray, natures:np.ndarray, levels:np.ndarray, IVs:np.ndarray, EVs:np.ndarray, rows:Optional[np.ndarray] = None) -> None:
+        self.ids = ids
+        self.natures = natures
+        self.levels = levels
+        self.IVs = IVs
+        self.EVs = EVs
+        self.rows = ids if rows is None else rows
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, rows) -> "PokemonSets":
+        return PokemonSets(self.ids[rows], self.natures[rows], self.levels[rows], self.IVs[rows], self.EVs[rows], self.rows[rows])
+
+def encode_sets(enc:EncodedTables, sets:List[dict]) -> PokemonSets:
+    """
+    Encode a list of set dictionaries, missing fields default as in BattleData.apply_stats
+    (Hardy nature, level 100, no IVs nor EVs) and no ability effect
+    """
+    n = len(sets)
+    ids = np.empty(n, dtype=np.int32)
+    rows = np.empty(n, dtype=np.int32)
+    natures = np.empty(n, dtype=np.int16)
+    levels = np.empty(n, dtype=np.int16)
+    IVs = np.zeros((n, len(STATS)), dtype=np.int16)
+    EVs = np.zeros((n, len(STATS)), dtype=np.int16)
+    for i, s in enumerate(sets):
+        ids[i] = enc.pokemon_id(s["pokemon"])
+        rows[i] = enc.set_row(ids[i], s.get("ability"))
+        natures[i] = enc.nature_id(s.get("nature", "Hardy"))
+        levels[i] = s.get("level", 100)
+        for stat, v in s.get("IVs", {}).items():
+            IVs[i, STAT_IDS[stat]] = v
+        for stat, v in s.get("EVs", {}).items():
+            EVs[i, STAT_IDS[stat]] = v
+    return PokemonSets(ids, natures, levels, IVs, EVs, rows)
+
+def compute_stats(base:np.ndarray, bonus:np.ndarray, levels:np.ndarray, IVs:np.ndarray, EVs:np.ndarray) -> np.ndarray:
+    """
+    Vectorized BattleData.apply_stats: (n, 6) stats from (n, 6) base stats, nature bonuses, IVs and EVs and (n,) levels
+    """
+    level = levels.astype(np.float64)[:, None]
+    num = (2 * base.astype(np.int64) + IVs + np.floor(EVs / 4)) * level
+    stats = np.floor((np.floor(num / 100) + 5) * bonus)
+    # HP does not depend on the nature
+    stats[:, HP] = np.floor(num[:, HP] / 100) + level[:, 0] + 10
+    return stats
+
+def staged(stats:np.ndarray, stages:np.ndarray) -> np.ndarray:
+    """
+    Stats after stat stages: `stages` (in -6..+6) is broadcast against `stats`
+    The division is exact, so that e.g. 150 at -1 gives 100 and not 99
+    """
+    i = np.asarray(stages) + 6
+    return np.floor(stats * STAGE_NUMERATORS[i] / STAGE_DENOMINATORS[i])
+
+def staged_stats(stats:np.ndarray, stages:Optional[np.ndarray]) -> np.ndarray:
+    """
+    (n, 6) stats after the (n, 6) (or (6,)) stages in the order of STATS, HP is never staged
+    """
+    if stages is None:
+        return stats
+    boosted = staged(stats, stages)
+    boosted[..., HP] = stats[..., HP]
+    return boosted
+
+def entry_scores(pair:np.ndarray, damage_pct:np.ndarray, n:int) -> np.ndarray:
+    """
+    (n,) one-sided scores from the (pair, damage_pct) entries of BatchBattle.damage
+    """
+    valid = ~np.isnan(damage_pct)
+    total = np.bincount(pair[valid], weights=damage_pct[valid], minlength=n)
+    count = np.bincount(pair[valid], minlength=n)
+    kills = np.bincount(pair[valid], weights=damage_pct[valid] >= 100, minlength=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (1 + kills) * (total / count)
+
+def map_chunks(func:Callable[[slice], np.ndarray], n:int, threads:int = 1, chunk_size:int = 50000) -> np.ndarray:
+    """
+    Concatenation of `func(rows)` over the slices of `chunk_size` rows of range(n), computed by `threads` threads
+    """
+    chunks = [slice(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    if threads <= 1 or len(chunks) <= 1:
+        results = [func(rows) for rows in chunks]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix="pypkm-batch") as executor:
+            results = list(executor.map(func, chunks))
+    return np.concatenate(results) if len(results) > 0 else func(slice(0, 0))
+
+class BatchBattle(object):
+    """
+    Batched damage and matchup scores over the encoded tables of a PokeData
+    (or directly over EncodedTables, ex: attached from shared memory with `pypkm.data.shared.attach`)
+    """
+    def __init__(self, data:Union[PokeData, EncodedTables]) -> None:
+        if isinstance(data, EncodedTables):
+            self.data = None
+            self.enc = data
+        else:
+            self.data = data
+            self.enc = data.encoded()
+
+    def encode_sets(self, sets:List[dict]) -> PokemonSets:
+        return encode_sets(self.enc, sets)
+
+    def stats(self, sets:PokemonSets) -> np.ndarray:
+        """
+        (n, 6) stats of the sets, same values as BattleData.apply_stats
+        """
+        return compute_stats(self.enc.stats[sets.ids], self.enc.nature_bonus[sets.natures], sets.levels, sets.IVs, sets.EVs)
+
+    def _moveset_entries(self, atk_ids:np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # (pair, move) of each (row, damaging move of the attacker's moveset)
+        indptr, indices = self.enc.damaging_moveset()
+        starts = indptr[atk_ids]
+        counts = indptr[atk_ids + 1] - starts
+        pair = np.repeat(np.arange(len(atk_ids)), counts)
+        # Position of each entry inside the moveset of its attacker.
+        # Only the first np.repeat holds the GIL, the per-row values are gathered with fancy indexing, which releases it
+        offsets = np.arange(len(pair)) - (np.cumsum(counts) - counts)[pair]
+        return pair, indices[starts[pair] + offsets]
+
+    def _attack_defense(self, pair:np.ndarray, move:np.ndarray, atk_stats:np.ndarray, def_stats:np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Attacking and defending stat of each entry (0 for moves that are neither physical nor special)
+        category = self.enc.move_category[move]
+        physical = category == PHYSICAL
+        special = category == SPECIAL
+        # Gather the 4 used stat columns rather than whole (entries, 6) rows
+        A = atk_stats[:, ATTACK][pair] * physical + atk_stats[:, SP_ATK][pair] * special
+        D = def_stats[:, DEFENSE][pair] * physical + def_stats[:, SP_DEF][pair] * special
+        return A, D
+
+    def _base(self, level:np.ndarray, move:np.ndarray, A:np.ndarray, D:np.ndarray) -> np.ndarray:
+        # Same formula (and operation order) as `damage` in BattleData.matchup, before modifiers
+        with np.errstate(divide="ignore", invalid="ignore"):
+            num = (((2 * level) / 5) + 2) * self.enc.move_power[move] * (A / D)
+            return (num / 50) + 2
+
+    def entries(
+        self, atk_ids:np.ndarray, atk_stats:np.ndarray, atk_levels:np.ndarray, def_stats:np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        One entry per (row, damaging move of the attacker's moveset), like the rows of BattleData.matchup.
+        Return flat arrays (pair, move, base) where base is the damage before modifiers, ((num / 50) + 2) in BattleData.matchup
+        (NaN for moves that are neither physical nor special).
+        """
+        pair, move = self._moveset_entries(atk_ids)
+        A, D = self._attack_defense(pair, move, atk_stats, def_stats)
+        return pair, move, self._base(atk_levels[pair].astype(np.float64), move, A, D)
+
+    def damage(
+        self,
+        atk_ids:np.ndarray, atk_stats:np.ndarray, atk_levels:np.ndarray,
+        def_ids:np.ndarray, def_stats:np.ndarray,
+        atk_rows:Optional[np.ndarray] = None, def_rows:Optional[np.ndarray] = None,
+        atk_stages:Optional[np.ndarray] = None, def_stages:Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Damage of every damaging move of each attacker against the defender of the same row.
+        Return flat arrays (pair, move, damage, damage_pct), one entry per (row, move of the attacker's moveset),
+        like the rows of BattleData.matchup. Damage is NaN for moves that are neither physical nor special.
+        `atk_rows`/`def_rows` select the (pokemon, ability) vectors (see PokemonSets.rows), abilities are ignored if not given.
+        `atk_stages`/`def_stages` are (n, 6) (or (6,)) stat stages of the attackers/defenders (see `staged_stats`).
+        """
+        enc = self.enc
+        pair, move, base = self.entries(atk_ids, staged_stats(atk_stats, atk_stages), atk_levels, staged_stats(def_stats, def_stages))
+        # Abilities are folded in the precomputed vectors, STAB included
+        atk_rows = atk_ids if atk_rows is None else atk_rows
+        def_rows = def_ids if def_rows is None else def_rows
+        move_type = enc.move_type[move]
+        type_factor = enc.defensive_sets[def_rows[pair], move_type]
+        stab = enc.offensive_sets[atk_rows[pair], move_type]
+        with np.errstate(invalid="ignore"):
+            damage = np.floor(base * stab * type_factor)
+            damage_pct = 100.0 * (damage / def_stats[:, HP][pair])
+        return pair, move, damage, damage_pct
+
+    def scores(
+        self,
+        atk_ids:np.ndarray, atk_stats:np.ndarray, atk_levels:np.ndarray,
+        def_ids:np.ndarray, def_stats:np.ndarray,
+        atk_rows:Optional[np.ndarray] = None, def_rows:Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        One-sided score of each row, as in BattleData.matchup_score:
+        (1 + number of moves dealing 100% or more) * mean damage (%) of the attacker's moves
+        NaN when the attacker has no damaging move
+        """
+        pair, _, _, damage_pct = self.damage(atk_ids, atk_stats, atk_levels, def_ids, def_stats, atk_rows, def_rows)
+        return entry_scores(pair, damage_pct, len(atk_ids))
+
+    def era_damage(
+        self,
+        atk_ids:np.ndarray, atk_stats:np.ndarray, atk_levels:np.ndarray,
+        def_ids:np.ndarray, def_stats:np.ndarray,
+        atk_rows:Optional[np.ndarray] = None, def_rows:Optional[np.ndarray] = None,
+        eras:Optional[Sequence[int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        `damage` under the type chart of each era of `eras` (indices in ERAS, all of them by default) in one pass.
+        Return (pair, move, damage, damage_pct), `pair` and `move` as in `damage`,
+        `damage` and `damage_pct` with the shape (n_entries, len(eras)).
+        """
+        enc = self.enc
+        eras = np.arange(len(ERAS)) if eras is None else np.asarray(eras)
+        pair, move, base = self.entries(atk_ids, atk_stats, atk_levels, def_stats)
+        atk_rows = atk_ids if atk_rows is None else atk_rows
+        def_rows = def_ids if def_rows is None else def_rows
+        move_type = enc.move_type[move]
+        type_factor = enc.era_defensive_sets()[eras[None, :], def_rows[pair][:, None], move_type[:, None]]
+        stab = enc.offensive_sets[atk_rows[pair], move_type][:, None]
+        with np.errstate(invalid="ignore"):
+            damage = np.floor(base[:, None] * stab * type_factor)
+            damage_pct = 100.0 * (damage / def_stats[:, HP][pair][:, None])
+        return pair, move, damage, damage_pct
+
+    def era_scores(
+        self,
+        atk_ids:np.ndarray, atk_stats:np.ndarray, atk_levels:np.ndarray,
+        def_ids:np.ndarray, def_stats:np.ndarray,
+        atk_rows:Optional[np.ndarray] = None, def_rows:Optional[np.ndarray] = None,
+        eras:Optional[Sequence[int]] = None
+    ) -> np.ndarray:
+        """
+        (n, len(eras)) one-sided scores (see `scores`) under the type chart of each era of `eras`
+        """
+        n = len(atk_ids)
+        pair, _, _, damage_pct = self.era_damage(atk_ids, atk_stats, atk_levels, def_ids, def_stats, atk_rows, def_rows, eras)
+        n_eras = damage_pct.shape[1]
+        # One bin per (row, era)
+        bins = (pair[:, None] * n_eras + np.arange(n_eras)[None, :]).ravel()
+        pct = damage_pct.ravel()
+        valid = ~np.isnan(pct)
+        total = np.bincount(bins[valid], weights=pct[valid], minlength=n * n_eras)
+        count = np.bincount(bins[valid], minlength=n * n_eras)
+        kills = np.bincount(bins[valid], weights=pct[valid] >= 100, minlength=n * n_eras)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return ((1 + kills) * (total / count)).reshape(n, n_eras)
+
+    def stage_damage(
+        self,
+        attackers:PokemonSets, defenders:PokemonSets,
+        atk_stages:np.ndarray = STAGES, def_stages:np.ndarray = STAGES
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Damage of every damaging move of each attacker against the defender of the same row,
+        for every combination of the attacking stat stage (Attack or Sp. Atk, depending on the move) in `atk_stages`
+        and of the defending stat stage (Defense or Sp. Def) in `def_stages`.
+        Return (pair, move, damage, damage_pct), `pair` and `move` as in `damage`,
+        `damage` and `damage_pct` with the shape (n_entries, len(atk_stages), len(def_stages)).
+        """
+        enc = self.enc
+        atk_stats = self.stats(attackers)
+        def_stats = self.stats(defenders)
+        pair, move = self._moveset_entries(attackers.ids)
+        A, D = self._attack_defense(pair, move, atk_stats, def_stats)
+        A = staged(A[:, None], np.asarray(atk_stages)[None, :])[:, :, None]
+        D = staged(D[:, None], np.asarray(def_stages)[None, :])[:, None, :]
+        level = attackers.levels[pair].astype(np.float64)[:, None, None]
+        base = self._base(level, move[:, None, None], A, D)
+        move_type = enc.move_type[move]
+        stab = enc.offensive_sets[attackers.rows[pair], move_type][:, None, None]
+        type_factor = enc.defensive_sets[defenders.rows[pair], move_type][:, None, None]
+        with np.errstate(invalid="ignore"):
+            damage = np.floor(base * stab * type_factor)
+            damage_pct = 100.0 * (damage / def_stats[:, HP][pair][:, None, None])
+        return pair, move, damage, damage_pct
+
+    def stage_ohko(
+        self,
+        attackers:PokemonSets, defenders:PokemonSets,
+        atk_stages:np.ndarray = STAGES, def_stages:np.ndarray = STAGES
+    ) -> np.ndarray:
+        """
+        (n, len(atk_stages), len(def_stages)) whether the attacker of each row has a move dealing 100% or more
+        to the defender of the row, for every combination of stat stages (see `stage_damage`)
+        """
+        pair, _, _, damage_pct = self.stage_damage(attackers, defenders, atk_stages, def_stages)
+        ohko = np.zeros((len(attackers),) + damage_pct.shape[1:], dtype=bool)
+        np.logical_or.at(ohko, pair, damage_pct >= 100)
+        return ohko
+
+    def matchup_scores(
+        self, attackers:PokemonSets, defenders:PokemonSets, atk_bias:float = 0.25, def_bias:float = 0.75,
+        threads:int = 1, chunk_size:int = 50000
+    ) -> np.ndarray:
+        """
+        Vectorized BattleData.matchup_score of each (attacker, defender) row.
+        With `threads` > 1, rows are scored by chunks of `chunk_size` on that many threads.
+        """
+        if threads > 1:
+            return map_chunks(
+                lambda rows: self.matchup_scores(attackers[rows], defenders[rows], atk_bias, def_bias),
+                len(attackers), threads, chunk_size
+            )
+        atk_stats = self.stats(attackers)
+        def_stats = self.stats(defenders)
+        offense = self.scores(attackers.ids, atk_stats, attackers.levels, defenders.ids, def_stats, attackers.rows, defenders.rows)
+        defense = self.scores(defenders.ids, def_stats, defenders.levels, attackers.ids, atk_stats, defenders.rows, attackers.rows)
+        return def_bias * offense + atk_bias * defense
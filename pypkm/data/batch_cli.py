@@ -0,0 +1,313 @@
+"""
+Score (attacker set, defender set) rows in bulk with the batched matchup engine.
+
+Rows are read from a file or stdin, as JSON lines:
+{"attacker": {"pokemon": "Garchomp", "nature": "Adamant", "level": 50, "EVs": {"Attack": 252}}, "defender": "Tinkaton"}
+or as CSV with the columns attacker, defender and optionally {attacker,defender}_{nature,ability,level,ivs,evs},
+where ivs/evs are 6 slash-separated values in the order HP/Attack/Defense/Sp. Atk/Sp. Def/Speed.
+
+Results are streamed out in chunks (memory stays bounded whatever the input size), one row per input row:
+{"row": 0, "attacker": "Garchomp", "defender": "Tinkaton", "score": ..., "offense": ..., "defense": ...}
+where score is BattleData.matchup_score and offense/defense its two one-sided scores.
+
+Usage:
+python -m pypkm.data.batch_cli --gen 9 --input sets.jsonl --output scores.jsonl --processes 4 --checkpoint scores.ckpt
+cat sets.csv | python -m pypkm.data.batch_cli --gen 9 --format csv > scores.jsonl
+Re-running the first command resumes after the last chunk recorded in the checkpoint.
+"""
+import io
+import os
+import sys
+import csv
+import json
+import math
+import time
+import argparse
+import collections
+import multiprocessing
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from pypkm.data import PokeData
+from pypkm.data.schema import STATS
+from pypkm.data.batch import BatchBattle, STAT_IDS
+from pypkm.data.shared import SharedTables, attach
+
+OUTPUT_FIELDS = ["row", "attacker", "defender", "score", "offense", "defense", "error"]
+# Valid set values
+MIN_LEVEL, MAX_LEVEL = 1, 100
+MAX_IV = 31
+MAX_EV = 252
+# Key of the sets of an input line that could not be parsed, holding the parse error
+ROW_ERROR = "_row_error"
+
+def _parse_set(value, prefix:str = "", row:Optional[dict] = None) -> dict:
+    """
+    Normalize a set given as a pokemon name, a set dictionary, or flat CSV columns
+    """
+    if isinstance(value, dict):
+        return value
+    s = {"pokemon": value}
+    if row is not None:
+        if row.get(f"{prefix}_nature"):
+            s["nature"] = row[f"{prefix}_nature"]
+        if row.get(f"{prefix}_ability"):
+            s["ability"] = row[f"{prefix}_ability"]
+        if row.get(f"{prefix}_level"):
+            s["level"] = int(row[f"{prefix}_level"])
+        for field, key in [("ivs", "IVs"), ("evs", "EVs")]:
+            if row.get(f"{prefix}_{field}"):
+                s[key] = dict(zip(STATS, map(int, row[f"{prefix}_{field}"].split("/"))))
+    return s
+
+def read_rows(stream:io.TextIOBase, fmt:str, sep:str = ",") -> Iterator[Tuple[dict, dict]]:
+    """
+    Lazily yield (attacker set, defender set) from a JSON lines or CSV stream.
+    A line that cannot be parsed yields sets holding the error (see `ROW_ERROR`), reported as an error row
+    """
+    if fmt == "jsonl":
+        for line in stream:
+            if line.strip() == "":
+                continue
+            try:
+                d = json.loads(line)
+                yield _parse_set(d["attacker"]), _parse_set(d["defender"])
+            except (ValueError, KeyError, TypeError) as e:
+                yield _row_error(e), _row_error(e)
+    else:
+        for row in csv.DictReader(stream, delimiter=sep):
+            try:
+                yield _parse_set(row["attacker"], "attacker", row), _parse_set(row["defender"], "defender", row)
+            except (ValueError, KeyError, TypeError) as e:
+                yield _row_error(e), _row_error(e)
+
+def _row_error(e:Exception) -> dict:
+    if isinstance(e, KeyError):
+        return {ROW_ERROR: f"Missing field {e.args[0]}"}
+    return {ROW_ERROR: f"Invalid row: {e}"}
+
+def chunks(rows:Iterator, size:int, skip:int = 0) -> Iterator[Tuple[int, List]]:
+    """
+    Group rows in lists of `size` rows, yielded with the index of their first row
+    The first `skip` rows are read and dropped (to resume a job)
+    """
+    first = 0
+    chunk = []
+    for row in rows:
+        if first < skip:
+            first += 1
+            continue
+        chunk.append(row)
+        if len(chunk) == size:
+            yield first, chunk
+            first += len(chunk)
+            chunk = []
+    if len(chunk) > 0:
+        yield first, chunk
+
+def _is_int(value, low:int, high:int) -> bool:
+    return isinstance(value, (int, np.integer)) and not isinstance(value, bool) and low <= value <= high
+
+def _set_error(battle:BatchBattle, s:dict) -> Optional[str]:
+    if ROW_ERROR in s:
+        return s[ROW_ERROR]
+    enc = battle.enc
+    names = enc.lookup()
+    if not isinstance(s.get("pokemon"), str) or s["pokemon"] not in names.pokemons:
+        return f"Unknown pokemon {s.get('pokemon')}"
+    if not isinstance(s.get("nature", "Hardy"), str) or s.get("nature", "Hardy") not in names.natures:
+        return f"Unknown nature {s.get('nature')}"
+    if s.get("ability") is not None:
+        try:
+            enc.set_row(s["pokemon"], s["ability"])
+        except KeyError as e:
+            return e.args[0]
+    if not _is_int(s.get("level", MAX_LEVEL), MIN_LEVEL, MAX_LEVEL):
+        return f"Invalid level {s.get('level')!r}, expected an integer from {MIN_LEVEL} to {MAX_LEVEL}"
+    for key, high in [("IVs", MAX_IV), ("EVs", MAX_EV)]:
+        values = s.get(key, {})
+        if not isinstance(values, dict):
+            return f"Invalid {key} {values!r}, expected a dictionary by stat"
+        for stat, v in values.items():
+            if stat not in STAT_IDS:
+                return f"Unknown stat {stat}"
+            if not _is_int(v, 0, high):
+                return f"Invalid {key} {v!r} for {stat}, expected an integer from 0 to {high}"
+    return None
+
+def score_chunk(battle:BatchBattle, first:int, rows:List[Tuple[dict, dict]], fmt:str, sep:str = ",") -> str:
+    """
+    Score a chunk of rows and format the output lines
+    Invalid rows are reported with an error instead of failing the whole chunk
+    """
+    errors = [_set_error(battle, a) or _set_error(battle, d) for a, d in rows]
+    valid = [i for i, e in enumerate(errors) if e is None]
+    offense = np.full(len(rows), np.nan)
+    defense = np.full(len(rows), np.nan)
+    if len(valid) > 0:
+        attackers = battle.encode_sets([rows[i][0] for i in valid])
+        defenders = battle.encode_sets([rows[i][1] for i in valid])
+        atk_stats = battle.stats(attackers)
+        def_stats = battle.stats(defenders)
+        # Same as BatchBattle.matchup_scores, keeping both one-sided scores
+        offense[valid] = battle.scores(attackers.ids, atk_stats, attackers.levels, defenders.ids, def_stats, attackers.rows, defenders.rows)
+        defense[valid] = battle.scores(defenders.ids, def_stats, defenders.levels, attackers.ids, atk_stats, defenders.rows, attackers.rows)
+    score = 0.75 * offense + 0.25 * defense
+
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=sep, lineterminator="\n") if fmt == "csv" else None
+    for i, (a, d) in enumerate(rows):
+        values = [
+            first + i, a.get("pokemon"), d.get("pokemon"),
+            None if math.isnan(score[i]) else float(score[i]),
+            None if math.isnan(offense[i]) else float(offense[i]),
+            None if math.isnan(defense[i]) else float(defense[i]),
+            errors[i]
+        ]
+        if writer is not None:
+            writer.writerow(["" if v is None else v for v in values])
+        else:
+            out.write(json.dumps({k: v for k, v in zip(OUTPUT_FIELDS, values) if not (k == "error" and v is None)}) + "\n")
+    return out.getvalue()
+
+# Per-process engine of the worker pool, over the tables shared by the main process
+_worker_battle: Optional[BatchBattle] = None
+
+def _init_worker(handle:dict) -> None:
+    global _worker_battle
+    _worker_battle = BatchBattle(attach(handle))
+
+def _score_chunk_worker(first:int, rows:List, fmt:str, sep:str) -> Tuple[int, str]:
+    return len(rows), score_chunk(_worker_battle, first, rows, fmt, sep)
+
+def _scored_chunks(gen:int, chunk_iter:Iterator, processes:int, fmt:str, sep:str) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (number of rows, formatted output) of each chunk, in input order
+    At most 2 chunks per process are in flight, so memory stays bounded
+    Workers do not load the data themselves, they attach to the tables of the main process in shared memory
+    """
+    battle = BatchBattle(PokeData(gen = gen))
+    if processes <= 1:
+        for first, rows in chunk_iter:
+            yield len(rows), score_chunk(battle, first, rows, fmt, sep)
+        return
+
+    with SharedTables(battle.enc) as shared, multiprocessing.Pool(processes, initializer=_init_worker, initargs=(shared.handle,)) as pool:
+        pending = collections.deque()
+        for first, rows in chunk_iter:
+            pending.append(pool.apply_async(_score_chunk_worker, (first, rows, fmt, sep)))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().get()
+        while len(pending) > 0:
+            yield pending.popleft().get()
+
+class CheckpointError(Exception):
+    """
+    The checkpoint does not match the output file it refers to
+    """
+    pass
+
+def read_checkpoint(path:Optional[str]) -> dict:
+    if path is None or not os.path.isfile(path):
+        return {"rows": 0, "output_bytes": 0}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_checkpoint(path:str, rows:int, output_bytes:int) -> None:
+    # Write then rename so that an interrupted job never leaves a truncated checkpoint
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"rows": rows, "output_bytes": output_bytes}, f)
+    os.replace(path + ".tmp", path)
+
+def run(
+    gen:int, input_stream:io.TextIOBase, fmt:str, output_path:Optional[str], output_fmt:str,
+    chunk_size:int = 10000, processes:int = 1, checkpoint:Optional[str] = None, sep:str = ",", progress_every:float = 10.0
+) -> int:
+    """
+    Score all rows of `input_stream`, return the number of rows scored by this run
+    """
+    state = read_checkpoint(checkpoint)
+    if output_path is None:
+        output = sys.stdout.buffer
+    else:
+        if state["output_bytes"] > 0:
+            # Resuming needs the checkpointed output: never pad a missing or shorter file
+            size = os.path.getsize(output_path) if os.path.isfile(output_path) else None
+            if size is None or size < state["output_bytes"]:
+                raise CheckpointError(
+                    f"{output_path} is {'missing' if size is None else f'{size} bytes'} but the checkpoint {checkpoint} "
+                    f"expects {state['output_bytes']} bytes, remove the checkpoint to restart from the first row"
+                )
+        output = open(output_path, "r+b" if state["output_bytes"] > 0 else "wb")
+        # Drop what was written after the last checkpoint
+        output.truncate(state["output_bytes"])
+        output.seek(state["output_bytes"])
+
+    done = state["rows"]
+    written = state["output_bytes"]
+    if output_fmt == "csv" and written == 0:
+        header = (sep.join(OUTPUT_FIELDS) + "\n").encode("utf-8")
+        output.write(header)
+        written += len(header)
+
+    start = time.perf_counter()
+    last_report = start
+    scored = 0
+    try:
+        chunk_iter = chunks(read_rows(input_stream, fmt, sep), chunk_size, skip=done)
+        for n, text in _scored_chunks(gen, chunk_iter, processes, output_fmt, sep):
+            data = text.encode("utf-8")
+            output.write(data)
+            output.flush()
+            written += len(data)
+            done += n
+            scored += n
+            if checkpoint is not None:
+                write_checkpoint(checkpoint, done, written)
+            now = time.perf_counter()
+            if now - last_report >= progress_every:
+                print(f"{done} rows, {scored / (now - start):.0f} rows/s", file=sys.stderr)
+                last_report = now
+    finally:
+        if output_path is not None:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {scored} rows in {elapsed:.2f}s ({scored / elapsed if elapsed > 0 else 0:.0f} rows/s), {done} rows in total", file=sys.stderr)
+    return scored
+
+def _guess_format(path:Optional[str], default:str) -> str:
+    if path is not None and path.endswith(".csv"):
+        return "csv"
+    if path is not None and (path.endswith(".jsonl") or path.endswith(".json")):
+        return "jsonl"
+    return default
+
+def main(argv:Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gen", type=int, default=9, help="Generation of the movesets")
+    parser.add_argument("--input", default=None, help="Input file (stdin if not given)")
+    parser.add_argument("--output", default=None, help="Output file (stdout if not given)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="Input format (guessed from the input file extension, jsonl for stdin)")
+    parser.add_argument("--output-format", choices=["jsonl", "csv"], default=None, help="Output format (guessed from the output file extension, jsonl for stdout)")
+    parser.add_argument("--sep", default=",", help="CSV separator")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Number of rows scored at once")
+    parser.add_argument("--processes", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file used to resume an interrupted job (requires --output)")
+    args = parser.parse_args(argv)
+
+    if args.checkpoint is not None and args.output is None:
+        parser.error("--checkpoint requires --output")
+
+    fmt = args.format or _guess_format(args.input, "jsonl")
+    output_fmt = args.output_format or _guess_format(args.output, "jsonl")
+    input_stream = open(args.input, "r", encoding="utf-8", newline="") if args.input is not None else sys.stdin
+    try:
+        run(args.gen, input_stream, fmt, args.output, output_fmt, args.chunk_size, args.processes, args.checkpoint, args.sep)
+    except CheckpointError as e:
+        parser.error(str(e))
+    finally:
+        if args.input is not None:
+            input_stream.close()
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,16 @@ from numpy import floor
 from typing import Dict, Union, Optional
 import pandas as pd
 from pypkm.data import PokeData
+from pypkm.data.instrumentation import timed, section
+from pypkm.data.schema import STATS
+from pypkm.data.batch import BatchBattle
+from pypkm.data.counters import top_counters
 
 class BattleData():      
     def __init__(self, data:PokeData) -> None:
         self.data = data
 
+    @timed()
     def apply_stats(self, base_stats:pd.DataFrame, nature:str = "Hardy", level:int = 100, IVs:Dict[str, int] = {}, EVs:Dict[str, int] = {}) -> pd.Series:
         """
         Given a DataFrame 'base_stats', apply the given level, nature and EVs/IVs the pokemon's stats.
@@ -15,12 +20,13 @@ class BattleData():
         
         # Stats are computed using the formula from generation 3 and onward
         # Source: https://bulbapedia.bulbagarden.net/wiki/Stat
+        # Base stats are stored as uint8, they are upcasted so the formula cannot overflow
         def _HP(base, ev, iv, level, nature_bonus) -> int:
-            num = (2 * base + iv + floor(ev/4)) * level
+            num = (2 * base.astype("int64") + iv + floor(ev/4)) * level
             return floor(num/100) + level + 10
 
         def _STAT(base, ev, iv, level, nature_bonus) -> int:
-            num = (2 * base + iv + floor(ev/4)) * level
+            num = (2 * base.astype("int64") + iv + floor(ev/4)) * level
             return floor((floor(num/100) + 5) * nature_bonus)
         
         stats = ["HP", "Attack", "Defense", "Sp. Atk", "Sp. Def", "Speed"]
@@ -31,7 +37,7 @@ class BattleData():
         base_EVs.update(EVs)
         base_IVs.update(IVs)
         # Get nature bonuses from database
-        nature_bonuses = self.data.natures[self.data.natures["Nature"] == nature].iloc[0]
+        nature_bonuses = self.data.natures_table()[nature]
         #
         df = base_stats
         # Update stats with given parameters
@@ -48,6 +54,7 @@ class BattleData():
 
 
 
+    @timed()
     def matchup(self, atk_pokemon:pd.Series, def_pokemon:pd.Series) -> pd.DataFrame:
         """
         The Series 'atk_pokemon' should be of the form of PokeData.base_stats.
@@ -116,16 +123,17 @@ class BattleData():
 
         # Moveset of the attacking pokemon
         atk_moveset = self.data.pretty_moveset(atk_pokemon["Name"])
-        # Only keep damaging moves
-        atk_moveset = atk_moveset[~atk_moveset["Power"].isna()]
-        # Rename 'Nme' to 'Move' for later merge
-        atk_moveset = atk_moveset.rename(columns={"Name": "Move"})
-        # Add Pokemon name to the moveset df to merge later on
-        atk_moveset = atk_moveset.assign(Pokemon = lambda x: atk_pokemon["Name"])
-        # Merge the two datasets to have atk_pokemon stats along with the moveset
-        atk_moveset = pd.merge(atk_moveset, atk_pokemon.to_frame().transpose(), left_on="Pokemon", right_on="Name", how="outer")
-        # Drop the "name" column as Pokemon and Name are now identical
-        atk_moveset = atk_moveset.drop(columns=["Name"])
+        with section("BattleData.matchup.merges"):
+            # Only keep damaging moves
+            atk_moveset = atk_moveset[~atk_moveset["Power"].isna()]
+            # Rename 'Nme' to 'Move' for later merge
+            atk_moveset = atk_moveset.rename(columns={"Name": "Move"})
+            # Add Pokemon name to the moveset df to merge later on
+            atk_moveset = atk_moveset.assign(Pokemon = lambda x: atk_pokemon["Name"])
+            # Merge the two datasets to have atk_pokemon stats along with the moveset
+            atk_moveset = pd.merge(atk_moveset, atk_pokemon.to_frame().transpose(), left_on="Pokemon", right_on="Name", how="outer")
+            # Drop the "name" column as Pokemon and Name are now identical
+            atk_moveset = atk_moveset.drop(columns=["Name"])
         # Get the defensive type of def_pokemon
         deftype_key = PokeData.type_to_key(def_pokemon["Type1"], def_pokemon["Type2"])
         # Get the defensive matrix
@@ -134,10 +142,11 @@ class BattleData():
         defensive_matrix = defensive_matrix.loc[deftype_key]
 
         
-        # Get the type factor of each move knowking the defense type of `def_pokemon`
-        atk_moveset = pd.merge(atk_moveset, defensive_matrix.to_frame(), left_on="Type", right_index=True, how="inner")
-        # Rename the column to not have the dual-type as the column name after the merge on "type"
-        atk_moveset = atk_moveset.rename(columns={deftype_key: "TypeFactor"})
+        with section("BattleData.matchup.merges"):
+            # Get the type factor of each move knowking the defense type of `def_pokemon`
+            atk_moveset = pd.merge(atk_moveset, defensive_matrix.to_frame(), left_on="Type", right_index=True, how="inner")
+            # Rename the column to not have the dual-type as the column name after the merge on "type"
+            atk_moveset = atk_moveset.rename(columns={deftype_key: "TypeFactor"})
         # Create the STAB column
         atk_moveset = atk_moveset.assign(Stab=lambda x: 1.0 + 0.5 * ((x.Type1 == x.Type) | (x.Type2 == x.Type)))
         # Columns to indicate the effective attack of a move depending if it's is Special or Pyshical
@@ -155,18 +164,20 @@ class BattleData():
         # IF the move is Special or Physical
         atk_moveset = atk_moveset.assign(EffectiveDefence=lambda x: (x["Defense_B"] * (x.Category == "Physical")) + (x["Sp. Def_B"] * (x.Category == "Special")))
         # Compuate the damage columns !
-        atk_moveset = atk_moveset.assign(
-            Damage=lambda x: damage(
-                Level = x["Level"], A = x["EffectiveAttack"], D = x["EffectiveDefence"],
-                Power = x["Power"], STAB = x["Stab"], Type = x["TypeFactor"]
+        with section("BattleData.matchup.damage"):
+            atk_moveset = atk_moveset.assign(
+                Damage=lambda x: damage(
+                    Level = x["Level"], A = x["EffectiveAttack"], D = x["EffectiveDefence"],
+                    Power = x["Power"], STAB = x["Stab"], Type = x["TypeFactor"]
+                )
             )
-        )
         # Add Damage relative to the Defense pokemon's HP
         atk_moveset = atk_moveset.assign(**{"Damage (%)" : lambda x: 100.0 * (x["Damage"] / x["HP_B"])})
         return atk_moveset[
             ["Move", "Type", "Category", "Power", "Accuracy", "PP", "Prob. (%)", "Pokemon", "Pokemon_B", "Damage", "Damage (%)"]
         ].sort_values(by=["Damage"], ascending=False)
     
+    @timed()
     def matchup_score(self, atk_pokemon:pd.Series, def_pokemon:pd.Series, atk_bias:float = 0.25, def_bias:float = 0.75) -> float:
         def score(atk_pokemon:pd.Series, def_pokemon:pd.Series) -> float:
             m = self.matchup(atk_pokemon, def_pokemon)
@@ -175,15 +186,18 @@ class BattleData():
         
         return def_bias*score(atk_pokemon, def_pokemon) + atk_bias*score(def_pokemon, atk_pokemon)
     
+    @timed()
     def find_matchup(self, pokemon:pd.Series, team: pd.DataFrame):
         # First, find the bests defensive types combination that would resists the stabbed attacks of `pokemon`
         # This is to simulate a defensive switch of pokemon against pokemon `pokemon`
-        def_types = self.data.best_against([pokemon["Type1"], pokemon["Type2"]])
+        # Monotype pokemons have no (NaN) Type2
+        def_types = self.data.best_against([t for t in (pokemon["Type1"], pokemon["Type2"]) if pd.notna(t)])
         # Find all corresponding pokemons of each type combinations in the `team`
-        candidates = pd.DataFrame()
-        for typekey in def_types.index.to_list():
-            t1, t2 = PokeData.key_to_type(typekey)
-            candidates = pd.concat([candidates, team[self.data._c_of_types(t1, t2)]])
+        with section("BattleData.find_matchup.candidates"):
+            # Concatenate once instead of growing the DataFrame for every type key
+            candidates = pd.concat([pd.DataFrame()] + [
+                team[self.data._c_of_types(*PokeData.key_to_type(typekey))] for typekey in def_types.index.to_list()
+            ])
 
         # Compute the score againts `pokemon` for each candidates
         # TODO: we shouldn't have to do self.apply_stats(candidates) !!
@@ -191,6 +205,23 @@ class BattleData():
         candidates["Score"] = candidates.apply(lambda row: self.matchup_score(pokemon, row), axis = 1) # axis = 1 is apply by rows
         print(candidates[["Name", "Type1", "Type2", "Score"]].sort_values(by=["Score"], ascending=True))
 
+    @timed()
+    def top_counters(self, pokemon:pd.Series, team:pd.DataFrame, k:int = 5, atk_bias:float = 0.25, def_bias:float = 0.75) -> pd.DataFrame:
+        """
+        The `k` pokemons of `team` (base stats, as for `find_matchup`) with the best net matchup against `pokemon`:
+        matchup_score(candidate, pokemon) - matchup_score(pokemon, candidate).
+        Exact, but most candidates are skipped thanks to cheap upper bounds (see `pypkm.data.counters`).
+        """
+        engine = self.data._cached("batch_battle", lambda: BatchBattle(self.data))
+        target = engine.encode_sets([{"pokemon": pokemon["Name"], "level": int(pokemon.get("Level", 100))}])
+        target_stats = pokemon[STATS].to_numpy(dtype="float64")
+        # Candidates at their default stats, as `apply_stats(team)` in `find_matchup`
+        candidates = engine.encode_sets([{"pokemon": name} for name in team["Name"]])
+        rows, scores, _ = top_counters(engine, target, candidates, k, atk_bias, def_bias, target_stats=target_stats)
+        counters = team.iloc[rows][["Name", "Type1", "Type2"]].copy()
+        counters["Score"] = scores
+        return counters
+
 def test():
     data = PokeData(gen = 9)
     battle = BattleData(data)
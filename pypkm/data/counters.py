@@ -0,0 +1,85 @@
+"""
+Exact top-k counter search with upper-bound pruning.
+
+The counter score of a candidate against a target is its net matchup advantage
+matchup_score(candidate, target) - matchup_score(target, candidate) (the payoff of `pypkm.data.equilibrium`),
+that is (def_bias - atk_bias) * (score of the candidate attacking - score of the target attacking).
+A cheap upper bound of the one-sided scores is computed for every candidate from:
+- the highest attacking stat (Attack or Sp. Atk) of the attacker and lowest defending stat (Defense or Sp. Def) of the defender
+- the best power of the attacker's damaging moves of each type, times its STAB (and ability) factor and the type factor
+- at most as many 100% moves as moves of the types whose bound reaches 100%
+Candidates are then scored exactly in decreasing bound order, until the k-th best exact score beats the bound of
+every remaining candidate: the result is the same as scoring the whole roster, most of which is skipped.
+"""
+import numpy as np
+from typing import Optional, Tuple
+from pypkm.data.batch import BatchBattle, PokemonSets, HP, ATTACK, DEFENSE, SP_ATK, SP_DEF
+
+def score_upper_bounds(
+    battle:BatchBattle,
+    atk_ids:np.ndarray, atk_stats:np.ndarray, atk_levels:np.ndarray, atk_rows:np.ndarray,
+    def_stats:np.ndarray, def_rows:np.ndarray
+) -> np.ndarray:
+    """
+    Upper bound of BatchBattle.scores for each row (0 when the attacker has no damaging move: its NaN score counts as 0)
+    """
+    enc = battle.enc
+    best, count = enc.moves_by_type()
+    A = np.maximum(atk_stats[:, ATTACK], atk_stats[:, SP_ATK])[:, None]
+    D = np.minimum(def_stats[:, DEFENSE], def_stats[:, SP_DEF])[:, None]
+    level = atk_levels.astype(np.float64)[:, None]
+    # Same formula as BatchBattle.damage with the best power of each type, without rounding down
+    with np.errstate(divide="ignore", invalid="ignore"):
+        num = (((2 * level) / 5) + 2) * best[atk_ids] * (A / D)
+        damage = ((num / 50) + 2) * enc.offensive_sets[atk_rows] * enc.defensive_sets[def_rows]
+        damage_pct = 100.0 * (damage / def_stats[:, HP][:, None])
+    n_moves = count[atk_ids]
+    has_moves = n_moves > 0
+    max_pct = np.where(has_moves, damage_pct, 0.0).max(axis=1)
+    kills = (n_moves * (has_moves & (damage_pct >= 100))).sum(axis=1)
+    return np.where(has_moves.any(axis=1), (1 + kills) * max_pct, 0.0)
+
+def top_counters(
+    battle:BatchBattle, target:PokemonSets, candidates:PokemonSets, k:int = 5,
+    atk_bias:float = 0.25, def_bias:float = 0.75, batch_size:int = 64,
+    target_stats:Optional[np.ndarray] = None, candidate_stats:Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    The `k` candidates with the highest counter score against `target` (a single set).
+    Candidates are scored exactly by batches of `batch_size`, in decreasing order of their upper bound.
+    Stats can be given instead of being computed from the sets (ex: stats already modified by BattleData.apply_stats).
+    Return (candidate indices, counter scores) in decreasing score order, and the number of candidates scored exactly.
+    A side without damaging move (NaN one-sided score) scores 0.
+    """
+    n = len(candidates)
+    t_stats = battle.stats(target) if target_stats is None else np.asarray(target_stats, dtype=np.float64).reshape(1, -1)
+    c_stats = battle.stats(candidates) if candidate_stats is None else np.asarray(candidate_stats, dtype=np.float64)
+    t = np.zeros(n, dtype=np.intp)
+    t_ids, t_levels, t_rows, t_stats = target.ids[t], target.levels[t], target.rows[t], t_stats[t]
+
+    # Only the one-sided score counted positively needs a bound, the other one is at least 0
+    w = def_bias - atk_bias
+    if w >= 0:
+        bounds = w * score_upper_bounds(battle, candidates.ids, c_stats, candidates.levels, candidates.rows, t_stats, t_rows)
+    else:
+        bounds = -w * score_upper_bounds(battle, t_ids, t_stats, t_levels, t_rows, c_stats, candidates.rows)
+    order = np.argsort(-bounds, kind="stable")
+
+    best_index = np.empty(0, dtype=np.intp)
+    best_score = np.empty(0)
+    scored = 0
+    for start in range(0, n, batch_size):
+        # Remaining candidates cannot beat the current k-th best score
+        if len(best_score) == k and best_score[-1] >= bounds[order[start]]:
+            break
+        chunk = order[start:start + batch_size]
+        c, tt = candidates[chunk], target[t[:len(chunk)]]
+        offense = battle.scores(c.ids, c_stats[chunk], c.levels, t_ids[:len(chunk)], t_stats[:len(chunk)], c.rows, t_rows[:len(chunk)])
+        defense = battle.scores(tt.ids, t_stats[:len(chunk)], tt.levels, c.ids, c_stats[chunk], tt.rows, c.rows)
+        scores = w * (np.nan_to_num(offense) - np.nan_to_num(defense))
+        scored += len(chunk)
+        best_index = np.concatenate([best_index, chunk])
+        best_score = np.concatenate([best_score, scores])
+        keep = np.argsort(-best_score, kind="stable")[:k]
+        best_index, best_score = best_index[keep], best_score[keep]
+    return best_index, best_score, scored
@@ -1,18 +1,217 @@
+import numpy as np
 import pandas as pd
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+class Record(object):
+    """
+    Read-only view of one row of a DataFrameWrapper, values are read from the column arrays on access
+    Missing values are None (NaN in float columns)
+    """
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table:"DataFrameWrapper", row:int) -> None:
+        self._table = table
+        self._row = row
+
+    @property
+    def row(self) -> int:
+        return self._row
+
+    def __getitem__(self, column:str) -> Any:
+        return self._table.value(self._row, column)
+
+    def __getattr__(self, column:str) -> Any:
+        # Only called for names that are not slots, ex: record.Name
+        if column.startswith("_"):
+            raise AttributeError(column)
+        try:
+            return self._table.value(self._row, column)
+        except KeyError:
+            raise AttributeError(column) from None
+
+    def keys(self) -> List[str]:
+        return self._table.columns
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {column: self[column] for column in self._table.columns}
+
+    def __repr__(self) -> str:
+        return f"{type(self._table).__name__}.Record({self.as_dict()})"
 
 class DataFrameWrapper(object):
-    pass
+    """
+    Compact read-only table built from a DataFrame of PokeData.
+    Columns are stored as NumPy arrays:
+    categorical columns as integer codes (-1 if missing) with their categories,
+    nullable integer columns as values with a missing mask, other columns as is.
+    Rows are accessed by position (`record(row)`) or by the value of `KEY` (`table[key]`),
+    the DataFrame is only rebuilt when asked (`to_dataframe()`).
+    """
+    # Column identifying the rows, looked up by `table[key]`
+    KEY: Optional[str] = None
+
+    def __init__(self, df:pd.DataFrame) -> None:
+        self.columns: List[str] = list(df.columns)
+        self._dtypes: Dict[str, Any] = dict(df.dtypes)
+        self._index: pd.Index = df.index
+        self._length: int = len(df)
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._categories: Dict[str, np.ndarray] = {}
+        self._masks: Dict[str, np.ndarray] = {}
+        for column in self.columns:
+            values = df[column].array
+            if isinstance(values, pd.Categorical):
+                self._arrays[column] = values.codes
+                self._categories[column] = values.categories.to_numpy(dtype=object)
+            elif pd.api.types.is_string_dtype(values.dtype) or pd.api.types.is_object_dtype(values.dtype):
+                # Missing values as None
+                self._arrays[column] = values.to_numpy(dtype=object, na_value=None)
+            elif isinstance(values, pd.arrays.IntegerArray) or isinstance(values, pd.arrays.BooleanArray):
+                self._arrays[column] = values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=0)
+                self._masks[column] = np.asarray(values.isna())
+            else:
+                self._arrays[column] = values.to_numpy()
+        # Row groups of a column value, built on first lookup
+        self._groups: Dict[str, Dict[Any, np.ndarray]] = {}
+        self._df: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[Record]:
+        for row in range(self._length):
+            yield Record(self, row)
+
+    def __contains__(self, key:Any) -> bool:
+        return len(self.rows(self.KEY, key)) > 0
+
+    def __getitem__(self, key:Any) -> Record:
+        """
+        Record of the first row whose `KEY` column is `key`
+        """
+        rows = self.rows(self.KEY, key)
+        if len(rows) == 0:
+            raise KeyError(f"Unknown {self.KEY} {key}")
+        return Record(self, int(rows[0]))
+
+    def record(self, row:int) -> Record:
+        return Record(self, row)
+
+    def value(self, row:int, column:str) -> Any:
+        """
+        Value of `column` at position `row`, None if missing (NaN in float columns)
+        """
+        array = self._arrays[column]
+        if column in self._categories:
+            code = array[row]
+            return None if code < 0 else self._categories[column][code]
+        if column in self._masks and self._masks[column][row]:
+            return None
+        return array[row]
+
+    def codes(self, column:str) -> np.ndarray:
+        """
+        Integer codes of a categorical column (-1 if missing)
+        """
+        return self._arrays[column]
+
+    def categories(self, column:str) -> np.ndarray:
+        return self._categories[column]
+
+    def column(self, column:str) -> np.ndarray:
+        """
+        Decoded values of `column` as a NumPy array
+        (object array for categorical and string columns, float array with NaN for nullable integers)
+        """
+        array = self._arrays[column]
+        if column in self._categories:
+            return np.where(array >= 0, self._categories[column][np.maximum(array, 0)], None)
+        if column in self._masks:
+            return np.where(self._masks[column], np.nan, array.astype(np.float64))
+        return array
+
+    def rows(self, column:str, value:Any) -> np.ndarray:
+        """
+        Positions of the rows whose `column` is `value`, in table order
+        """
+        if column not in self._groups:
+            self._groups[column] = self._build_groups(column)
+        return self._groups[column].get(value, np.empty(0, dtype=np.intp))
+
+    def _build_groups(self, column:str) -> Dict[Any, np.ndarray]:
+        if column in self._categories:
+            codes, keys = self._arrays[column], self._categories[column]
+        else:
+            # Missing values get the code -1
+            codes, keys = pd.factorize(self.column(column))
+        groups = {}
+        if len(codes) == 0:
+            return groups
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        for start, rows in zip(starts, np.split(order, starts[1:])):
+            code = sorted_codes[start]
+            if code < 0:
+                continue
+            key = keys[code]
+            groups[key.item() if isinstance(key, np.generic) else key] = rows
+        return groups
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        DataFrame of the table, with the dtypes and index of the DataFrame it was built from
+        """
+        if self._df is None:
+            columns = {}
+            for column in self.columns:
+                dtype = self._dtypes[column]
+                if column in self._categories:
+                    columns[column] = pd.Categorical.from_codes(self._arrays[column], dtype=dtype)
+                elif column in self._masks:
+                    columns[column] = pd.array(np.where(self._masks[column], None, self._arrays[column]).tolist(), dtype=dtype)
+                else:
+                    columns[column] = pd.array(self._arrays[column], dtype=dtype)
+            self._df = pd.DataFrame(columns, index=self._index)
+        return self._df
 
 class Pokedex(DataFrameWrapper):
-    pass
+    """
+    Pokemons stats table, by pokemon name
+    """
+    KEY = "Name"
+
+    def pokemon_rows(self, pokemon:Union[int, str]) -> np.ndarray:
+        """
+        Rows of a pokemon given its name, or of all the forms of a pokedex id
+        """
+        if isinstance(pokemon, (int, np.integer)):
+            return self.rows("PokedexId", int(pokemon))
+        return self.rows("Name", pokemon)
 
 class Moves(DataFrameWrapper):
-    pass
+    """
+    Moves table, by move name
+    """
+    KEY = "Name"
 
 class Movesets(DataFrameWrapper):
-    pass
+    """
+    Movesets table, by pokemon name (a key has one row per way of learning each move)
+    """
+    KEY = "Pokemon"
+
+    def moveset_rows(self, pokemon:str) -> np.ndarray:
+        return self.rows("Pokemon", pokemon)
+
 class Abilities(DataFrameWrapper):
-    pass
+    """
+    Abilities table, by pokemon name
+    """
+    KEY = "Pokemon"
 
 class Natures(DataFrameWrapper):
-    pass
\ No newline at end of file
+    """
+    Natures table, by nature name
+    """
+    KEY = "Nature"
@@ -0,0 +1,114 @@
+"""
+Doubles evaluation: a pair of attackers against a pair of defenders.
+
+Each attacker has three actions: its best single-target move on either defender,
+or its best spread move, hitting both defenders with the spread reduction (x0.75, see `pypkm.data.scenarios`).
+The damage of every (attacker, defender) combination is computed in one batched pass (4 rows per doubles row),
+then the 3 x 3 joint actions (the 2 x 2 target assignments and the spread moves) are evaluated at once.
+A joint action is scored like the one-sided score of singles, on the damage summed over both attackers:
+(1 + number of defenders knocked out) * mean damage (%) over the two defenders, capped at 100% each (overkill is wasted).
+The side's score is the one of its best joint action.
+Spread moves also hitting the ally (ex: Earthquake, Surf) are scored without the damage dealt to the partner.
+
+    battle = BatchBattle(PokeData(gen = 9))
+    sets = battle.encode_sets([{"pokemon": n} for n in ["Garchomp", "Gholdengo", "Kingambit", "Amoonguss"]])
+    doubles_matchup_scores(battle, sets[[0]], sets[[1]], sets[[2]], sets[[3]])
+"""
+import numpy as np
+from typing import Tuple
+from pypkm.data.batch import BatchBattle, PokemonSets
+from pypkm.data.scenarios import ScenarioGrid, scenario_damage, _spread_moves
+
+# Actions of an attacker
+TARGET_1, TARGET_2, SPREAD = range(3)
+ACTIONS = ["target 1", "target 2", "spread"]
+
+def concat_sets(sets:Tuple[PokemonSets, ...]) -> PokemonSets:
+    """
+    Concatenation of PokemonSets
+    """
+    return PokemonSets(*[
+        np.concatenate([getattr(s, field) for s in sets]) for field in ["ids", "natures", "levels", "IVs", "EVs", "rows"]
+    ])
+
+def pair_damage(
+    battle:BatchBattle, atk1:PokemonSets, atk2:PokemonSets, def1:PokemonSets, def2:PokemonSets
+) -> np.ndarray:
+    """
+    (n, 2 attackers, 3 actions, 2 defenders) damage (%) of the actions of each attacker of each row
+    """
+    n = len(atk1)
+    # Row k * n + i is the attacker k // 2 of row i against its defender k % 2
+    attackers = concat_sets((atk1, atk1, atk2, atk2))
+    defenders = concat_sets((def1, def2, def1, def2))
+    pair, move, _, damage_pct = scenario_damage(battle, attackers, defenders, ScenarioGrid(doubles=[True]))
+    pct = damage_pct.reshape(-1)
+    spread = _spread_moves(battle)[move]
+    valid = ~np.isnan(pct)
+    row, block = pair % n, pair // n
+    attacker, target = block // 2, block % 2
+
+    actions = np.zeros((n, 2, len(ACTIONS), 2))
+    # Best single-target move on each defender
+    best = np.zeros((n, 2, 2))
+    single = valid & ~spread
+    np.maximum.at(best, (row[single], attacker[single], target[single]), pct[single])
+    actions[:, :, TARGET_1, 0] = best[:, :, 0]
+    actions[:, :, TARGET_2, 1] = best[:, :, 1]
+
+    # Best spread move: the entries against both defenders are in the same order (same attacker moveset)
+    for k in range(2):
+        first = np.flatnonzero(block == 2 * k)
+        second = np.flatnonzero(block == 2 * k + 1)
+        both = np.where(spread[first] & valid[first], pct[first] + pct[second], -np.inf)
+        # Index of the best spread entry of each row, by descending total
+        order = np.lexsort((-both, row[first]))
+        heads = order[np.r_[True, row[first][order][1:] != row[first][order][:-1]]] if len(order) > 0 else order
+        heads = heads[np.isfinite(both[heads])]
+        actions[row[first][heads], k, SPREAD, 0] = pct[first][heads]
+        actions[row[first][heads], k, SPREAD, 1] = pct[second][heads]
+    return actions
+
+def doubles_scores(
+    battle:BatchBattle, atk1:PokemonSets, atk2:PokemonSets, def1:PokemonSets, def2:PokemonSets
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One-sided doubles score of each row (see module docstring) and (n, 2) best action of each attacker (in ACTIONS)
+    """
+    actions = pair_damage(battle, atk1, atk2, def1, def2)
+    # (n, action of attacker 1, action of attacker 2, defender)
+    total = actions[:, 0, :, None, :] + actions[:, 1, None, :, :]
+    knocked = (total >= 100).sum(axis=-1)
+    scores = (1 + knocked) * np.minimum(total, 100.0).mean(axis=-1)
+    flat = scores.reshape(len(atk1), -1)
+    best = flat.argmax(axis=1)
+    return flat[np.arange(len(atk1)), best], np.stack(np.unravel_index(best, scores.shape[1:]), axis=1)
+
+def doubles_matchup_scores(
+    battle:BatchBattle, atk1:PokemonSets, atk2:PokemonSets, def1:PokemonSets, def2:PokemonSets,
+    atk_bias:float = 0.25, def_bias:float = 0.75
+) -> np.ndarray:
+    """
+    Doubles version of BatchBattle.matchup_scores: def_bias * score(pair 1 -> pair 2) + atk_bias * score(pair 2 -> pair 1)
+    """
+    offense, _ = doubles_scores(battle, atk1, atk2, def1, def2)
+    defense, _ = doubles_scores(battle, def1, def2, atk1, atk2)
+    return def_bias * offense + atk_bias * defense
+
+def partner_scores(
+    battle:BatchBattle, lead:PokemonSets, candidates:PokemonSets, opponents1:PokemonSets, opponents2:PokemonSets,
+    atk_bias:float = 0.25, def_bias:float = 0.75, chunk_size:int = 20000
+) -> np.ndarray:
+    """
+    Mean doubles matchup score of `lead` (a single set) paired with each candidate,
+    against the opponent pairs (opponents1[i], opponents2[i]). Rows are scored by chunks of `chunk_size`.
+    """
+    n, m = len(candidates), len(opponents1)
+    scores = np.empty(n * m)
+    for start in range(0, n * m, chunk_size):
+        flat = np.arange(start, min(start + chunk_size, n * m))
+        c, o = flat // m, flat % m
+        scores[flat] = doubles_matchup_scores(
+            battle, lead[np.zeros(len(flat), dtype=np.intp)], candidates[c], opponents1[o], opponents2[o], atk_bias, def_bias
+        )
+    return scores.reshape(n, m).mean(axis=1)
@@ -0,0 +1,290 @@
+"""
+Integer-coded NumPy view of the PokeData tables, used by the batched paths.
+Pokemons, moves, types and natures are referred to by their row position (id) in these arrays.
+"""
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple, Union
+from pypkm.data.schema import TYPES, STATS, MOVE_CATEGORIES
+from pypkm.data.abilities import pokemon_abilities, defensive_vector, offensive_vector
+from pypkm.data.names import NameLookup
+from pypkm.data.type_charts import defensive_by_era
+
+# Move category codes (position in MOVE_CATEGORIES)
+PHYSICAL = MOVE_CATEGORIES.index("Physical")
+SPECIAL = MOVE_CATEGORIES.index("Special")
+STATUS = MOVE_CATEGORIES.index("Status")
+
+# Type id of the missing second type of monotype pokemons
+NO_TYPE = -1
+
+# Numeric arrays of EncodedTables, the only ones that need to be shared between processes
+ARRAYS = [
+    "pokedex_ids", "stats", "type1", "type2", "type_chart", "type_charts", "defensive",
+    "move_type", "move_category", "move_power", "move_accuracy",
+    "moveset_indptr", "moveset_indices", "damaging_indptr", "damaging_indices",
+    "nature_bonus",
+    "ability_indptr", "ability_indices", "defensive_sets", "offensive_sets"
+]
+# Name arrays, from which the name -> id dictionaries are rebuilt
+NAMES = ["pokemon_names", "move_names", "nature_names", "ability_names"]
+
+def _codes(values:pd.Series, categories:List[str]) -> np.ndarray:
+    return pd.Categorical(values, categories=categories).codes.astype(np.int8)
+
+def _frozen(value):
+    """
+    `value` (array or tuple of arrays) made read-only, so that it can be shared by concurrent readers
+    """
+    if isinstance(value, tuple):
+        return tuple(_frozen(v) for v in value)
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    return value
+
+class EncodedTables(object):
+    """
+    Arrays built from a PokeData:
+
+    - `pokemon_names`, `pokedex_ids` (n_pokemons,), `stats` (n_pokemons, 6) base stats in the order of `STATS`,
+      `type1`/`type2` (n_pokemons,) type ids (`type2` is NO_TYPE for monotypes)
+    - `type_chart` (n_types, n_types): type factor of attack type (column) against defense type (row) in the era of the generation,
+      `type_charts` (n_eras, n_types, n_types) the same in every era (see `pypkm.data.type_charts`)
+    - `defensive` (n_pokemons, n_types): type factor of each attack type against each pokemon (row of the defensive matrix)
+    - `move_names`, `move_type`, `move_category` (code in MOVE_CATEGORIES), `move_power` (NaN if none), `move_accuracy` (inf if it never misses)
+    - `moveset_indptr` (n_pokemons + 1,), `moveset_indices`: moveset of the generation in CSR layout,
+      the move ids of pokemon `p` are moveset_indices[moveset_indptr[p]:moveset_indptr[p + 1]].
+      Like the movesets table, a move learnt several ways (ex: at two levels) appears several times.
+    - `nature_names`, `nature_bonus` (n_natures, 6)
+    - `ability_names`, `ability_indptr` (n_pokemons + 1,), `ability_indices`: possible abilities of each pokemon in CSR layout
+    - `defensive_sets`, `offensive_sets` (n_pokemons + n_pokemon_abilities, n_types): type factors of each attack type
+      against, and STAB times ability multiplier of each move type of, a pokemon holding an ability (see `pypkm.data.abilities`).
+      Row `p` is pokemon `p` with no ability effect, row n_pokemons + k the k-th (pokemon, ability) of the CSR (see `set_row`).
+
+    The arrays (and the tables built lazily from them) are read-only: an EncodedTables is an immutable snapshot
+    that any number of threads can read at the same time.
+    """
+    def __init__(self, data) -> None:
+        pokemons = data.pokemons
+        self.types: List[str] = TYPES
+        self.pokemon_names: np.ndarray = pokemons["Name"].to_numpy(dtype=object)
+        self.pokemon_ids: Dict[str, int] = {name: i for i, name in enumerate(self.pokemon_names)}
+        self.pokedex_ids: np.ndarray = pokemons["PokedexId"].to_numpy(dtype=np.int32)
+        self.stats: np.ndarray = pokemons[STATS].to_numpy(dtype=np.int16)
+        self.type1: np.ndarray = _codes(pokemons["Type1"], TYPES)
+        self.type2: np.ndarray = _codes(pokemons["Type2"], TYPES)
+
+        # Type chart, rows are defense types and columns attack types
+        chart = data.types_matix.set_index("Attack Type").loc[TYPES, TYPES]
+        self.type_chart: np.ndarray = chart.to_numpy(dtype=np.float64).T.copy()
+        self.type_charts: np.ndarray = data.type_charts
+        # Defensive vector of each pokemon, same values as PokeData.defensive_matrix
+        self.defensive: np.ndarray = self.type_chart[self.type1] * np.where(
+            (self.type2 == NO_TYPE)[:, None], 1.0, self.type_chart[self.type2]
+        )
+
+        moves = data.moves
+        self.move_names: np.ndarray = moves["Name"].to_numpy(dtype=object)
+        self.move_ids: Dict[str, int] = {name: i for i, name in enumerate(self.move_names)}
+        self.move_type: np.ndarray = _codes(moves["Type"], TYPES)
+        self.move_category: np.ndarray = _codes(moves["Category"], MOVE_CATEGORIES)
+        self.move_power: np.ndarray = moves["Power"].astype("float64").to_numpy(na_value=np.nan)
+        self.move_accuracy: np.ndarray = moves["Accuracy"].to_numpy(dtype=np.float32)
+
+        # Moveset CSR, rows are kept in the order of the movesets table
+        movesets = data.movesets
+        owners = pd.Categorical(movesets["Pokemon"], categories=self.pokemon_names).codes
+        learnt = pd.Categorical(movesets["Move"], categories=self.move_names).codes
+        # Rows referring to unknown pokemons or moves are dropped
+        known = (owners >= 0) & (learnt >= 0)
+        owners, learnt = owners[known], learnt[known]
+        order = np.argsort(owners, kind="stable")
+        self.moveset_indices: np.ndarray = learnt[order].astype(np.int32)
+        self.moveset_indptr: np.ndarray = np.zeros(len(self.pokemon_names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(owners, minlength=len(self.pokemon_names)), out=self.moveset_indptr[1:])
+
+        natures = data.natures
+        self.nature_names: np.ndarray = natures["Nature"].to_numpy(dtype=object)
+        self.nature_ids: Dict[str, int] = {name: i for i, name in enumerate(self.nature_names)}
+        self.nature_bonus: np.ndarray = natures[STATS].to_numpy(dtype=np.float64)
+
+        # Possible abilities of each pokemon, and their effect folded in per-(pokemon, ability) vectors
+        # (none before generation 3, see `pokemon_abilities`)
+        index = pokemon_abilities(data.abilities, data.gen)
+        self.ability_names: np.ndarray = np.array(sorted({a for abilities in index.values() for a in abilities}), dtype=object)
+        self.ability_ids: Dict[str, int] = {name: i for i, name in enumerate(self.ability_names)}
+        held = [[self.ability_ids[a] for a in index.get(name, [])] for name in self.pokemon_names]
+        self.ability_indptr: np.ndarray = np.zeros(len(self.pokemon_names) + 1, dtype=np.int64)
+        np.cumsum([len(h) for h in held], out=self.ability_indptr[1:])
+        self.ability_indices: np.ndarray = np.array([a for h in held for a in h], dtype=np.int32)
+        no_ability = [offensive_vector(self.type1[p], self.type2[p], None) for p in range(len(self.pokemon_names))]
+        self.defensive_sets: np.ndarray = np.vstack([self.defensive] + [
+            defensive_vector(self.defensive[p], self.ability_names[a])[None, :] for p, h in enumerate(held) for a in h
+        ])
+        self.offensive_sets: np.ndarray = np.vstack(no_ability + [
+            offensive_vector(self.type1[p], self.type2[p], self.ability_names[a]) for p, h in enumerate(held) for a in h
+        ])
+
+        for key in ARRAYS:
+            if not key.startswith("damaging_"):
+                _frozen(getattr(self, key))
+        self._lock = threading.RLock()
+        self._damaging_moveset = None
+        self._moves_by_type = None
+        self._lookup = None
+        self._era_defensive_sets = None
+
+    @classmethod
+    def from_arrays(cls, arrays:Dict[str, np.ndarray], names:Dict[str, List[str]]) -> "EncodedTables":
+        """
+        Rebuild tables from the output of `arrays()` and `names()` without copying the arrays
+        (they can be memory-mapped or backed by shared memory, see `pypkm.data.shared`)
+        """
+        enc = cls.__new__(cls)
+        enc.types = TYPES
+        enc._lock = threading.RLock()
+        enc._damaging_moveset = _frozen((arrays["damaging_indptr"], arrays["damaging_indices"]))
+        enc._moves_by_type = None
+        enc._lookup = None
+        enc._era_defensive_sets = None
+        for key in ARRAYS:
+            if not key.startswith("damaging_"):
+                setattr(enc, key, _frozen(arrays[key]))
+        for key in NAMES:
+            setattr(enc, key, np.array(names[key], dtype=object))
+        enc.pokemon_ids = {name: i for i, name in enumerate(enc.pokemon_names)}
+        enc.move_ids = {name: i for i, name in enumerate(enc.move_names)}
+        enc.nature_ids = {name: i for i, name in enumerate(enc.nature_names)}
+        enc.ability_ids = {name: i for i, name in enumerate(enc.ability_names)}
+        return enc
+
+    def _once(self, attr:str, build):
+        """
+        Lazily built table `attr`: built (and made read-only) by the first caller, the others wait for it.
+        The lock is reentrant because some tables are built from others.
+        """
+        value = getattr(self, attr)
+        if value is None:
+            with self._lock:
+                value = getattr(self, attr)
+                if value is None:
+                    value = _frozen(build())
+                    setattr(self, attr, value)
+        return value
+
+    @property
+    def damaging_indptr(self) -> np.ndarray:
+        return self.damaging_moveset()[0]
+
+    @property
+    def damaging_indices(self) -> np.ndarray:
+        return self.damaging_moveset()[1]
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Numeric arrays of the tables, by name
+        """
+        return {key: getattr(self, key) for key in ARRAYS}
+
+    def names(self) -> Dict[str, List[str]]:
+        """
+        Pokemon, move and nature names, by name of array
+        """
+        return {key: list(getattr(self, key)) for key in NAMES}
+
+    def lookup(self) -> NameLookup:
+        """
+        Name lookup index over the pokemon, move, ability and nature names (see `pypkm.data.names`)
+        """
+        return self._once("_lookup", lambda: NameLookup.from_encoded(self))
+
+    def pokemon_id(self, pokemon:Union[int, str]) -> int:
+        """
+        Id of a pokemon given its name, an alias or another spelling of it (or its id)
+        """
+        if isinstance(pokemon, (int, np.integer)):
+            return int(pokemon)
+        if pokemon in self.pokemon_ids:
+            return self.pokemon_ids[pokemon]
+        return self.lookup().pokemons.resolve(pokemon)
+
+    def nature_id(self, nature:str) -> int:
+        """
+        Id of a nature given its name or another spelling of it
+        """
+        if nature in self.nature_ids:
+            return self.nature_ids[nature]
+        return self.lookup().natures.resolve(nature)
+
+    def moveset(self, pokemon:Union[int, str]) -> np.ndarray:
+        """
+        Move ids of the moveset of `pokemon`
+        """
+        p = self.pokemon_id(pokemon)
+        return self.moveset_indices[self.moveset_indptr[p]:self.moveset_indptr[p + 1]]
+
+    def abilities(self, pokemon:Union[int, str]) -> List[str]:
+        """
+        Possible abilities of `pokemon`
+        """
+        p = self.pokemon_id(pokemon)
+        return list(self.ability_names[self.ability_indices[self.ability_indptr[p]:self.ability_indptr[p + 1]]])
+
+    def set_row(self, pokemon:Union[int, str], ability:Optional[str] = None) -> int:
+        """
+        Row of `defensive_sets` and `offensive_sets` of `pokemon` holding `ability`
+        (no ability effect if None), KeyError if the pokemon cannot have this ability
+        """
+        p = self.pokemon_id(pokemon)
+        if ability is None:
+            return p
+        held = self.ability_indices[self.ability_indptr[p]:self.ability_indptr[p + 1]]
+        matches = np.flatnonzero(held == self.lookup().abilities.get(ability, -1))
+        if len(matches) == 0:
+            raise KeyError(f"{self.pokemon_names[p]} cannot have the ability {ability}")
+        return len(self.pokemon_names) + int(self.ability_indptr[p]) + int(matches[0])
+
+    def era_defensive_sets(self) -> np.ndarray:
+        """
+        (n_eras, rows of `defensive_sets`, n_types): `defensive_sets` with the type chart of every era
+        """
+        return self._once("_era_defensive_sets", self._build_era_defensive_sets)
+
+    def _build_era_defensive_sets(self) -> np.ndarray:
+        defensive = defensive_by_era(self.type_charts, self.type1, self.type2)
+        owners = np.repeat(np.arange(len(self.pokemon_names)), np.diff(self.ability_indptr))
+        return np.concatenate([defensive] + [
+            defensive_vector(defensive[:, p], self.ability_names[a])[:, None, :] for p, a in zip(owners, self.ability_indices)
+        ], axis=1)
+
+    def damaging_moveset(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (indptr, indices) CSR of the movesets restricted to moves with a power
+        """
+        return self._once("_damaging_moveset", self._build_damaging_moveset)
+
+    def _build_damaging_moveset(self) -> Tuple[np.ndarray, np.ndarray]:
+        keep = ~np.isnan(self.move_power[self.moveset_indices])
+        owners = np.repeat(np.arange(len(self.pokemon_names)), np.diff(self.moveset_indptr))[keep]
+        indptr = np.zeros_like(self.moveset_indptr)
+        np.cumsum(np.bincount(owners, minlength=len(self.pokemon_names)), out=indptr[1:])
+        return indptr, self.moveset_indices[keep]
+
+    def moves_by_type(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (n_pokemons, n_types) best power and number of physical or special moves of each type in each moveset
+        """
+        return self._once("_moves_by_type", self._build_moves_by_type)
+
+    def _build_moves_by_type(self) -> Tuple[np.ndarray, np.ndarray]:
+        indptr, indices = self.damaging_moveset()
+        owners = np.repeat(np.arange(len(self.pokemon_names)), np.diff(indptr))
+        category = self.move_category[indices]
+        keep = (category == PHYSICAL) | (category == SPECIAL)
+        owners, moves = owners[keep], indices[keep]
+        best = np.zeros((len(self.pokemon_names), len(TYPES)))
+        count = np.zeros((len(self.pokemon_names), len(TYPES)), dtype=np.int64)
+        np.maximum.at(best, (owners, self.move_type[moves]), self.move_power[moves])
+        np.add.at(count, (owners, self.move_type[moves]), 1)
+        return best, count
@@ -0,0 +1,172 @@
+"""
+Metagame equilibrium of a pool of pokemon sets (or teams of them) over the batched matchup scores.
+
+The payoff of picking `i` against `j` is the net matchup advantage
+matchup_score(i, j) - matchup_score(j, i), which makes the game zero-sum and symmetric.
+Its mixed-strategy equilibrium gives the picks that are robust against everything else in the pool:
+no pick of the pool has a positive expected payoff against it.
+
+    battle = BatchBattle(PokeData(gen = 9))
+    pool = battle.encode_sets([{"pokemon": name} for name in names])
+    payoff = payoff_matrix(battle, pool)
+    eq = solve_zero_sum(payoff)
+    eq.support(names)
+
+Pools of a few thousand sets fit a dense payoff matrix (n x n float32).
+For larger pools, `prune_pool` keeps the candidates that do best against a sample of the pool first.
+"""
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Sequence
+from pypkm.data.batch import BatchBattle, PokemonSets
+
+def one_sided_scores(battle:BatchBattle, attackers:PokemonSets, defenders:PokemonSets, chunk_size:int = 100000) -> np.ndarray:
+    """
+    (len(attackers), len(defenders)) one-sided scores (see BatchBattle.scores) of every attacker against every defender,
+    computed by chunks of `chunk_size` pairs. NaN when the attacker has no damaging move.
+    """
+    n, m = len(attackers), len(defenders)
+    atk_stats = battle.stats(attackers)
+    def_stats = battle.stats(defenders)
+    scores = np.empty(n * m, dtype=np.float32)
+    for start in range(0, n * m, chunk_size):
+        flat = np.arange(start, min(start + chunk_size, n * m))
+        i, j = flat // m, flat % m
+        scores[flat] = battle.scores(
+            attackers.ids[i], atk_stats[i], attackers.levels[i],
+            defenders.ids[j], def_stats[j],
+            attackers.rows[i], defenders.rows[j]
+        )
+    return scores.reshape(n, m)
+
+def payoff_matrix(
+    battle:BatchBattle, pool:PokemonSets, atk_bias:float = 0.25, def_bias:float = 0.75, chunk_size:int = 100000
+) -> np.ndarray:
+    """
+    (n, n) antisymmetric payoff matrix of the pool: matchup_score(i, j) - matchup_score(j, i)
+    Each ordered pair is only scored once (matchup_score combines the two one-sided scores).
+    Sets without damaging moves score 0.
+    """
+    S = np.nan_to_num(one_sided_scores(battle, pool, pool, chunk_size), nan=0.0)
+    # matchup_score(i, j) = def_bias * S[i, j] + atk_bias * S[j, i]
+    M = def_bias * S + atk_bias * S.T
+    return (M - M.T).astype(np.float32)
+
+def team_payoff(payoff:np.ndarray, teams:Sequence[Sequence[int]]) -> np.ndarray:
+    """
+    (n_teams, n_teams) payoff between teams (lists of pool indices): mean payoff of their members against each other
+    """
+    membership = np.zeros((len(teams), payoff.shape[0]), dtype=np.float32)
+    for t, members in enumerate(teams):
+        membership[t, list(members)] = 1.0 / len(members)
+    return membership @ payoff @ membership.T
+
+def prune_pool(
+    battle:BatchBattle, pool:PokemonSets, k:int, sample:int = 256, seed:Optional[int] = 0,
+    atk_bias:float = 0.25, def_bias:float = 0.75
+) -> np.ndarray:
+    """
+    Indices of the `k` sets of the pool with the best mean net matchup against a random sample of `sample` sets of the pool
+    (n x sample scores instead of n x n), to solve the equilibrium of large pools on the strongest candidates only
+    """
+    rng = np.random.default_rng(seed)
+    opponents = pool[rng.choice(len(pool), size=min(sample, len(pool)), replace=False)]
+    offense = np.nan_to_num(one_sided_scores(battle, pool, opponents), nan=0.0)
+    defense = np.nan_to_num(one_sided_scores(battle, opponents, pool), nan=0.0).T
+    net = (def_bias - atk_bias) * (offense - defense)
+    return np.sort(np.argsort(-net.mean(axis=1), kind="stable")[:k])
+
+class Equilibrium(object):
+    """
+    Approximate equilibrium of a zero-sum game:
+    `row`/`col` mixed strategies of the row (maximizing) and column players, `value` payoff of the row player,
+    `gap` exploitability (best response payoff of the row player minus best response payoff of the column player,
+    0 at the exact equilibrium), `history` gap every `check_every` iterations
+    """
+    def __init__(self, row:np.ndarray, col:np.ndarray, value:float, gap:float, iterations:int, converged:bool, history:List[float]) -> None:
+        self.row = row
+        self.col = col
+        self.value = value
+        self.gap = gap
+        self.iterations = iterations
+        self.converged = converged
+        self.history = history
+
+    def support(self, names:Optional[Sequence[str]] = None, threshold:float = 1e-3) -> pd.Series:
+        """
+        Probability of the picks of the row strategy above `threshold`, in decreasing order
+        """
+        index = names if names is not None else range(len(self.row))
+        s = pd.Series(self.row, index=index)
+        return s[s > threshold].sort_values(ascending=False)
+
+    def __repr__(self) -> str:
+        return f"Equilibrium(value={self.value:.4f}, gap={self.gap:.2e}, iterations={self.iterations}, converged={self.converged}, support={(self.row > 1e-3).sum()})"
+
+def _gap(A:np.ndarray, x:np.ndarray, y:np.ndarray) -> float:
+    return float((A @ y).max() - (x @ A).min())
+
+def solve_zero_sum(
+    A:np.ndarray, method:str = "regret", iterations:int = 10000, tol:float = 1e-4, check_every:int = 50
+) -> Equilibrium:
+    """
+    Approximate the equilibrium of the zero-sum game of payoff matrix `A` (row player maximizes)
+    - "regret": alternating regret matching+ with linearly weighted averages, fast in practice
+    - "fictitious": fictitious play, both players best respond to the average strategy of the other
+    Each iteration costs two matrix-vector products. Stop once the gap is below `tol` (relative to the payoff scale).
+    """
+    if iterations < 1:
+        raise ValueError(f"iterations should be at least 1, got {iterations}")
+    A = np.asarray(A, dtype=np.float64)
+    n, m = A.shape
+    scale = max(float(np.abs(A).max()), 1e-12)
+    history = []
+    if method == "regret":
+        Rx, Ry = np.zeros(n), np.zeros(m)
+        x_sum, y_sum = np.zeros(n), np.zeros(m)
+        x, y = np.full(n, 1.0 / n), np.full(m, 1.0 / m)
+        for t in range(1, iterations + 1):
+            # Row player update against the current column strategy
+            u = A @ y
+            Rx = np.maximum(Rx + u - x @ u, 0.0)
+            x = Rx / Rx.sum() if Rx.sum() > 0 else np.full(n, 1.0 / n)
+            x_sum += t * x
+            # Column player (minimizer) update against the new row strategy
+            v = x @ A
+            Ry = np.maximum(Ry - v + v @ y, 0.0)
+            y = Ry / Ry.sum() if Ry.sum() > 0 else np.full(m, 1.0 / m)
+            y_sum += t * y
+            if t % check_every == 0 or t == iterations:
+                gap = _gap(A, x_sum / x_sum.sum(), y_sum / y_sum.sum())
+                history.append(gap)
+                if gap <= tol * scale:
+                    break
+        x_avg, y_avg = x_sum / x_sum.sum(), y_sum / y_sum.sum()
+    elif method == "fictitious":
+        x_count, y_count = np.zeros(n), np.zeros(m)
+        x_count[0] = 1
+        y_count[0] = 1
+        # Payoffs of each pure strategy against the running sums of the other player's picks
+        row_payoff = A[:, 0].copy()
+        col_payoff = A[0, :].copy()
+        for t in range(1, iterations + 1):
+            i = int(np.argmax(row_payoff))
+            j = int(np.argmin(col_payoff))
+            x_count[i] += 1
+            y_count[j] += 1
+            row_payoff += A[:, j]
+            col_payoff += A[i, :]
+            if t % check_every == 0 or t == iterations:
+                gap = _gap(A, x_count / x_count.sum(), y_count / y_count.sum())
+                history.append(gap)
+                if gap <= tol * scale:
+                    break
+        x_avg, y_avg = x_count / x_count.sum(), y_count / y_count.sum()
+    else:
+        raise ValueError(f"Unknown method {method}, expected 'regret' or 'fictitious'")
+
+    gap = _gap(A, x_avg, y_avg)
+    return Equilibrium(
+        row=x_avg, col=y_avg, value=float(x_avg @ A @ y_avg), gap=gap,
+        iterations=t, converged=gap <= tol * scale, history=history
+    )
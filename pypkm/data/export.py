@@ -0,0 +1,279 @@
+"""
+Export of derived results as Arrow IPC or Parquet tables, so that downstream tools read columns instead of parsing csv.
+
+Each table is a directory of part files (part-00000.arrow, ...), written batch by batch:
+a large table (ex: the all-pairs damage matrix) never sits fully in memory, each batch is a record batch (IPC)
+or a row group (Parquet). Pokemon, move and type names are dictionary-encoded (int32 indices and one dictionary).
+Arrow IPC parts can be memory-mapped and read zero-copy with `read_table`.
+
+- `defensive_matrix`: type factor of each attack type against each type combination (PokeData.defensive_matrix)
+- `damage`: every (attacker, defender) of the roster: one-sided score, best damage (%) and move, number of 100% moves
+- `speed_tiers`: Speed of each pokemon at each level, slowest (0 IV, 0 EV, hindering nature) to fastest (252 EV, boosting nature)
+- `learnability`: the (pokemon, move) pairs of the movesets of the generation, with the move type, category and power
+
+    export_results(PokeData(gen = 9), "results", format="ipc")
+    read_table("results/damage").to_pandas()
+
+pyarrow is an optional dependency (pip install pyarrow).
+"""
+import os
+import numpy as np
+from typing import Iterator, List, Optional, Sequence
+from pypkm.data import PokeData
+from pypkm.data.schema import TYPES, STATS, MOVE_CATEGORIES
+from pypkm.data.encoded import NO_TYPE
+from pypkm.data.batch import BatchBattle, PokemonSets, compute_stats, entry_scores, SPEED
+from pypkm.data.sampler import distinct_moveset
+
+FORMATS = {"ipc": ".arrow", "parquet": ".parquet"}
+TABLES = ["defensive_matrix", "damage", "speed_tiers", "learnability"]
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Arrow/Parquet export requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+def _dictionary(pa, indices:np.ndarray, dictionary):
+    # Missing values are negative indices
+    indices = np.asarray(indices, dtype=np.int32)
+    return pa.DictionaryArray.from_arrays(pa.array(indices, mask=indices < 0), dictionary)
+
+def _is_part(file:str) -> bool:
+    return file.startswith("part-") and file.endswith(tuple(FORMATS.values()))
+
+class TableWriter(object):
+    """
+    Streaming writer of record batches to a table directory, starting a new part file every `rows_per_file` rows
+    (one file if None). The part files of a previous export in the directory are removed first.
+    """
+    def __init__(self, directory:str, schema, format:str = "ipc", rows_per_file:Optional[int] = None) -> None:
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format}, expected one of {list(FORMATS)}")
+        self.pa = _pyarrow()
+        self.directory = directory
+        self.schema = schema
+        self.format = format
+        self.rows_per_file = rows_per_file
+        self.files: List[str] = []
+        self._writer = None
+        self._rows = 0
+        os.makedirs(directory, exist_ok=True)
+        # Stale parts of a previous export would be read back along with the new ones
+        for file in os.listdir(directory):
+            if _is_part(file):
+                os.remove(os.path.join(directory, file))
+
+    def _open(self) -> None:
+        path = os.path.join(self.directory, f"part-{len(self.files):05d}{FORMATS[self.format]}")
+        if self.format == "ipc":
+            self._writer = self.pa.ipc.new_file(path, self.schema)
+        else:
+            self._writer = self.pa.parquet.ParquetWriter(path, self.schema)
+        self.files.append(path)
+        self._rows = 0
+
+    def write(self, batch) -> None:
+        if self._writer is None or (self.rows_per_file is not None and self._rows >= self.rows_per_file):
+            self.close()
+            self._open()
+        if self.format == "ipc":
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write_table(self.pa.Table.from_batches([batch]))
+        self._rows += batch.num_rows
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def read_table(directory:str):
+    """
+    pyarrow Table of the part files of a table directory, memory-mapped (zero-copy for Arrow IPC)
+    """
+    pa = _pyarrow()
+    tables = []
+    for file in sorted(filter(_is_part, os.listdir(directory))):
+        path = os.path.join(directory, file)
+        if file.endswith(FORMATS["ipc"]):
+            tables.append(pa.ipc.open_file(pa.memory_map(path, "r")).read_all())
+        elif file.endswith(FORMATS["parquet"]):
+            tables.append(pa.parquet.read_table(path, memory_map=True))
+    return pa.concat_tables(tables)
+
+def defensive_matrix_batches(data:PokeData) -> Iterator:
+    """
+    One record batch: Type1, Type2 (null for monotypes) and the type factor of each attack type
+    """
+    pa = _pyarrow()
+    types = pa.array(TYPES)
+    chart = data.encoded().type_chart
+    pairs = [(t1, t2) for t1 in range(len(TYPES)) for t2 in [NO_TYPE] + list(range(t1 + 1, len(TYPES)))]
+    t1 = np.array([p[0] for p in pairs])
+    t2 = np.array([p[1] for p in pairs])
+    factors = chart[t1] * np.where((t2 == NO_TYPE)[:, None], 1.0, chart[t2])
+    columns = [_dictionary(pa, t1, types), _dictionary(pa, t2, types)] + [pa.array(factors[:, k].astype(np.float32)) for k in range(len(TYPES))]
+    yield pa.RecordBatch.from_arrays(columns, names=["Type1", "Type2"] + TYPES)
+
+def damage_batches(
+    battle:BatchBattle, attackers:PokemonSets, defenders:PokemonSets, chunk_size:int = 500000
+) -> Iterator:
+    """
+    Record batches of every (attacker, defender) pair, attacker-major, `chunk_size` pairs at a time:
+    Attacker, Defender, Score (one-sided score), BestDamage (%), BestMove and KOs (moves dealing 100% or more)
+    """
+    pa = _pyarrow()
+    enc = battle.enc
+    names = pa.array(list(enc.pokemon_names))
+    moves = pa.array(list(enc.move_names))
+    atk_stats = battle.stats(attackers)
+    def_stats = battle.stats(defenders)
+    n, m = len(attackers), len(defenders)
+    for start in range(0, n * m, chunk_size):
+        flat = np.arange(start, min(start + chunk_size, n * m))
+        i, j = flat // m, flat % m
+        pair, move, _, damage_pct = battle.damage(
+            attackers.ids[i], atk_stats[i], attackers.levels[i], defenders.ids[j], def_stats[j], attackers.rows[i], defenders.rows[j]
+        )
+        rows = len(flat)
+        valid = ~np.isnan(damage_pct)
+        pair, move, pct = pair[valid], move[valid], damage_pct[valid]
+        # Best move of each pair: last entry of its group once sorted by damage
+        order = np.lexsort((pct, pair))
+        last = order[np.r_[pair[order][1:] != pair[order][:-1], True]] if len(order) > 0 else order
+        best = np.full(rows, np.nan, dtype=np.float32)
+        best_move = np.full(rows, -1, dtype=np.int32)
+        best[pair[last]] = pct[last]
+        best_move[pair[last]] = move[last]
+        yield pa.RecordBatch.from_arrays([
+            _dictionary(pa, attackers.ids[i], names),
+            _dictionary(pa, defenders.ids[j], names),
+            pa.array(entry_scores(pair, pct, rows).astype(np.float32)),
+            pa.array(best),
+            _dictionary(pa, best_move, moves),
+            pa.array(np.bincount(pair, weights=pct >= 100, minlength=rows).astype(np.int16))
+        ], names=["Attacker", "Defender", "Score", "BestDamage", "BestMove", "KOs"])
+
+def speed_tiers_batches(data:PokeData, levels:Sequence[int] = (50, 100)) -> Iterator:
+    """
+    One record batch per level: Level, Pokemon, BaseSpeed, MinSpeed, NeutralSpeed (31 IV, 0 EV, neutral nature),
+    MaxSpeed (31 IV, 252 EV, boosting nature), fastest first
+    """
+    pa = _pyarrow()
+    enc = data.encoded()
+    names = pa.array(list(enc.pokemon_names))
+    n = len(enc.pokemon_names)
+    neutral = np.ones((n, len(STATS)))
+    spreads = {
+        "MinSpeed": (0, 0, 0.9),
+        "NeutralSpeed": (31, 0, 1.0),
+        "MaxSpeed": (31, 252, 1.1)
+    }
+    for level in levels:
+        speeds = {}
+        for column, (iv, ev, bonus) in spreads.items():
+            IVs = np.full((n, len(STATS)), iv)
+            EVs = np.full((n, len(STATS)), ev)
+            stats = compute_stats(enc.stats, neutral * bonus, np.full(n, level), IVs, EVs)
+            speeds[column] = stats[:, SPEED].astype(np.int16)
+        order = np.lexsort((enc.stats[:, SPEED], -speeds["MaxSpeed"].astype(np.int64)))
+        yield pa.RecordBatch.from_arrays([
+            pa.array(np.full(n, level, dtype=np.int16)),
+            _dictionary(pa, order, names),
+            pa.array(enc.stats[order, SPEED].astype(np.int16))
+        ] + [pa.array(speeds[column][order]) for column in spreads], names=["Level", "Pokemon", "BaseSpeed"] + list(spreads))
+
+def learnability_batches(data:PokeData, chunk_size:int = 1000000) -> Iterator:
+    """
+    Record batches of the distinct (pokemon, move) pairs of the movesets: Pokemon, Move, Type, Category, Power
+    """
+    pa = _pyarrow()
+    enc = data.encoded()
+    names = pa.array(list(enc.pokemon_names))
+    moves = pa.array(list(enc.move_names))
+    types = pa.array(TYPES)
+    categories = pa.array(MOVE_CATEGORIES)
+    indptr, indices = distinct_moveset(enc)
+    owners = np.repeat(np.arange(len(enc.pokemon_names)), np.diff(indptr))
+    for start in range(0, len(indices), chunk_size):
+        p, mv = owners[start:start + chunk_size], indices[start:start + chunk_size]
+        power = enc.move_power[mv]
+        yield pa.RecordBatch.from_arrays([
+            _dictionary(pa, p, names),
+            _dictionary(pa, mv, moves),
+            _dictionary(pa, enc.move_type[mv], types),
+            _dictionary(pa, enc.move_category[mv], categories),
+            pa.array(np.nan_to_num(power).astype(np.int16), mask=np.isnan(power))
+        ], names=["Pokemon", "Move", "Type", "Category", "Power"])
+
+def _roster_sets(enc, ids:np.ndarray, level:int) -> PokemonSets:
+    # Hardy (neutral) nature, no IVs nor EVs
+    n = len(ids)
+    zeros = np.zeros((n, len(STATS)), dtype=np.int16)
+    natures = np.full(n, enc.nature_id("Hardy"), dtype=np.int16)
+    return PokemonSets(ids.astype(np.int32), natures, np.full(n, level, dtype=np.int16), zeros, zeros)
+
+def write_batches(batches:Iterator, directory:str, format:str = "ipc", rows_per_file:Optional[int] = None) -> List[str]:
+    """
+    Write record batches to a table directory, return the part files
+    """
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = TableWriter(directory, batch.schema, format, rows_per_file)
+            writer.write(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return writer.files if writer is not None else []
+
+def export_results(
+    data:PokeData, directory:str, format:str = "ipc", tables:Sequence[str] = TABLES,
+    level:int = 100, chunk_size:int = 500000, rows_per_file:Optional[int] = 5000000
+) -> List[str]:
+    """
+    Write the derived `tables` of `data` in `directory` (one sub-directory per table), return the part files.
+    The damage table scores every pokemon with a moveset against the whole roster at `level` (no IVs, EVs nor ability).
+    """
+    files = []
+    for table in tables:
+        path = os.path.join(directory, table)
+        if table == "defensive_matrix":
+            batches = defensive_matrix_batches(data)
+        elif table == "damage":
+            battle = BatchBattle(data)
+            enc = battle.enc
+            roster = np.arange(len(enc.pokemon_names))
+            attackers = roster[np.diff(enc.moveset_indptr) > 0]
+            batches = damage_batches(battle, _roster_sets(enc, attackers, level), _roster_sets(enc, roster, level), chunk_size)
+        elif table == "speed_tiers":
+            batches = speed_tiers_batches(data)
+        elif table == "learnability":
+            batches = learnability_batches(data)
+        else:
+            raise ValueError(f"Unknown table {table}, expected one of {TABLES}")
+        files += write_batches(batches, path, format, rows_per_file)
+    return files
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Export derived tables of a generation as Arrow IPC or Parquet files")
+    parser.add_argument("directory")
+    parser.add_argument("--gen", type=int, default=9)
+    parser.add_argument("--format", choices=list(FORMATS), default="ipc")
+    parser.add_argument("--tables", nargs="+", choices=TABLES, default=TABLES)
+    parser.add_argument("--level", type=int, default=100)
+    args = parser.parse_args()
+    for file in export_results(PokeData(gen = args.gen), args.directory, args.format, args.tables, args.level):
+        print(file)
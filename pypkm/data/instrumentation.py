@@ -0,0 +1,175 @@
+"""
+Opt-in instrumentation of the PokeData and BattleData hot paths:
+per-function timers, call counters and cache hit rates.
+
+Disabled by default, in which case instrumented functions only pay a flag check.
+Enable it for the whole process with the environment variable PYPKM_INSTRUMENT=1, or around a block:
+
+    with instrument(profile="find_matchup.prof") as report:
+        battle.find_matchup(pokemon, team)
+    print(report["timers"]["BattleData.matchup"])
+    print(prometheus())
+"""
+import os
+import time
+import cProfile
+import threading
+import functools
+import contextlib
+from typing import Callable, Dict, List, Optional
+
+_enabled: bool = os.environ.get("PYPKM_INSTRUMENT", "0").lower() not in ("", "0", "false", "no")
+_lock = threading.Lock()
+# name -> [calls, total seconds, max seconds]
+_timers: Dict[str, List[float]] = {}
+# name -> [hits, misses]
+_caches: Dict[str, List[int]] = {}
+
+def is_enabled() -> bool:
+    return _enabled
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+def reset() -> None:
+    """
+    Clear all counters
+    """
+    with _lock:
+        _timers.clear()
+        _caches.clear()
+
+def _record(name:str, elapsed:float) -> None:
+    with _lock:
+        t = _timers.get(name)
+        if t is None:
+            _timers[name] = [1, elapsed, elapsed]
+        else:
+            t[0] += 1
+            t[1] += elapsed
+            t[2] = max(t[2], elapsed)
+
+def record_cache(name:str, hit:bool) -> None:
+    """
+    Count a hit (or a miss) of the cache `name`
+    """
+    if not _enabled:
+        return
+    with _lock:
+        c = _caches.setdefault(name, [0, 0])
+        c[0 if hit else 1] += 1
+
+class _Section(object):
+    __slots__ = ("name", "start")
+
+    def __init__(self, name:str) -> None:
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        _record(self.name, time.perf_counter() - self.start)
+        return False
+
+# Shared no-op context returned by `section` when disabled
+_NULL_SECTION = contextlib.nullcontext()
+
+def section(name:str):
+    """
+    Context manager timing a block of code under `name` (ex: "BattleData.matchup.damage")
+    """
+    if not _enabled:
+        return _NULL_SECTION
+    return _Section(name)
+
+def timed(name:Optional[str] = None) -> Callable:
+    """
+    Decorator timing and counting the calls of a function, under `name` or the function's qualified name
+    """
+    def decorator(func:Callable) -> Callable:
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def counters() -> dict:
+    """
+    Snapshot of all counters as a dictionary:
+    {"timers": {name: {"calls", "total", "mean", "max"}}, "caches": {name: {"hits", "misses", "hit_rate"}}}
+    Timers are inclusive: the time of a function includes the time of the instrumented functions it calls.
+    """
+    with _lock:
+        return {
+            "timers": {
+                name: {"calls": int(calls), "total": total, "mean": total / calls, "max": longest}
+                for name, (calls, total, longest) in _timers.items()
+            },
+            "caches": {
+                name: {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+                for name, (hits, misses) in _caches.items()
+            }
+        }
+
+def prometheus(prefix:str = "pypkm") -> str:
+    """
+    All counters in the Prometheus text exposition format
+    """
+    c = counters()
+    metrics = [
+        ("calls_total", "Number of calls of instrumented functions", "name", c["timers"], "calls"),
+        ("seconds_total", "Total time spent in instrumented functions", "name", c["timers"], "total"),
+        ("seconds_max", "Longest call of instrumented functions", "name", c["timers"], "max"),
+        ("cache_hits_total", "Number of cache hits", "cache", c["caches"], "hits"),
+        ("cache_misses_total", "Number of cache misses", "cache", c["caches"], "misses"),
+    ]
+    lines = []
+    for metric, help, label, values, field in metrics:
+        kind = "gauge" if metric.endswith("_max") else "counter"
+        lines.append(f"# HELP {prefix}_{metric} {help}")
+        lines.append(f"# TYPE {prefix}_{metric} {kind}")
+        for name, v in values.items():
+            escaped = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{prefix}_{metric}{{{label}="{escaped}"}} {v[field]}')
+    return "\n".join(lines) + "\n"
+
+@contextlib.contextmanager
+def instrument(profile:Optional[str] = None, reset_counters:bool = True):
+    """
+    Enable instrumentation inside the block.
+    The yielded dictionary is filled with `counters()` when the block exits.
+    If `profile` is a path, the block is also run under cProfile and the stats are dumped to that file
+    (read them with `python -m pstats <path>` or snakeviz).
+    """
+    global _enabled
+    previous = _enabled
+    if reset_counters:
+        reset()
+    report = {}
+    profiler = cProfile.Profile() if profile is not None else None
+    _enabled = True
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield report
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        _enabled = previous
+        report.update(counters())
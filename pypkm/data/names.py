@@ -0,0 +1,207 @@
+"""
+Lookup index over pokemon, move, ability and nature names, to resolve user input to canonical names and ids.
+
+Names are matched on a normalized key (lowercase, no accent, no punctuation nor space, ♀/♂ as f/m),
+so that "garchomp", "Porygon Z" or "nidoran-f" resolve. Pokemon forms also get aliases:
+- the form alone when it names the pokemon: "Mega Charizard X", "Alolan Raichu"
+- the "<base>-<form>" spelling of the simulators: "Charizard-Mega-X", "Raichu-Alola", "Landorus-Therian"
+- the base name for the default form when the base has no row: "Landorus" -> "Landorus Incarnate Forme"
+A resolution is one dictionary lookup. `complete` finds the names starting with a prefix by bisection of the sorted keys,
+and `search` ranks approximate matches by the trigrams they share with the input.
+
+    names = PokeData(gen = 9).names()
+    names.pokemons.canonical("charizard-mega-x")   # "Charizard Mega Charizard X"
+    names.moves.complete("thunder")                 # ["Thunder", "Thunder Cage", "Thunder Fang", ...]
+    names.pokemons.search("garchomb")               # [("Garchomp", 0.75), ...]
+"""
+import bisect
+import unicodedata
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# Regional adjectives and their suffix in the "<base>-<form>" spelling
+REGIONS = {"Alolan": "Alola", "Galarian": "Galar", "Hisuian": "Hisui", "Paldean": "Paldea"}
+# Words dropped from the "<base>-<form>" spelling
+FORM_WORDS = {"Forme", "Form", "Mode", "Style", "Cloak", "Size"}
+
+def normalize(name:str) -> str:
+    """
+    Lookup key of a name: "Nidoran♀" -> "nidoranf", "Flabébé" -> "flabebe", "Porygon-Z" -> "porygonz"
+    """
+    name = name.replace("♀", "f").replace("♂", "m")
+    name = unicodedata.normalize("NFKD", name).lower()
+    return "".join(c for c in name if c.isascii() and c.isalnum())
+
+def _trigrams(key:str) -> List[str]:
+    padded = f"^{key}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def _dedupe_words(words:List[str]) -> List[str]:
+    # "Hoopa Hoopa" -> "Hoopa"
+    return [w for i, w in enumerate(words) if i == 0 or w != words[i - 1]]
+
+def form_aliases(names:Sequence[str], pokedex_ids:Sequence[int]) -> Dict[str, str]:
+    """
+    Aliases of the pokemon forms, by alias (see module docstring).
+    Forms are the names sharing a pokedex id, their base name is the words they all start with.
+    """
+    groups: Dict[int, List[str]] = {}
+    for name, dex in zip(names, pokedex_ids):
+        groups.setdefault(int(dex), []).append(name)
+    canonical = set(names)
+    aliases: Dict[str, str] = {}
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        words = [name.split(" ") for name in group]
+        common = 0
+        while all(len(w) > common for w in words) and len({w[common] for w in words}) == 1:
+            common += 1
+        base_words = _dedupe_words(words[0][:common])
+        if len(base_words) == 0:
+            continue
+        base = " ".join(base_words)
+        if base not in canonical:
+            # Default form (first of the pokedex id)
+            aliases.setdefault(base, group[0])
+        for name in group:
+            rest = name.split(" ")[len(base_words):]
+            if len(rest) == 0:
+                continue
+            if base in " ".join(rest):
+                aliases.setdefault(" ".join(rest), name)
+            suffix = [REGIONS.get(w, w) for w in rest if w not in FORM_WORDS and w not in base_words]
+            if len(suffix) > 0:
+                aliases.setdefault("-".join([base] + suffix), name)
+    return aliases
+
+class NameIndex(object):
+    """
+    Index of one kind of names (pokemons, moves, ...): canonical names are referred to by their position (id) in `names`
+    """
+    def __init__(self, kind:str, names:Sequence[str], aliases:Optional[Dict[str, str]] = None) -> None:
+        self.kind = kind
+        self.names: List[str] = list(names)
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        # Normalized key -> id, canonical names first so that an alias never shadows a name
+        self.keys: Dict[str, int] = {}
+        for i, name in enumerate(self.names):
+            self.keys.setdefault(normalize(name), i)
+        # An alias claimed by several names is ambiguous and dropped
+        claims: Dict[str, set] = {}
+        for alias, name in (aliases or {}).items():
+            claims.setdefault(normalize(alias), set()).add(self.ids[name])
+        self.ambiguous: List[str] = []
+        for key, ids in claims.items():
+            if key in self.keys or key == "":
+                continue
+            if len(ids) > 1:
+                self.ambiguous.append(key)
+                continue
+            self.keys[key] = ids.pop()
+
+        # Sorted keys for prefix search, trigram postings for approximate search
+        self._sorted: List[str] = sorted(self.keys)
+        self._sorted_ids: np.ndarray = np.array([self.keys[k] for k in self._sorted], dtype=np.int32)
+        self._grams: Dict[str, List[int]] = {}
+        for position, key in enumerate(self._sorted):
+            for gram in set(_trigrams(key)):
+                self._grams.setdefault(gram, []).append(position)
+        self._n_grams: np.ndarray = np.array([len(set(_trigrams(k))) for k in self._sorted], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name:str) -> bool:
+        return self.get(name) is not None
+
+    def get(self, name:str, default:Optional[int] = None) -> Optional[int]:
+        """
+        Id of `name` (canonical name, alias or any spelling with the same normalized key), `default` if unknown
+        """
+        i = self.ids.get(name)
+        if i is None:
+            i = self.keys.get(normalize(name))
+        return default if i is None else i
+
+    def resolve(self, name:Union[int, str]) -> int:
+        """
+        Id of `name`, KeyError listing the closest names if unknown
+        """
+        if isinstance(name, (int, np.integer)):
+            return int(name)
+        i = self.get(name)
+        if i is None:
+            suggestions = [n for n, _ in self.search(name, limit=3)]
+            hint = f", did you mean {', '.join(suggestions)}?" if suggestions else ""
+            raise KeyError(f"Unknown {self.kind} {name}{hint}")
+        return i
+
+    def canonical(self, name:str) -> str:
+        """
+        Canonical name of `name`, KeyError if unknown
+        """
+        return self.names[self.resolve(name)]
+
+    def complete(self, prefix:str, limit:int = 10) -> List[str]:
+        """
+        Canonical names of which a spelling starts with `prefix`, in order of the matching keys
+        """
+        key = normalize(prefix)
+        start = bisect.bisect_left(self._sorted, key)
+        found: List[str] = []
+        seen = set()
+        for position in range(start, len(self._sorted)):
+            if not self._sorted[position].startswith(key) or len(found) >= limit:
+                break
+            i = int(self._sorted_ids[position])
+            if i not in seen:
+                seen.add(i)
+                found.append(self.names[i])
+        return found
+
+    def search(self, text:str, limit:int = 5, cutoff:float = 0.3) -> List[Tuple[str, float]]:
+        """
+        Canonical names closest to `text` with their similarity (Dice coefficient of the trigrams of the keys),
+        best first and at least `cutoff`
+        """
+        grams = set(_trigrams(normalize(text)))
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._grams.get(gram, []))
+        if len(shared) == 0:
+            return []
+        positions = np.fromiter(shared.keys(), dtype=np.int64, count=len(shared))
+        counts = np.fromiter(shared.values(), dtype=np.float64, count=len(shared))
+        scores = 2 * counts / (len(grams) + self._n_grams[positions])
+        found: List[Tuple[str, float]] = []
+        seen = set()
+        for j in np.argsort(-scores, kind="stable"):
+            if scores[j] < cutoff or len(found) >= limit:
+                break
+            i = int(self._sorted_ids[positions[j]])
+            if i not in seen:
+                seen.add(i)
+                found.append((self.names[i], float(scores[j])))
+        return found
+
+class NameLookup(object):
+    """
+    Name indexes of the pokemons (with form aliases), moves, abilities and natures
+    """
+    def __init__(
+        self, pokemon_names:Sequence[str], pokedex_ids:Sequence[int],
+        move_names:Sequence[str], ability_names:Sequence[str], nature_names:Sequence[str]
+    ) -> None:
+        self.pokemons = NameIndex("pokemon", pokemon_names, form_aliases(pokemon_names, pokedex_ids))
+        self.moves = NameIndex("move", move_names)
+        self.abilities = NameIndex("ability", ability_names)
+        self.natures = NameIndex("nature", nature_names)
+
+    @classmethod
+    def from_encoded(cls, enc) -> "NameLookup":
+        """
+        Lookup over the names of EncodedTables (ids are the same as theirs)
+        """
+        return cls(enc.pokemon_names, enc.pokedex_ids, enc.move_names, enc.ability_names, enc.nature_names)
@@ -0,0 +1,126 @@
+"""
+Pareto dominance (skyline) of pokemons over their stats.
+
+A pokemon is strictly dominated by another one of the same type that has better or equal stats everywhere
+(and better somewhere): there is no stat reason to pick it over its dominator.
+The skyline is the set of non-dominated pokemons (front 0), front k the skyline once fronts 0..k-1 are removed.
+
+A dominator has a strictly greater stat total, so pokemons are sorted by decreasing total
+and each one is only compared to the ones before it, with one vectorized comparison per pokemon.
+
+    pareto_frame(data, types=["Dragon"])                          # fronts of the Dragon pokemons, by base stats
+    dominated(data, pokemons=battle.apply_stats(data.pokemons, level=50), stats=["HP", "Attack", "Speed"])
+"""
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Sequence, Tuple
+from pypkm.data import PokeData
+from pypkm.data.schema import TYPES, STATS
+
+# Last pokedex id of each generation, pokemons (and their forms) belong to the generation of their pokedex id
+GENERATION_LAST_DEX = [151, 251, 386, 493, 649, 721, 809, 905, 1025]
+SAME_TYPE = ["shared", "exact", None]
+
+def generation_of(pokedex_ids:np.ndarray) -> np.ndarray:
+    """
+    Generation (1-9) that introduced each pokedex id
+    """
+    return np.searchsorted(GENERATION_LAST_DEX, np.asarray(pokedex_ids)) + 1
+
+def dominance(stats:np.ndarray, groups:Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pareto dominance of the rows of `stats` (n, k) (higher is better).
+    If `groups` (n, n_groups) boolean membership is given, a row can only be dominated by a row sharing one of its groups.
+    Return for each row its front (0 for the skyline), its number of dominators
+    and its closest dominator, the one with the lowest total (-1 if none).
+    """
+    n = len(stats)
+    total = stats.sum(axis=1)
+    order = np.argsort(-total, kind="stable")
+    s, t = stats[order], total[order]
+    g = groups[order] if groups is not None else None
+    # Rows before `firsts[i]` in the sorted order have a strictly greater total than row i
+    firsts = np.searchsorted(-t, -t, side="left")
+    front = np.zeros(n, dtype=np.int64)
+    count = np.zeros(n, dtype=np.int64)
+    dominator = np.full(n, -1, dtype=np.int64)
+    for i in range(n):
+        end = firsts[i]
+        if end == 0:
+            continue
+        dominates = (s[:end] >= s[i]).all(axis=1)
+        if g is not None:
+            dominates &= (g[:end] & g[i]).any(axis=1)
+        hits = np.flatnonzero(dominates)
+        if len(hits) > 0:
+            # Dominators come first in the order: their fronts are already known
+            front[i] = front[hits].max() + 1
+            count[i] = len(hits)
+            dominator[i] = order[hits[-1]]
+    result = np.empty((3, n), dtype=np.int64)
+    result[:, order] = np.vstack([front, count, dominator])
+    return result[0], result[1], result[2]
+
+def _type_groups(pokemons:pd.DataFrame, same_type:Optional[str]) -> Optional[np.ndarray]:
+    if same_type is None:
+        return None
+    type1 = pd.Categorical(pokemons["Type1"], categories=TYPES).codes
+    type2 = pd.Categorical(pokemons["Type2"], categories=TYPES).codes
+    rows = np.arange(len(pokemons))
+    if same_type == "shared":
+        groups = np.zeros((len(pokemons), len(TYPES)), dtype=bool)
+        groups[rows, type1] = True
+        groups[rows[type2 >= 0], type2[type2 >= 0]] = True
+        return groups
+    if same_type == "exact":
+        # One group per (unordered) type combination
+        low, high = np.minimum(type1, type2), np.maximum(type1, type2)
+        low = np.where(low < 0, high, low)
+        keys = low * len(TYPES) + high
+        _, codes = np.unique(keys, return_inverse=True)
+        groups = np.zeros((len(pokemons), codes.max() + 1 if len(codes) else 0), dtype=bool)
+        groups[rows, codes] = True
+        return groups
+    raise ValueError(f"Unknown same_type {same_type}, expected one of {SAME_TYPE}")
+
+def pareto_frame(
+    data:PokeData, pokemons:Optional[pd.DataFrame] = None, stats:Sequence[str] = STATS,
+    types:Optional[List[str]] = None, generations:Optional[List[int]] = None, same_type:Optional[str] = "shared"
+) -> pd.DataFrame:
+    """
+    Pokemons of `pokemons` (PokeData.pokemons by default, or the output of BattleData.apply_stats)
+    of one of `types` and introduced in one of `generations`, with their Pareto dominance over `stats`:
+    - "Front": 0 for the skyline
+    - "Dominators": number of pokemons dominating it
+    - "DominatedBy": its closest dominator (lowest total)
+    `same_type`: "shared" (dominators share a type), "exact" (same type combination) or None (any pokemon)
+    """
+    df = data.pokemons if pokemons is None else pokemons
+    keep = np.ones(len(df), dtype=bool)
+    if types is not None:
+        keep &= (df["Type1"].isin(types) | df["Type2"].isin(types)).to_numpy()
+    if generations is not None:
+        keep &= np.isin(generation_of(df["PokedexId"].to_numpy()), generations)
+    df = df[keep]
+    values = df[list(stats)].to_numpy(dtype=np.int64)
+    front, count, dominator = dominance(values, _type_groups(df, same_type))
+    names = df["Name"].to_numpy(dtype=object)
+    return df[["Name", "Type1", "Type2"] + list(stats)].assign(
+        Front = front,
+        Dominators = count,
+        DominatedBy = np.where(dominator >= 0, names[dominator], None)
+    )
+
+def skyline(data:PokeData, **kwargs) -> pd.DataFrame:
+    """
+    Non-dominated pokemons (front 0 of `pareto_frame`, same parameters)
+    """
+    frame = pareto_frame(data, **kwargs)
+    return frame[frame["Front"] == 0]
+
+def dominated(data:PokeData, **kwargs) -> pd.DataFrame:
+    """
+    Strictly dominated pokemons (see `pareto_frame`, same parameters), most dominated first
+    """
+    frame = pareto_frame(data, **kwargs)
+    return frame[frame["Dominators"] > 0].sort_values("Dominators", ascending=False, kind="stable")
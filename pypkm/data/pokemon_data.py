@@ -1,6 +1,9 @@
+import os
+import numpy as np
 import pandas as pd
 import itertools
-from typing import Union, Optional, List, Tuple
+import threading
+from typing import Dict, Union, Optional, List, Tuple
 from pypkm.data import(
     stats_file,
     moves_file,
@@ -9,19 +12,135 @@ from pypkm.data import(
     key_items_file,
     abilities_file,
     types_matrix_file,
-    natures_file
+    natures_file,
+    DATA_DIR
 )
+from pypkm.data.scrapping.manifest import file_hash, combined_hash
+from pypkm.data.instrumentation import timed, section, record_cache
+from pypkm.data.schema import (
+    read_table,
+    POKEMONS_SCHEMA,
+    MOVES_SCHEMA,
+    MOVESETS_SCHEMA,
+    ABILITIES_SCHEMA,
+    NATURES_SCHEMA
+)
+from pypkm.data.encoded import EncodedTables
+from pypkm.data.names import NameLookup
+from pypkm.data.type_charts import type_chart_tensor, types_matrix, era_of
+from pypkm.data.df_types import Pokedex, Moves, Movesets, Abilities, Natures
 
 class PokeData():
     def __init__(self, gen:str) -> None:
         self.gen = gen
         # Load pokemon data
-        self.pokemons: pd.DataFrame = pd.read_csv(stats_file(gen="all"), sep=";")
-        self.moves: pd.DataFrame = pd.read_csv(moves_file(gen="all"), sep=";")
-        self.movesets: pd.DataFrame = pd.read_csv(movesets_file(gen=self.gen), sep=";")
-        self.abilities: pd.DateOffset = pd.read_csv(abilities_file(), sep=";")
-        self.types_matix: pd.DataFrame = pd.read_csv(types_matrix_file(), sep = ";")
-        self.natures: pd.DataFrame = pd.read_csv(natures_file(), sep = ";")
+        with section("PokeData.load.pokemons"):
+            self.pokemons: pd.DataFrame = read_table(stats_file(gen="all"), POKEMONS_SCHEMA)
+        with section("PokeData.load.moves"):
+            self.moves: pd.DataFrame = read_table(moves_file(gen="all"), MOVES_SCHEMA)
+        with section("PokeData.load.movesets"):
+            self.movesets: pd.DataFrame = read_table(movesets_file(gen=self.gen), MOVESETS_SCHEMA)
+        with section("PokeData.load.abilities"):
+            self.abilities: pd.DataFrame = read_table(abilities_file(), ABILITIES_SCHEMA)
+        with section("PokeData.load.types_matix"):
+            # Type charts of every era (see `pypkm.data.type_charts`), and the one of this generation
+            self.type_charts: np.ndarray = type_chart_tensor(pd.read_csv(types_matrix_file(), sep = ";"))
+            self.era: int = era_of(gen)
+            self.types_matix: pd.DataFrame = types_matrix(self.type_charts, self.era)
+        with section("PokeData.load.natures"):
+            self.natures: pd.DataFrame = read_table(natures_file(), NATURES_SCHEMA)
+        # Computed on first access of `data_version`
+        self._data_version: Optional[str] = None
+        # Derived tables that only depend on the loaded data, built on first use.
+        # They are never modified once built, so concurrent readers can share them
+        self._cache: dict = {}
+        # One lock per derived table so that it is built once, without blocking the build of the others
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def _cached(self, key:str, build):
+        """
+        Return the derived table `key`, building it with `build()` on first use.
+        Thread-safe: concurrent first uses wait for a single build.
+        """
+        if key in self._cache:
+            record_cache(f"PokeData.{key}", True)
+            return self._cache[key]
+        with self._locks_lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            # Another thread may have built it while this one was waiting
+            hit = key in self._cache
+            record_cache(f"PokeData.{key}", hit)
+            if not hit:
+                self._cache[key] = build()
+        return self._cache[key]
+
+    def data_files(self) -> List[str]:
+        """
+        Scrapped csv files this instance is loaded from
+        """
+        return [
+            stats_file(gen="all"),
+            moves_file(gen="all"),
+            movesets_file(gen=self.gen),
+            abilities_file(),
+            types_matrix_file(),
+            natures_file()
+        ]
+
+    @property
+    def data_version(self) -> str:
+        """
+        Fingerprint of the scrapped data this instance is loaded from.
+        It only changes when the content of one of `data_files()` changes,
+        so it can be used as a key to invalidate downstream caches.
+        Per-file hashes are the same as in the scrape manifest (see `pypkm.data.scrapping.manifest`).
+        """
+        if self._data_version is None:
+            self._data_version = combined_hash({
+                os.path.relpath(f, DATA_DIR).replace(os.sep, "/"): file_hash(f) for f in self.data_files()
+            })
+        return self._data_version
+
+    def encoded(self) -> EncodedTables:
+        """
+        Integer-coded NumPy arrays of the loaded tables used by the batched paths (see `pypkm.data.encoded`)
+        """
+        return self._cached("encoded", lambda: EncodedTables(self))
+
+    def names(self) -> NameLookup:
+        """
+        Lookup index resolving pokemon, move, ability and nature names, aliases and other spellings (see `pypkm.data.names`)
+        """
+        return self.encoded().lookup()
+
+    def query(self):
+        """
+        Lazy query over the pokemons, evaluated from the indexes on first result (see `pypkm.data.query`)
+            data.query().types("Dragon").min_stat("Speed", 100, level=50).learns("Earthquake").to_frame(level=50)
+        """
+        # pypkm.data.query depends on pypkm.data.batch, which imports this module
+        from pypkm.data.query import Query
+        return Query(self)
+
+    def pokedex(self) -> Pokedex:
+        """
+        Array-backed view of `pokemons` for fast lookups by name or pokedex id (see `pypkm.data.df_types`)
+        """
+        return self._cached("pokedex", lambda: Pokedex(self.pokemons))
+
+    def moves_table(self) -> Moves:
+        return self._cached("moves_table", lambda: Moves(self.moves))
+
+    def movesets_table(self) -> Movesets:
+        return self._cached("movesets_table", lambda: Movesets(self.movesets))
+
+    def abilities_table(self) -> Abilities:
+        return self._cached("abilities_table", lambda: Abilities(self.abilities))
+
+    def natures_table(self) -> Natures:
+        return self._cached("natures_table", lambda: Natures(self.natures))
 
     def _c_of_type(self, t:str):
         return (self.pokemons["Type1"] == t) | (self.pokemons["Type2"] == t)
@@ -39,7 +158,8 @@ class PokeData():
         Also, single types are returned as (t1, None):
         (Fire, Fire) -> (Fire, None)
         """
-        if t1 == t2:
+        # Monotype pokemons have no (NaN) Type2 in the stats table
+        if t2 is None or pd.isna(t2) or t1 == t2:
             return t1
         else:
             return f"{sorted((t1,t2))[0]} {sorted((t1,t2))[1]}"
@@ -66,17 +186,29 @@ class PokeData():
         if isinstance(pokemon, str):
             return self.pokemons["Name"] == pokemon
         
+    @timed()
     def base_stats(self, pokemon:Union[int,str]) -> pd.DataFrame:
+        if isinstance(pokemon, (int, str)):
+            # Same rows as the boolean filter, without scanning the whole table
+            rows = self.pokedex().pokemon_rows(pokemon)
+            if len(rows) == 0 and isinstance(pokemon, str):
+                # Alias or other spelling of a name ("charizard-mega-x", "Landorus")
+                i = self.names().pokemons.get(pokemon)
+                if i is not None:
+                    rows = self.pokedex().pokemon_rows(self.names().pokemons.names[i])
+            return self.pokemons.iloc[rows]
         return self.pokemons[self.__c_pokemon(pokemon)]
         
+    @timed()
     def moveset(self, pokemon:Union[int,str]) -> pd.DataFrame:
         """
         Return the moveset information of `pokemon`
         The moveset is the move name and how the pokemon can learn it
         """
         pkmane = self.base_stats(pokemon).iloc[0]["Name"]
-        return self.movesets[self.movesets["Pokemon"] == pkmane]
+        return self.movesets.iloc[self.movesets_table().moveset_rows(pkmane)]
     
+    @timed()
     def detailed_moveset(self, pokemon:Union[int,str]) -> pd.DataFrame:
         """
         Return the detailled moveset information of `pokemon`
@@ -91,6 +223,7 @@ class PokeData():
             right_on = "Name"
         ).rename({"Name": "Move"})
     
+    @timed()
     def pretty_moveset(self, pokemon:Union[int,str]) -> pd.DataFrame:
         """
         Return the pretty moveset information of `pokemon`
@@ -102,6 +235,7 @@ class PokeData():
         ]#.set_index("Move")
 
 
+    @timed()
     def defensive_matrix(self) -> pd.DataFrame:
         """
         For each type and double-types compination,
@@ -111,6 +245,11 @@ class PokeData():
         Type Defense      Normal  Fire  Water  Electric  Grass  Ice  Fighting  ...  Bug  Rock  Ghost  Dragon  Dark  Steel  Fairy
         (Dragon, Ground)     1.0   0.5    1.0       0.0    1.0  4.0       1.0  ...  1.0   0.5    1.0     2.0   1.0    1.0    2.0
         """
+        # The matrix only depends on the type matrix, build it once
+        # Return a copy so callers cannot alter the cached one
+        return self._cached("defensive_matrix", self._build_defensive_matrix).copy()
+
+    def _build_defensive_matrix(self) -> pd.DataFrame:
         types = self.types_matix["Attack Type"].to_list()
         defensive_matrix = {}
         for (t1, t2) in itertools.product(types, types):
@@ -156,6 +295,7 @@ class PokeData():
 
         return joined
 
+    @timed()
     def weak_against(self, types:List[str]) -> pd.DataFrame:
         """
         List of defensive types combination that are weak againts all types (if they were attacks) given in parameters.
@@ -165,6 +305,7 @@ class PokeData():
         # Comparison sign is inverted as we are using a defensive matrix
         return self.__defensive_comparison(">", types)
 
+    @timed()
     def resist_against(self, types:List[str]) -> pd.DataFrame:
         """
         List of defensive types combination that resists all types (if they were attacks) given in parameters.
@@ -174,6 +315,7 @@ class PokeData():
         # Comparison sign is inverted as we are using a defensive matrix
         return self.__defensive_comparison("<", types)
     
+    @timed()
     def best_against(self, types:List[str]) -> pd.Series:
         """
         Sorted list of best best defensive counter for the types given in parameter
@@ -0,0 +1,325 @@
+"""
+Lazy queries over the pokemons of a PokeData.
+
+    data.query().types("Dragon").min_stat("Speed", 100, level=50).learns("Earthquake").to_frame(level=50)
+
+Calls only add predicates to a plan, nothing is computed until the result is asked for (`ids`, `to_frame`, `moves`, ...).
+Every predicate can be answered from an index of QueryIndex:
+- types: type membership of each pokemon
+- stats: rows sorted by each base stat. A stat at a given level, nature, IVs and EVs only depends on the base stat and
+  never decreases with it, so its bounds translate to a range of base stats (no stat is computed to filter)
+- moves, abilities: pokemons learning each move / having each ability (inverted movesets and abilities)
+The number of rows matching each predicate is known from the indexes: the most selective one gives the candidates,
+the others are checked on the remaining candidates only, most selective first, and `where` predicates
+(arbitrary functions of the rows) last. Stats and moveset joins of the result are only computed for the rows it keeps.
+"""
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional
+from pypkm.data.schema import TYPES, STATS
+from pypkm.data.batch import compute_stats, STAT_IDS
+from pypkm.data.encoded import _frozen
+
+# Possible base stats
+BASE_STATS = np.arange(256)
+
+class QueryIndex(object):
+    """
+    Indexes of the encoded tables of a PokeData used by the query predicates.
+    Read-only once built: it is shared by all the queries (and threads) of the PokeData.
+    """
+    def __init__(self, enc) -> None:
+        self.enc = enc
+        n = len(enc.pokemon_names)
+        self.n = n
+        rows = np.arange(n)
+        self.type_members = np.zeros((n, len(TYPES)), dtype=bool)
+        self.type_members[rows, enc.type1] = True
+        monotype = enc.type2 < 0
+        self.type_members[rows[~monotype], enc.type2[~monotype]] = True
+        # Rows sorted by each base stat, and the sorted values
+        self.stat_order = np.argsort(enc.stats, axis=0, kind="stable")
+        self.sorted_stats = np.take_along_axis(enc.stats, self.stat_order, axis=0)
+        # Inverted movesets: pokemons learning each move (distinct), in CSR layout
+        owners = np.repeat(rows, np.diff(enc.moveset_indptr))
+        keys = np.unique(enc.moveset_indices.astype(np.int64) * n + owners)
+        self.learners_indptr = np.zeros(len(enc.move_names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n, minlength=len(enc.move_names)), out=self.learners_indptr[1:])
+        self.learners_indices = keys % n
+        self.has_moveset = np.diff(enc.moveset_indptr) > 0
+        # Inverted abilities
+        owners = np.repeat(rows, np.diff(enc.ability_indptr))
+        order = np.argsort(enc.ability_indices, kind="stable")
+        self.holders_indptr = np.zeros(len(enc.ability_names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(enc.ability_indices, minlength=len(enc.ability_names)), out=self.holders_indptr[1:])
+        self.holders_indices = owners[order]
+        for array in vars(self).values():
+            _frozen(array)
+
+    def learners(self, move:int) -> np.ndarray:
+        return self.learners_indices[self.learners_indptr[move]:self.learners_indptr[move + 1]]
+
+    def holders(self, ability:int) -> np.ndarray:
+        return self.holders_indices[self.holders_indptr[ability]:self.holders_indptr[ability + 1]]
+
+    def stat_range(self, stat:int, low:float, high:float) -> slice:
+        """
+        Positions in `stat_order[:, stat]` of the pokemons with a base stat within [low, high]
+        """
+        column = self.sorted_stats[:, stat]
+        return slice(np.searchsorted(column, low, side="left"), np.searchsorted(column, high, side="right"))
+
+class Predicate(object):
+    """
+    A filter of the pokemons: `estimate` is the number of rows it keeps, `lookup` its rows from the indexes,
+    `check` whether candidate rows pass it
+    """
+    def describe(self) -> str:
+        raise NotImplementedError
+
+    def estimate(self, index:QueryIndex) -> int:
+        raise NotImplementedError
+
+    def lookup(self, index:QueryIndex) -> np.ndarray:
+        return np.flatnonzero(self.check(index, np.arange(index.n)))
+
+    def check(self, index:QueryIndex, ids:np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+class TypesPredicate(Predicate):
+    def __init__(self, types:List[str], match_all:bool) -> None:
+        self.types = [TYPES.index(t) for t in types]
+        self.match_all = match_all
+
+    def describe(self) -> str:
+        return f"types {'all' if self.match_all else 'any'} of {[TYPES[t] for t in self.types]}"
+
+    def check(self, index:QueryIndex, ids:np.ndarray) -> np.ndarray:
+        members = index.type_members[ids][:, self.types]
+        return members.all(axis=1) if self.match_all else members.any(axis=1)
+
+    def estimate(self, index:QueryIndex) -> int:
+        return int(self.check(index, np.arange(index.n)).sum())
+
+class StatPredicate(Predicate):
+    """
+    Stat within [low, high], at `level` with the nature, IVs and EVs (base stat if level is None)
+    """
+    def __init__(
+        self, data, stat:str, low:float, high:float, level:Optional[int] = None, nature:str = "Hardy",
+        IVs:Dict[str, int] = {}, EVs:Dict[str, int] = {}
+    ) -> None:
+        enc = data.encoded()
+        self.stat = STAT_IDS[stat]
+        self.bounds = (low, high)
+        self.level = level
+        self.nature = nature
+        if level is None:
+            self.base_low, self.base_high = low, high
+        else:
+            # Stat of every possible base stat, non-decreasing: the bounds are a range of base stats
+            n = len(BASE_STATS)
+            base = np.zeros((n, len(STATS)), dtype=np.int64)
+            base[:, self.stat] = BASE_STATS
+            IV = np.zeros((n, len(STATS)), dtype=np.int64)
+            EV = np.zeros((n, len(STATS)), dtype=np.int64)
+            IV[:, self.stat] = IVs.get(stat, 0)
+            EV[:, self.stat] = EVs.get(stat, 0)
+            bonus = np.repeat(enc.nature_bonus[enc.nature_id(nature)][None, :], n, axis=0)
+            values = compute_stats(base, bonus, np.full(n, level), IV, EV)[:, self.stat]
+            kept = BASE_STATS[(values >= low) & (values <= high)]
+            self.base_low, self.base_high = (kept.min(), kept.max()) if len(kept) > 0 else (1, 0)
+
+    def describe(self) -> str:
+        where = "base" if self.level is None else f"level {self.level} {self.nature}"
+        return f"{STATS[self.stat]} ({where}) in [{self.bounds[0]}, {self.bounds[1]}] -> base in [{self.base_low}, {self.base_high}]"
+
+    def estimate(self, index:QueryIndex) -> int:
+        r = index.stat_range(self.stat, self.base_low, self.base_high)
+        return r.stop - r.start
+
+    def lookup(self, index:QueryIndex) -> np.ndarray:
+        return np.sort(index.stat_order[index.stat_range(self.stat, self.base_low, self.base_high), self.stat])
+
+    def check(self, index:QueryIndex, ids:np.ndarray) -> np.ndarray:
+        base = index.enc.stats[ids, self.stat]
+        return (base >= self.base_low) & (base <= self.base_high)
+
+class LearnsPredicate(Predicate):
+    def __init__(self, data, move:str) -> None:
+        self.move = data.names().moves.resolve(move)
+        self.name = data.names().moves.names[self.move]
+
+    def describe(self) -> str:
+        return f"learns {self.name}"
+
+    def estimate(self, index:QueryIndex) -> int:
+        return len(index.learners(self.move))
+
+    def lookup(self, index:QueryIndex) -> np.ndarray:
+        return index.learners(self.move)
+
+    def check(self, index:QueryIndex, ids:np.ndarray) -> np.ndarray:
+        return np.isin(ids, index.learners(self.move))
+
+class AbilityPredicate(Predicate):
+    def __init__(self, data, ability:str) -> None:
+        self.ability = data.names().abilities.resolve(ability)
+        self.name = data.names().abilities.names[self.ability]
+
+    def describe(self) -> str:
+        return f"ability {self.name}"
+
+    def estimate(self, index:QueryIndex) -> int:
+        return len(index.holders(self.ability))
+
+    def lookup(self, index:QueryIndex) -> np.ndarray:
+        return np.unique(index.holders(self.ability))
+
+    def check(self, index:QueryIndex, ids:np.ndarray) -> np.ndarray:
+        return np.isin(ids, index.holders(self.ability))
+
+class AvailablePredicate(Predicate):
+    def describe(self) -> str:
+        return "has a moveset in the generation"
+
+    def estimate(self, index:QueryIndex) -> int:
+        return int(index.has_moveset.sum())
+
+    def check(self, index:QueryIndex, ids:np.ndarray) -> np.ndarray:
+        return index.has_moveset[ids]
+
+class WherePredicate(Predicate):
+    """
+    Arbitrary filter: a function of the pokemons rows (DataFrame) returning a boolean mask, always evaluated last
+    """
+    def __init__(self, data, function:Callable[[pd.DataFrame], np.ndarray]) -> None:
+        self.data = data
+        self.function = function
+
+    def describe(self) -> str:
+        return f"where {getattr(self.function, '__name__', 'function')}"
+
+    def estimate(self, index:QueryIndex) -> int:
+        # Unknown without evaluating it
+        return index.n
+
+    def check(self, index:QueryIndex, ids:np.ndarray) -> np.ndarray:
+        return np.asarray(self.function(self.data.pokemons.iloc[ids]), dtype=bool)
+
+class Query(object):
+    """
+    Immutable lazy query: each call returns a new query with one more predicate
+    """
+    def __init__(self, data, predicates:Optional[List[Predicate]] = None) -> None:
+        self.data = data
+        self.predicates: List[Predicate] = list(predicates or [])
+
+    def _with(self, predicate:Predicate) -> "Query":
+        return Query(self.data, self.predicates + [predicate])
+
+    def index(self) -> QueryIndex:
+        return self.data._cached("query_index", lambda: QueryIndex(self.data.encoded()))
+
+    def types(self, *types:str, match_all:bool = False) -> "Query":
+        """
+        Pokemons having one of `types` (all of them if `match_all`)
+        """
+        return self._with(TypesPredicate(list(types), match_all))
+
+    def stat_between(self, stat:str, low:float, high:float, level:Optional[int] = None, nature:str = "Hardy", IVs:Dict[str, int] = {}, EVs:Dict[str, int] = {}) -> "Query":
+        """
+        Pokemons with `stat` within [low, high]: base stat, or stat at `level` (see BattleData.apply_stats)
+        """
+        return self._with(StatPredicate(self.data, stat, low, high, level, nature, IVs, EVs))
+
+    def min_stat(self, stat:str, value:float, **kwargs) -> "Query":
+        return self.stat_between(stat, value, np.inf, **kwargs)
+
+    def max_stat(self, stat:str, value:float, **kwargs) -> "Query":
+        return self.stat_between(stat, -np.inf, value, **kwargs)
+
+    def learns(self, *moves:str) -> "Query":
+        """
+        Pokemons learning all of `moves` in the generation
+        """
+        query = self
+        for move in moves:
+            query = query._with(LearnsPredicate(self.data, move))
+        return query
+
+    def ability(self, ability:str) -> "Query":
+        return self._with(AbilityPredicate(self.data, ability))
+
+    def available(self) -> "Query":
+        """
+        Pokemons with a moveset in the generation
+        """
+        return self._with(AvailablePredicate())
+
+    def where(self, function:Callable[[pd.DataFrame], np.ndarray]) -> "Query":
+        return self._with(WherePredicate(self.data, function))
+
+    def plan(self) -> List[Predicate]:
+        """
+        Predicates in evaluation order: by increasing number of matching rows, `where` predicates last
+        """
+        index = self.index()
+        keyed = [(isinstance(p, WherePredicate), p.estimate(index), i, p) for i, p in enumerate(self.predicates)]
+        return [p for *_, p in sorted(keyed, key=lambda k: k[:3])]
+
+    def explain(self) -> List[str]:
+        index = self.index()
+        return [f"{'lookup' if i == 0 else 'check'} {p.describe()} (~{p.estimate(index)} rows)" for i, p in enumerate(self.plan())]
+
+    def ids(self) -> np.ndarray:
+        """
+        Row positions (in PokeData.pokemons) of the matching pokemons, in table order
+        """
+        index = self.index()
+        plan = self.plan()
+        if len(plan) == 0:
+            return np.arange(index.n)
+        ids = np.sort(plan[0].lookup(index))
+        for predicate in plan[1:]:
+            if len(ids) == 0:
+                break
+            ids = ids[predicate.check(index, ids)]
+        return ids
+
+    def count(self) -> int:
+        return len(self.ids())
+
+    def names(self) -> List[str]:
+        return list(self.data.encoded().pokemon_names[self.ids()])
+
+    def to_frame(self, level:Optional[int] = None, nature:str = "Hardy", IVs:Dict[str, int] = {}, EVs:Dict[str, int] = {}) -> pd.DataFrame:
+        """
+        Rows of PokeData.pokemons of the matching pokemons, with their stats at `level` (as BattleData.apply_stats) if given
+        """
+        ids = self.ids()
+        df = self.data.pokemons.iloc[ids]
+        if level is None:
+            return df
+        enc = self.data.encoded()
+        n = len(ids)
+        IV = np.zeros((n, len(STATS)), dtype=np.int64)
+        EV = np.zeros((n, len(STATS)), dtype=np.int64)
+        for stat, v in IVs.items():
+            IV[:, STAT_IDS[stat]] = v
+        for stat, v in EVs.items():
+            EV[:, STAT_IDS[stat]] = v
+        bonus = np.repeat(enc.nature_bonus[enc.nature_id(nature)][None, :], n, axis=0)
+        stats = compute_stats(enc.stats[ids], bonus, np.full(n, level), IV, EV).astype(np.int64)
+        return df.assign(**{stat: stats[:, k] for k, stat in enumerate(STATS)}).assign(Total = stats.sum(axis=1), Level = level)
+
+    def moves(self) -> pd.DataFrame:
+        """
+        Pretty movesets (see PokeData.pretty_moveset) of the matching pokemons, joined once for all of them
+        """
+        table = self.data.movesets_table()
+        names = self.names()
+        rows = np.concatenate([table.moveset_rows(name) for name in names]) if len(names) > 0 else np.empty(0, dtype=np.int64)
+        movesets = self.data.movesets.iloc[rows]
+        detailed = pd.merge(movesets, self.data.moves, how="left", left_on="Move", right_on="Name")
+        return detailed[["Pokemon", "Move", "Type", "Category", "Power", "Accuracy", "PP", "Prob. (%)"]]
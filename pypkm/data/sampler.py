@@ -0,0 +1,214 @@
+"""
+Seeded, vectorized sampling of random legal pokemon sets, for simulations over millions of sets.
+
+A set is drawn as:
+- a pokemon with a moveset in the generation (uniformly, or weighted by usage)
+- up to four distinct moves of its moveset (uniformly, or weighted by move power or usage), without replacement
+- one of its abilities (uniformly, no ability effect if it has none or the generation has no abilities)
+- a nature (uniformly, or weighted)
+- an EV spread: "standard" (252/252/4 over random stats) or "random" (508 EVs spread over the stats, 252 at most per stat)
+IVs are all 31 and the level is fixed.
+
+Everything is drawn for a whole batch at once into arrays: sets are never Python objects.
+Moves are drawn with the Gumbel top-k trick over the concatenated movesets of the batch
+(one `np.maximum.reduceat` pass per move slot, no sort).
+
+    sampler = SetSampler(PokeData(gen = 9), seed=0, move_weights="power")
+    for sets in sampler.stream(10_000_000, batch_size=100_000):
+        scores = battle.matchup_scores(sets, opponents[:len(sets)])
+"""
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from pypkm.data.schema import STATS
+from pypkm.data.encoded import EncodedTables
+from pypkm.data.batch import PokemonSets
+
+MAX_MOVES = 4
+# EVs: 4 EVs per stat point, at most 252 per stat and 510 in total
+EV_STEP = 4
+MAX_EV = 252
+MAX_TOTAL_EV = 510
+EV_MODES = ["standard", "random"]
+
+class SampledSets(PokemonSets):
+    """
+    PokemonSets with the sampled `moves` (n, 4) move ids (-1 when the moveset has fewer than 4 distinct moves)
+    and `abilities` (n,) ability ids (-1 for pokemons without ability)
+    """
+    def __init__(
+        self, ids:np.ndarray, natures:np.ndarray, levels:np.ndarray, IVs:np.ndarray, EVs:np.ndarray, rows:np.ndarray,
+        moves:np.ndarray, abilities:np.ndarray
+    ) -> None:
+        super().__init__(ids, natures, levels, IVs, EVs, rows)
+        self.moves = moves
+        self.abilities = abilities
+
+    def __getitem__(self, rows) -> "SampledSets":
+        return SampledSets(
+            self.ids[rows], self.natures[rows], self.levels[rows], self.IVs[rows], self.EVs[rows], self.rows[rows],
+            self.moves[rows], self.abilities[rows]
+        )
+
+    def to_dicts(self, enc:EncodedTables) -> List[dict]:
+        """
+        Sets as dictionaries (as accepted by BatchBattle.encode_sets, with a "moves" list), to inspect a few of them
+        """
+        return [{
+            "pokemon": enc.pokemon_names[self.ids[i]],
+            "nature": enc.nature_names[self.natures[i]],
+            "ability": enc.ability_names[self.abilities[i]] if self.abilities[i] >= 0 else None,
+            "level": int(self.levels[i]),
+            "IVs": {stat: int(v) for stat, v in zip(STATS, self.IVs[i])},
+            "EVs": {stat: int(v) for stat, v in zip(STATS, self.EVs[i]) if v > 0},
+            "moves": [enc.move_names[m] for m in self.moves[i] if m >= 0]
+        } for i in range(len(self))]
+
+def distinct_moveset(enc:EncodedTables) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (indptr, indices) CSR of the movesets without duplicates (a move learnt several ways appears once)
+    """
+    n = len(enc.pokemon_names)
+    owners = np.repeat(np.arange(n), np.diff(enc.moveset_indptr))
+    keys = np.unique(owners * len(enc.move_names) + enc.moveset_indices.astype(np.int64))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // len(enc.move_names), minlength=n), out=indptr[1:])
+    return indptr, (keys % len(enc.move_names)).astype(np.int32)
+
+class SetSampler(object):
+    def __init__(
+        self, data, seed:Optional[int] = None, level:int = 100,
+        pokemon_weights:Optional[Union[np.ndarray, Dict[str, float]]] = None,
+        move_weights:Optional[Union[str, np.ndarray, Dict[str, float]]] = None,
+        nature_weights:Optional[Union[np.ndarray, Dict[str, float]]] = None,
+        ev_mode:str = "standard", status_power:float = 40.0
+    ) -> None:
+        """
+        `data`: PokeData or EncodedTables.
+        Weights are arrays over the pokemon/move/nature ids or dictionaries by name (missing names weigh 0).
+        `move_weights` can also be "power": the power of the move, `status_power` for moves without power.
+        Zero-weight pokemons and moves are never drawn.
+        """
+        self.enc: EncodedTables = data if isinstance(data, EncodedTables) else data.encoded()
+        enc = self.enc
+        if ev_mode not in EV_MODES:
+            raise ValueError(f"Unknown ev_mode {ev_mode}, expected one of {EV_MODES}")
+        self.rng = np.random.default_rng(seed)
+        self.level = level
+        self.ev_mode = ev_mode
+        self.indptr, self.indices = distinct_moveset(enc)
+
+        # Move weights, as log-weights for the Gumbel top-k trick
+        if isinstance(move_weights, str):
+            if move_weights != "power":
+                raise ValueError(f"Unknown move_weights {move_weights}, expected 'power', weights or None")
+            weights = np.nan_to_num(enc.move_power, nan=status_power)
+        else:
+            weights = self._weights(move_weights, enc.move_ids, len(enc.move_names))
+        with np.errstate(divide="ignore"):
+            self.move_log_weights: np.ndarray = np.log(weights)
+
+        # Pokemons with at least one move that can be drawn
+        drawable = np.isfinite(self.move_log_weights[self.indices])
+        owners = np.repeat(np.arange(len(enc.pokemon_names)), np.diff(self.indptr))
+        has_moves = np.bincount(owners[drawable], minlength=len(enc.pokemon_names)) > 0
+        p = self._weights(pokemon_weights, enc.pokemon_ids, len(enc.pokemon_names)) * has_moves
+        if p.sum() == 0:
+            raise ValueError("No pokemon can be drawn")
+        self.pokemon_p: np.ndarray = p / p.sum()
+        q = self._weights(nature_weights, enc.nature_ids, len(enc.nature_names))
+        self.nature_p: np.ndarray = q / q.sum()
+
+    @staticmethod
+    def _weights(weights, ids:Dict[str, int], n:int) -> np.ndarray:
+        if weights is None:
+            return np.ones(n)
+        if isinstance(weights, dict):
+            array = np.zeros(n)
+            for name, w in weights.items():
+                array[ids[name]] = w
+            return array
+        return np.asarray(weights, dtype=np.float64)
+
+    def _moves(self, ids:np.ndarray) -> np.ndarray:
+        # Gumbel top-k: the 4 largest log-weight + Gumbel noise of each moveset are a weighted draw without replacement
+        starts = self.indptr[ids]
+        counts = self.indptr[ids + 1] - starts
+        segments = np.cumsum(counts) - counts
+        owner = np.repeat(np.arange(len(ids)), counts)
+        offsets = np.arange(len(owner)) - np.repeat(segments, counts)
+        move = self.indices[np.repeat(starts, counts) + offsets]
+        keys = self.move_log_weights[move] + self.rng.gumbel(size=len(move))
+        moves = np.full((len(ids), MAX_MOVES), -1, dtype=np.int32)
+        # One pass per move slot: take the largest key of each moveset, then remove it
+        # (drawn pokemons have at least one move, so no segment is empty)
+        for slot in range(MAX_MOVES):
+            best = np.maximum.reduceat(keys, segments)
+            # Zero-weight (and already taken) moves have a -inf key and are never drawn
+            hits = np.flatnonzero((keys == best[owner]) & np.isfinite(keys))
+            # Keep one hit per moveset in case of ties
+            hits = hits[np.r_[True, owner[hits[1:]] != owner[hits[:-1]]]] if len(hits) > 0 else hits
+            moves[owner[hits], slot] = move[hits]
+            keys[hits] = -np.inf
+        return moves
+
+    def _abilities(self, ids:np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        enc = self.enc
+        if len(enc.ability_indices) == 0:
+            # Generation without abilities (see `pypkm.data.abilities.pokemon_abilities`)
+            return np.full(len(ids), -1, dtype=np.int32), ids.astype(np.int32)
+        starts = enc.ability_indptr[ids]
+        counts = enc.ability_indptr[ids + 1] - starts
+        k = np.floor(self.rng.random(len(ids)) * counts).astype(np.int64)
+        has = counts > 0
+        entry = np.where(has, starts + k, 0)
+        abilities = np.where(has, enc.ability_indices[entry], -1)
+        # Rows of defensive_sets/offensive_sets, see EncodedTables.set_row
+        rows = np.where(has, len(enc.pokemon_names) + entry, ids)
+        return abilities.astype(np.int32), rows.astype(np.int32)
+
+    def _EVs(self, n:int) -> np.ndarray:
+        EVs = np.zeros((n, len(STATS)), dtype=np.int16)
+        if self.ev_mode == "standard":
+            # 252 in two random stats, the remaining 4 in a third one
+            picks = np.argsort(self.rng.random((n, len(STATS))), axis=1)[:, :3]
+            rows = np.arange(n)
+            EVs[rows, picks[:, 0]] = MAX_EV
+            EVs[rows, picks[:, 1]] = MAX_EV
+            EVs[rows, picks[:, 2]] = (MAX_TOTAL_EV - 2 * MAX_EV) // EV_STEP * EV_STEP
+        else:
+            # Units of 4 EVs spread uniformly over the stats, the units above 252 in a stat
+            # are spread again over the stats below the cap, until none is above it
+            cap = MAX_EV // EV_STEP
+            units = self.rng.multinomial(MAX_TOTAL_EV // EV_STEP, np.full(len(STATS), 1.0 / len(STATS)), size=n)
+            excess = np.maximum(units - cap, 0).sum(axis=1)
+            while excess.any():
+                rows = np.flatnonzero(excess)
+                units[rows] = np.minimum(units[rows], cap)
+                below = (units[rows] < cap).astype(np.float64)
+                units[rows] += self.rng.multinomial(excess[rows], below / below.sum(axis=1, keepdims=True))
+                excess = np.maximum(units - cap, 0).sum(axis=1)
+            EVs[:] = units * EV_STEP
+        return EVs
+
+    def sample(self, n:int) -> SampledSets:
+        """
+        Draw `n` sets
+        """
+        enc = self.enc
+        ids = self.rng.choice(len(enc.pokemon_names), size=n, p=self.pokemon_p).astype(np.int32)
+        natures = self.rng.choice(len(enc.nature_names), size=n, p=self.nature_p).astype(np.int16)
+        abilities, rows = self._abilities(ids)
+        return SampledSets(
+            ids, natures,
+            np.full(n, self.level, dtype=np.int16),
+            np.full((n, len(STATS)), 31, dtype=np.int16),
+            self._EVs(n), rows,
+            self._moves(ids), abilities
+        )
+
+    def stream(self, total:int, batch_size:int = 100000) -> Iterator[SampledSets]:
+        """
+        Draw `total` sets by batches of `batch_size`, only one batch is in memory at a time
+        """
+        for start in range(0, total, batch_size):
+            yield self.sample(min(batch_size, total - start))
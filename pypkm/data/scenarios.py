@@ -0,0 +1,270 @@
+"""
+Evaluate batched matchups over a grid of field conditions in one vectorized pass.
+
+BattleData.matchup (and the batched paths) compute damage with all the field modifiers of the damage formula at 1.
+A ScenarioGrid lists values for some of them, each one becoming an extra dimension of the damage tensor:
+
+- `weather`: "none", "rain" or "sun" (Water and Fire moves x1.5 / x0.5)
+- `critical`: critical hit (x1.5, x2 in generations 2 to 5, (2L + 5) / (L + 5) for an attacker of level L in generation 1)
+- `burned`: the attacker is burned (physical moves x0.5)
+- `doubles`: spread moves hit two targets (x0.75)
+- `atk_tera` / `def_tera`: Tera type of the attacker / defender (None if not terastallized), generation 9 only
+
+    grid = ScenarioGrid(weather=["none", "rain", "sun"], critical=[False, True], def_tera=[None, "Fairy"])
+    scores = scenario_scores(battle, attackers, defenders, grid)  # shape (n, 3, 2, 1, 1, 1, 2)
+    scenario_frame(scores, grid, battle.enc.pokemon_names[attackers.ids], battle.enc.pokemon_names[defenders.ids])
+
+The scenario with every modifier at its neutral value gives the same damage as BattleData.matchup.
+The damage tensor has (number of (row, move) entries) x grid.size values: evaluate large batches in chunks.
+"""
+import itertools
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from pypkm.data.schema import TYPES
+from pypkm.data.encoded import EncodedTables, PHYSICAL
+from pypkm.data.abilities import defensive_vector, offensive_vector
+from pypkm.data.batch import BatchBattle, PokemonSets, HP
+from pypkm.data.type_charts import ERAS, GEN1, GEN2_5, GEN6_PLUS, era_of
+
+WEATHERS = ["none", "rain", "sun"]
+
+# Multiplier of each weather (row, in the order of WEATHERS) on each move type (column, in the order of TYPES)
+WEATHER_MULTIPLIERS = np.ones((len(WEATHERS), len(TYPES)))
+WEATHER_MULTIPLIERS[WEATHERS.index("rain"), TYPES.index("Water")] = 1.5
+WEATHER_MULTIPLIERS[WEATHERS.index("rain"), TYPES.index("Fire")] = 0.5
+WEATHER_MULTIPLIERS[WEATHERS.index("sun"), TYPES.index("Fire")] = 1.5
+WEATHER_MULTIPLIERS[WEATHERS.index("sun"), TYPES.index("Water")] = 0.5
+
+# Critical hit multiplier of each era (in generation 1 it depends on the level, see `critical_multiplier`)
+CRITICAL_MULTIPLIERS = {GEN2_5: 2.0, GEN6_PLUS: 1.5}
+BURN_MULTIPLIER = 0.5
+SPREAD_MULTIPLIER = 0.75
+
+# First generation with terastallization
+TERA_GEN = 9
+
+# Damaging moves hitting several pokemons in doubles
+# (the scrapped move effects only mention it for some of them, see `spread_moves`)
+SPREAD_MOVES = [
+    "Acid", "Air Cutter", "Astral Barrage", "Bleakwind Storm", "Blizzard", "Boomburst", "Breaking Swipe", "Bubble",
+    "Bulldoze", "Burning Jealousy", "Clanging Scales", "Core Enforcer", "Dazzling Gleam", "Diamond Storm", "Discharge",
+    "Disarming Voice", "Earthquake", "Electroweb", "Eruption", "Explosion", "Fiery Wrath", "Glacial Lance",
+    "Heat Wave", "Hyper Voice", "Icy Wind", "Land's Wrath", "Lava Plume", "Magnitude", "Make It Rain", "Matcha Gotcha",
+    "Mind Blown", "Misty Explosion", "Mortal Spin", "Muddy Water", "Origin Pulse", "Overdrive", "Parabolic Charge",
+    "Petal Blizzard", "Powder Snow", "Precipice Blades", "Razor Leaf", "Razor Wind", "Relic Song", "Rock Slide",
+    "Sandsear Storm", "Self-Destruct", "Sludge Wave", "Snarl", "Springtide Storm", "Struggle Bug", "Surf", "Swift",
+    "Thousand Arrows", "Thousand Waves", "Twister", "Water Spout", "Wildbolt Storm",
+]
+
+def critical_multiplier(era:int, levels:np.ndarray) -> np.ndarray:
+    """
+    Critical hit multiplier of attackers of level `levels` in `era` (index in ERAS).
+    Generation 1 doubles the level in the damage formula: (2L + 5) / (L + 5), ignoring the intermediate rounding.
+    """
+    levels = np.asarray(levels, dtype=np.float64)
+    if era == GEN1:
+        return (2 * levels + 5) / (levels + 5)
+    return np.full(levels.shape, CRITICAL_MULTIPLIERS[era])
+
+def spread_moves(data) -> np.ndarray:
+    """
+    Boolean array (in the order of the moves table) of the moves hitting several pokemons in doubles
+    """
+    effects = data.moves["Effect"].astype("object").fillna("")
+    return (
+        data.moves["Name"].isin(SPREAD_MOVES) | effects.str.contains("hits all adjacent", case=False, regex=False)
+    ).to_numpy()
+
+class ScenarioGrid(object):
+    """
+    Values of each field condition, scenarios are all their combinations.
+    Dimensions are in the order of DIMENSIONS.
+    """
+    DIMENSIONS = ["weather", "critical", "burned", "doubles", "atk_tera", "def_tera"]
+
+    def __init__(
+        self,
+        weather:Sequence[str] = ("none",),
+        critical:Sequence[bool] = (False,),
+        burned:Sequence[bool] = (False,),
+        doubles:Sequence[bool] = (False,),
+        atk_tera:Sequence[Optional[str]] = (None,),
+        def_tera:Sequence[Optional[str]] = (None,)
+    ) -> None:
+        for w in weather:
+            if w not in WEATHERS:
+                raise ValueError(f"Unknown weather {w}, expected one of {WEATHERS}")
+        for t in list(atk_tera) + list(def_tera):
+            if t is not None and t not in TYPES:
+                raise ValueError(f"Unknown Tera type {t}")
+        self.weather = list(weather)
+        self.critical = list(critical)
+        self.burned = list(burned)
+        self.doubles = list(doubles)
+        self.atk_tera = list(atk_tera)
+        self.def_tera = list(def_tera)
+
+    @staticmethod
+    def full(tera:Sequence[Optional[str]] = (None,)) -> "ScenarioGrid":
+        """
+        Every weather, critical hit, burn and singles/doubles, with the attacker and defender Tera types `tera`
+        """
+        return ScenarioGrid(WEATHERS, [False, True], [False, True], [False, True], tera, tera)
+
+    def dimensions(self) -> List[Tuple[str, List[Any]]]:
+        return [(name, getattr(self, name)) for name in ScenarioGrid.DIMENSIONS]
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return tuple(len(values) for _, values in self.dimensions())
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    def scenarios(self) -> List[Dict[str, Any]]:
+        """
+        All the scenarios as dictionaries, in the (C) order of the flattened grid dimensions
+        """
+        names = ScenarioGrid.DIMENSIONS
+        return [dict(zip(names, values)) for values in itertools.product(*[v for _, v in self.dimensions()])]
+
+def _spread_moves(battle:BatchBattle) -> np.ndarray:
+    if battle.data is None:
+        # Tables attached without their PokeData, only the listed moves are known
+        return np.isin(battle.enc.move_names, SPREAD_MOVES)
+    return battle.data._cached("spread_moves", lambda: spread_moves(battle.data))
+
+def _era(battle:BatchBattle) -> int:
+    if battle.data is None:
+        # Tables attached without their PokeData, the era is the one of their type chart
+        enc = battle.enc
+        return next(e for e in range(len(ERAS)) if np.array_equal(enc.type_charts[e], enc.type_chart))
+    return era_of(battle.data.gen)
+
+def _check_tera(battle:BatchBattle, grid:ScenarioGrid) -> None:
+    if all(t is None for t in grid.atk_tera + grid.def_tera):
+        return
+    if battle.data is None:
+        # Without the generation, only the era is known
+        allowed = _era(battle) == GEN6_PLUS
+    else:
+        try:
+            allowed = int(battle.data.gen) >= TERA_GEN
+        except (TypeError, ValueError):
+            # "all" generations: latest mechanics
+            allowed = True
+    if not allowed:
+        raise ValueError(f"Tera types only exist from generation {TERA_GEN}")
+
+def _row_abilities(enc:EncodedTables, rows:np.ndarray) -> List[Optional[str]]:
+    # Ability of rows of EncodedTables.defensive_sets/offensive_sets (None for the rows without ability effect)
+    n = len(enc.pokemon_names)
+    return [None if r < n else enc.ability_names[enc.ability_indices[r - n]] for r in rows]
+
+def _offense_table(enc:EncodedTables, rows:np.ndarray, teras:List[Optional[str]]) -> np.ndarray:
+    """
+    (len(rows), len(teras), n_types) STAB times ability multiplier of each move type
+    """
+    table = np.empty((len(rows), len(teras), len(TYPES)))
+    n = len(enc.pokemon_names)
+    for i, (row, ability) in enumerate(zip(rows, _row_abilities(enc, rows))):
+        p = row if row < n else np.searchsorted(enc.ability_indptr, row - n, side="right") - 1
+        for j, tera in enumerate(teras):
+            if tera is None:
+                table[i, j] = enc.offensive_sets[row]
+            else:
+                table[i, j] = offensive_vector(enc.type1[p], enc.type2[p], ability, TYPES.index(tera))
+    return table
+
+def _defense_table(enc:EncodedTables, rows:np.ndarray, teras:List[Optional[str]]) -> np.ndarray:
+    """
+    (len(rows), len(teras), n_types) type factor of each attack type, a terastallized pokemon has its Tera type only
+    """
+    table = np.empty((len(rows), len(teras), len(TYPES)))
+    for i, (row, ability) in enumerate(zip(rows, _row_abilities(enc, rows))):
+        for j, tera in enumerate(teras):
+            if tera is None:
+                table[i, j] = enc.defensive_sets[row]
+            else:
+                table[i, j] = defensive_vector(enc.type_chart[TYPES.index(tera)], ability)
+    return table
+
+def scenario_damage(
+    battle:BatchBattle, attackers:PokemonSets, defenders:PokemonSets, grid:ScenarioGrid
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Damage of every damaging move of each attacker against the defender of the same row, in every scenario of `grid`.
+    Return (pair, move, damage, damage_pct): `pair` and `move` are flat arrays of the (row, move) entries
+    (as BatchBattle.damage), `damage` and `damage_pct` have the shape (n_entries, *grid.shape).
+    Critical hits use the multiplier of the generation of `battle`, Tera types are rejected before generation 9.
+    """
+    _check_tera(battle, grid)
+    enc = battle.enc
+    atk_stats = battle.stats(attackers)
+    def_stats = battle.stats(defenders)
+    pair, move, base = battle.entries(attackers.ids, atk_stats, attackers.levels, def_stats)
+    move_type = enc.move_type[move]
+    physical = enc.move_category[move] == PHYSICAL
+    spread = _spread_moves(battle)[move]
+
+    # Per-set STAB and type factors for each Tera type, only for the distinct sets of the batch
+    atk_rows, atk_inverse = np.unique(attackers.rows, return_inverse=True)
+    def_rows, def_inverse = np.unique(defenders.rows, return_inverse=True)
+    stab = _offense_table(enc, atk_rows, grid.atk_tera)[atk_inverse[pair], :, move_type]
+    type_factor = _defense_table(enc, def_rows, grid.def_tera)[def_inverse[pair], :, move_type]
+
+    # Every factor is broadcast to (n_entries, weather, critical, burned, doubles, atk_tera, def_tera)
+    # from a (n_entries or 1, n_values) array of its values
+    def axis(values:np.ndarray, dim:int) -> np.ndarray:
+        shape = [values.shape[0]] + [1] * len(ScenarioGrid.DIMENSIONS)
+        shape[1 + dim] = values.shape[1]
+        return values.reshape(shape)
+
+    weather = WEATHER_MULTIPLIERS[[WEATHERS.index(w) for w in grid.weather]][:, move_type].T
+    crit = critical_multiplier(_era(battle), attackers.levels[pair])
+    critical = np.where(np.array(grid.critical, dtype=bool)[None, :], crit[:, None], 1.0)
+    burned = np.where(np.array(grid.burned, dtype=bool)[None, :] & physical[:, None], BURN_MULTIPLIER, 1.0)
+    targets = np.where(np.array(grid.doubles, dtype=bool)[None, :] & spread[:, None], SPREAD_MULTIPLIER, 1.0)
+
+    # Same factor order as `damage` in BattleData.matchup
+    with np.errstate(invalid="ignore"):
+        damage = np.floor(
+            axis(base[:, None], 0) * axis(targets, 3) * axis(weather, 0) * axis(critical, 1)
+            * axis(stab, 4) * axis(type_factor, 5) * axis(burned, 2)
+        )
+        damage_pct = 100.0 * (damage / axis(def_stats[pair, HP][:, None], 0))
+    return pair, move, damage, damage_pct
+
+def scenario_scores(
+    battle:BatchBattle, attackers:PokemonSets, defenders:PokemonSets, grid:ScenarioGrid
+) -> np.ndarray:
+    """
+    One-sided score (see BatchBattle.scores) of each row in every scenario, shape (n, *grid.shape)
+    """
+    n = len(attackers)
+    pair, _, _, damage_pct = scenario_damage(battle, attackers, defenders, grid)
+    flat = damage_pct.reshape(len(pair), grid.size)
+    valid = ~np.isnan(flat)
+    # Reduce by (row, scenario)
+    bins = (pair[:, None] * grid.size + np.arange(grid.size)[None, :])[valid]
+    values = flat[valid]
+    total = np.bincount(bins, weights=values, minlength=n * grid.size)
+    count = np.bincount(bins, minlength=n * grid.size)
+    kills = np.bincount(bins, weights=values >= 100, minlength=n * grid.size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (1 + kills) * (total / count)
+    return scores.reshape((n,) + grid.shape)
+
+def scenario_frame(scores:np.ndarray, grid:ScenarioGrid, attackers:Sequence[str], defenders:Sequence[str]) -> pd.DataFrame:
+    """
+    Long DataFrame of `scenario_scores`: one row per (row, scenario) with the attacker, defender, conditions and score
+    """
+    n = scores.shape[0]
+    scenarios = pd.DataFrame(grid.scenarios())
+    frame = pd.concat([scenarios] * n, ignore_index=True)
+    frame.insert(0, "Defender", np.repeat(np.asarray(defenders, dtype=object), grid.size))
+    frame.insert(0, "Attacker", np.repeat(np.asarray(attackers, dtype=object), grid.size))
+    frame["Score"] = scores.reshape(-1)
+    return frame
@@ -0,0 +1,86 @@
+"""
+Explicit dtypes of the scrapped tables loaded by PokeData.
+Repeated strings (types, move categories, pokemon and move names in movesets) are categoricals,
+stats are small unsigned ints, learn-method flags are booleans and
+columns with missing values are nullable ints.
+"""
+import pandas as pd
+
+# Same order as the rows/columns of the types matrix
+TYPES = [
+    "Normal", "Fire", "Water", "Electric", "Grass", "Ice", "Fighting", "Poison", "Ground",
+    "Flying", "Psychic", "Bug", "Rock", "Ghost", "Dragon", "Dark", "Steel", "Fairy"
+]
+STATS = ["HP", "Attack", "Defense", "Sp. Atk", "Sp. Def", "Speed"]
+# "—" is used for moves without category (ex: Z-Moves of pokemondb.net)
+MOVE_CATEGORIES = ["Physical", "Special", "Status", "—"]
+
+TYPE_DTYPE = pd.CategoricalDtype(TYPES)
+MOVE_CATEGORY_DTYPE = pd.CategoricalDtype(MOVE_CATEGORIES)
+
+# Base stats are at most 255
+POKEMONS_SCHEMA = {
+    "Name": "str",
+    "Total": "uint16",
+    **{stat: "uint8" for stat in STATS},
+    "Type1": TYPE_DTYPE,
+    "Type2": TYPE_DTYPE,
+    # Zero padded in the file ("0001"), padding is only a display concern
+    "PokedexId": "uint16",
+}
+
+# Accuracy stays a float: moves that never miss have an infinite accuracy ("∞" on pokemondb.net)
+MOVES_SCHEMA = {
+    "Name": "str",
+    "Type": TYPE_DTYPE,
+    "Category": MOVE_CATEGORY_DTYPE,
+    "Power": "UInt16",
+    "Accuracy": "float32",
+    "PP": "UInt8",
+    "TM": "str",
+    "Effect": "str",
+    "Prob. (%)": "UInt8",
+}
+
+MOVESETS_SCHEMA = {
+    "Pokemon": "category",
+    "Move": "category",
+    "Lvl": "UInt8",
+    "PreEvol": "bool",
+    "HM": "UInt16",
+    "TM": "UInt16",
+    "Egg": "bool",
+    "Tutor": "bool",
+    "TR": "UInt16",
+}
+
+ABILITIES_SCHEMA = {
+    "PokedexId": "uint16",
+    "Pokemon": "category",
+    "Ability": "category",
+    "Second ability": "category",
+    "Hidden ability": "category",
+}
+
+# Natures bonuses are kept as float64: the stat formula floors (stat * bonus),
+# and 0.9 is below its decimal value in float32
+NATURES_SCHEMA = {
+    "Nature": "str",
+    **{stat: "float64" for stat in STATS},
+}
+
+def read_table(path:str, schema:dict) -> pd.DataFrame:
+    """
+    Read a scrapped csv file with the dtypes of `schema`
+    The index column saved by the spiders ('Unnamed: 0') is not read back
+    """
+    # Parsing straight into nullable ints is much slower than casting the parsed float columns afterward
+    nullable = {c: d for c, d in schema.items() if isinstance(d, str) and d[0] in "IU"}
+    df = pd.read_csv(
+        path,
+        sep=";",
+        dtype={c: d for c, d in schema.items() if c not in nullable},
+        usecols=lambda c: not c.startswith("Unnamed:")
+    )
+    nullable = {c: d for c, d in nullable.items() if c in df.columns}
+    return df.astype(nullable) if len(nullable) > 0 else df
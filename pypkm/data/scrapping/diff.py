@@ -0,0 +1,129 @@
+"""
+Report what changed between two scrapes of pokemondb.net.
+
+Usage:
+python -m pypkm.data.scrapping.diff OLD_DATA_DIR NEW_DATA_DIR
+Where each directory has the layout of pypkm/data/scrapping (stats/, moves/, abilities/)
+"""
+import os
+import re
+import argparse
+import pandas as pd
+from typing import Dict, List, Tuple, Optional
+from pypkm.data.scrapping.manifest import (
+    CSV_SEP,
+    data_files,
+    file_hash,
+    read_manifest
+)
+
+# Columns identifying a row, by csv file name pattern
+# Keys are not unique for movesets (a move can be learnt at several levels),
+# rows are then compared as the (sorted) group of rows sharing the key
+ROW_KEYS = [
+    (re.compile(r"stats_gen_.*\.csv"), ["Name"]),
+    (re.compile(r"movesets_gen_.*\.csv"), ["Pokemon", "Move"]),
+    (re.compile(r"moves_gen_.*\.csv"), ["Name"]),
+    (re.compile(r"abilities\.csv"), ["Pokemon", "Ability"]),
+    (re.compile(r"natures\.csv"), ["Nature"]),
+    (re.compile(r"types_matrix_.*\.csv"), ["Attack Type"]),
+]
+
+# Index column saved by the spiders, its values are row numbers and not data
+IGNORED_COLUMNS = ["Unnamed: 0"]
+
+def row_keys(relpath:str) -> Optional[List[str]]:
+    filename = os.path.basename(relpath)
+    for pattern, keys in ROW_KEYS:
+        if pattern.fullmatch(filename):
+            return keys
+    return None
+
+def _file_hashes(data_dir:str) -> Dict[str, str]:
+    # Use the manifest of the scrape when there is one, otherwise hash the files
+    manifest = read_manifest(data_dir)
+    if manifest is not None:
+        return {relpath: e["sha256"] for relpath, e in manifest["files"].items()}
+    return {relpath: file_hash(os.path.join(data_dir, relpath)) for relpath in data_files(data_dir)}
+
+def _read_rows(path:str, keys:List[str], columns:List[str]) -> Dict[Tuple, Tuple]:
+    # Read everything as text, so that the comparison is exact and NaN-free
+    df = pd.read_csv(path, sep=CSV_SEP, dtype=str, keep_default_na=False)
+    values = [c for c in columns if c not in keys]
+    grouped = {}
+    for row in zip(*[df[c] for c in keys + values]):
+        grouped.setdefault(row[:len(keys)], []).append(row[len(keys):])
+    return {k: tuple(sorted(v)) for k, v in grouped.items()}
+
+def diff_file(old_path:str, new_path:str, keys:List[str]) -> dict:
+    """
+    Compare two versions of a scrapped csv file.
+    Return the keys of the rows that were added, removed or changed (as tuples of the `keys` columns values),
+    along with the columns that were added or removed.
+    """
+    old_columns = [c for c in pd.read_csv(old_path, sep=CSV_SEP, nrows=0).columns if c not in IGNORED_COLUMNS]
+    new_columns = [c for c in pd.read_csv(new_path, sep=CSV_SEP, nrows=0).columns if c not in IGNORED_COLUMNS]
+    # Rows are compared on the columns present in both versions
+    columns = [c for c in new_columns if c in old_columns]
+    old = _read_rows(old_path, keys, columns)
+    new = _read_rows(new_path, keys, columns)
+    return {
+        "added": sorted(new.keys() - old.keys()),
+        "removed": sorted(old.keys() - new.keys()),
+        "changed": sorted(k for k in new.keys() & old.keys() if new[k] != old[k]),
+        "columns_added": [c for c in new_columns if c not in old_columns],
+        "columns_removed": [c for c in old_columns if c not in new_columns],
+    }
+
+def diff_scrapes(old_dir:str, new_dir:str) -> Dict[str, dict]:
+    """
+    Compare two scrapes file by file, only files whose content hash differ are read.
+    Return {relative path: report}, where report is the output of `diff_file`,
+    or {"status": "added"} / {"status": "removed"} for files only present in one scrape.
+    """
+    old_hashes = _file_hashes(old_dir)
+    new_hashes = _file_hashes(new_dir)
+    report = {}
+    for relpath in sorted(old_hashes.keys() | new_hashes.keys()):
+        if relpath not in old_hashes:
+            report[relpath] = {"status": "added"}
+        elif relpath not in new_hashes:
+            report[relpath] = {"status": "removed"}
+        elif old_hashes[relpath] != new_hashes[relpath]:
+            keys = row_keys(relpath)
+            if keys is None:
+                report[relpath] = {"status": "changed"}
+            else:
+                report[relpath] = {"status": "changed", **diff_file(os.path.join(old_dir, relpath), os.path.join(new_dir, relpath), keys)}
+    return report
+
+def changed_keys(report:Dict[str, dict], pattern:str) -> set:
+    """
+    Union of the added, removed and changed row keys of all files matching `pattern` (ex: 'movesets_gen_9.csv', 'stats_gen_.*\\.csv').
+    This is what derived indexes and caches built on those files have to rebuild.
+    """
+    keys = set()
+    for relpath, r in report.items():
+        if re.fullmatch(pattern, os.path.basename(relpath)):
+            keys.update(r.get("added", []), r.get("removed", []), r.get("changed", []))
+    return keys
+
+def print_report(report:Dict[str, dict], max_keys:int = 10) -> None:
+    if len(report) == 0:
+        print("Scrapes are identical")
+    for relpath, r in report.items():
+        print(f"{relpath}: {r['status']}")
+        for field in ["added", "removed", "changed", "columns_added", "columns_removed"]:
+            if len(r.get(field, [])) == 0:
+                continue
+            values = [" / ".join(k) if isinstance(k, tuple) else k for k in r[field]]
+            more = f" (+{len(values) - max_keys} more)" if len(values) > max_keys else ""
+            print(f"    {field} ({len(values)}): {', '.join(values[:max_keys])}{more}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old", help="Data directory of the previous scrape")
+    parser.add_argument("new", help="Data directory of the new scrape")
+    parser.add_argument("--max-keys", type=int, default=10, help="Maximum number of row keys printed per file and category")
+    args = parser.parse_args()
+    print_report(diff_scrapes(args.old, args.new), args.max_keys)
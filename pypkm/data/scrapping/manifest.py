@@ -0,0 +1,102 @@
+import os
+import json
+import hashlib
+import datetime
+import pandas as pd
+from typing import Dict, List, Optional
+
+# Get directory of this file (root of the scrapped data)
+DATA_DIR = os.path.dirname(os.path.realpath(__file__))
+
+# Same separator as the spiders
+CSV_SEP = ';'
+
+def manifest_file(data_dir:str = DATA_DIR) -> str:
+    """
+    Manifest of the scrapped csv files (content hashes, row counts and schema)
+    """
+    return os.path.join(data_dir, "manifest.json")
+
+def data_files(data_dir:str = DATA_DIR) -> List[str]:
+    """
+    All csv files of a scrape, as paths relative to `data_dir` (ex: 'stats/stats_gen_all.csv')
+    """
+    files = []
+    for root, _, filenames in os.walk(data_dir):
+        for filename in filenames:
+            if filename.endswith(".csv"):
+                files.append(os.path.relpath(os.path.join(root, filename), data_dir).replace(os.sep, "/"))
+    return sorted(files)
+
+def file_hash(path:str) -> str:
+    """
+    sha256 of the content of the file at `path`
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def combined_hash(hashes:Dict[str, str]) -> str:
+    """
+    Single fingerprint of a set of files given as {relative path: sha256}
+    """
+    h = hashlib.sha256()
+    for relpath in sorted(hashes):
+        h.update(f"{relpath}:{hashes[relpath]}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def file_entry(path:str) -> dict:
+    """
+    Manifest entry of a single csv file
+    """
+    df = pd.read_csv(path, sep=CSV_SEP)
+    return {
+        "sha256": file_hash(path),
+        "rows": len(df),
+        "schema": {c: str(df[c].dtype) for c in df.columns}
+    }
+
+def build_manifest(data_dir:str = DATA_DIR, files:Optional[List[str]] = None) -> dict:
+    """
+    Build the manifest of all (or the given) csv files of the scrape stored in `data_dir`
+    """
+    files = data_files(data_dir) if files is None else files
+    entries = {relpath: file_entry(os.path.join(data_dir, relpath)) for relpath in files}
+    return {
+        "version": combined_hash({relpath: e["sha256"] for relpath, e in entries.items()}),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "files": entries
+    }
+
+def read_manifest(data_dir:str = DATA_DIR) -> Optional[dict]:
+    """
+    Read the manifest of the scrape stored in `data_dir`, None if the scrape has no manifest
+    """
+    if not os.path.isfile(manifest_file(data_dir)):
+        return None
+    with open(manifest_file(data_dir), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_manifest(manifest:dict, data_dir:str = DATA_DIR) -> None:
+    with open(manifest_file(data_dir), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+
+def update_manifest(path:str, data_dir:str = DATA_DIR) -> dict:
+    """
+    Refresh the entry of the csv file `path` in the manifest of `data_dir` (called each time a spider saves a file)
+    """
+    manifest = read_manifest(data_dir) or {"files": {}}
+    relpath = os.path.relpath(path, data_dir).replace(os.sep, "/")
+    manifest["files"][relpath] = file_entry(path)
+    manifest["files"] = dict(sorted(manifest["files"].items()))
+    manifest["version"] = combined_hash({r: e["sha256"] for r, e in manifest["files"].items()})
+    manifest["created"] = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    write_manifest(manifest, data_dir)
+    return manifest
+
+if __name__ == "__main__":
+    # Regenerate the manifest of the current scrape
+    write_manifest(build_manifest())
@@ -5,7 +5,8 @@ import itertools
 from scrapy.crawler import CrawlerRunner
 # Reactor restart
 from crochet import setup, wait_for
-from pypkm.data.scrapping.utils import HTMLTable
+from pypkm.data.scrapping.utils import HTMLTable, FastHTMLTable
+from pypkm.data.scrapping.manifest import update_manifest, build_manifest, write_manifest
 import traceback
 
 # Get directory of this file
@@ -96,11 +97,13 @@ class TableToCsv(scrapy.Spider):
     def closed(self, reason):
         # Save the dataframe as a csv file
         self.df.to_csv(f"{self.root}", sep=';')
+        # Record the new content hash, row count and schema of the file
+        update_manifest(self.root, DATA_DIR)
 
     @staticmethod
     def as_dataframe(table: HTMLTable):
         df = pd.DataFrame()
-        for d in table.as_dicts():
+        for d in table.iter_dicts():
             try:
                 # Append global dataframe with the modified row
                 df = pd.concat([df, pd.DataFrame([d])], ignore_index=True)
@@ -128,7 +131,7 @@ class PokemonStats(TableToCsv):
     @staticmethod
     def as_dataframe(table: HTMLTable):
         df = pd.DataFrame()
-        for d in table.as_dicts():
+        for d in table.iter_dicts():
             try:
                 # Split 'Type' column into subtypes
                 types = d["Type"].split(" ")
@@ -159,7 +162,7 @@ class PokemonStats(TableToCsv):
                 return
             print(f"Scrapping pokemon stats for generation {self.gen}")
             # Get the html table from "https://pokemondb.net/pokedex/all" with id "pokedex"
-            pokedex_table = HTMLTable(response.xpath('//*[@id="pokedex"]'))
+            pokedex_table = FastHTMLTable(response.xpath('//*[@id="pokedex"]'))
             # Transform the html table into a cleaned dataframe
             pokedex_df = PokemonStats.as_dataframe(pokedex_table)
             # Concat global df
@@ -189,7 +192,7 @@ class Moves(TableToCsv):
     @staticmethod
     def as_dataframe(table: HTMLTable):
         df = pd.DataFrame()
-        for d in table.as_dicts():
+        for d in table.iter_dicts():
             try:
                 # Clean int columns where values are '-' or 'infinite' in th file
                 d["Power"] = try_parse(d["Power"], int, None)
@@ -216,7 +219,7 @@ class Moves(TableToCsv):
                 return
             print(f"Scrapping moves for generation {self.gen}")
             # Parse 'moves' html table
-            table = HTMLTable(response.xpath('//*[@id="moves"]'))
+            table = FastHTMLTable(response.xpath('//*[@id="moves"]'))
             # Convert it to a dataframe with appropriate move catagory column
             df = Moves.as_dataframe(table)
             # Rename some cols for conveniency
@@ -293,12 +296,12 @@ class MoveSets(TableToCsv):
 
             # Move learned by leveling up
             if "Moves learnt by level up" in title_tables:
-                by_level = TableToCsv.as_dataframe(HTMLTable(title_tables["Moves learnt by level up"]))[["Move", "Lv."]]
+                by_level = TableToCsv.as_dataframe(FastHTMLTable(title_tables["Moves learnt by level up"]))[["Move", "Lv."]]
             else:
                 by_level = pd.DataFrame(columns=["Move", "Lv."])
             # Move learned from pre-evolutions of the pokemon
             if "Pre-evolution moves" in title_tables:
-                by_preevol = TableToCsv.as_dataframe(HTMLTable(title_tables["Pre-evolution moves"]))
+                by_preevol = TableToCsv.as_dataframe(FastHTMLTable(title_tables["Pre-evolution moves"]))
                 # Set 'PreEvol' col as true if pre-evol moves were found
                 by_preevol.insert(len(by_preevol.columns), "PreEvol", [True for i in range(len(by_preevol))])
                 by_preevol = by_preevol[["Move", "PreEvol"]]
@@ -306,17 +309,17 @@ class MoveSets(TableToCsv):
                 by_preevol = pd.DataFrame(columns=["Move", "PreEvol"])
             # Move learned by HM
             if "Moves learnt by HM" in title_tables:
-                by_hm = TableToCsv.as_dataframe(HTMLTable(title_tables["Moves learnt by HM"]))[["Move", "HM"]]
+                by_hm = TableToCsv.as_dataframe(FastHTMLTable(title_tables["Moves learnt by HM"]))[["Move", "HM"]]
             else:
                 by_hm = pd.DataFrame(columns=["Move", "HM"])
             # Move learned by HM
             if "Moves learnt by TM" in title_tables:
-                by_tm = TableToCsv.as_dataframe(HTMLTable(title_tables["Moves learnt by TM"]))[["Move", "TM"]]
+                by_tm = TableToCsv.as_dataframe(FastHTMLTable(title_tables["Moves learnt by TM"]))[["Move", "TM"]]
             else:
                 by_tm = pd.DataFrame(columns=["Move", "TM"])
             # Move learned from reproduction
             if "Egg moves" in title_tables:
-                by_egg = TableToCsv.as_dataframe(HTMLTable(title_tables["Egg moves"]))
+                by_egg = TableToCsv.as_dataframe(FastHTMLTable(title_tables["Egg moves"]))
                 # Set 'Egg' col as true if egg moves were found
                 by_egg.insert(len(by_egg.columns), "Egg", [True for i in range(len(by_egg))])
                 by_egg = by_egg[["Move", "Egg"]]
@@ -324,7 +327,7 @@ class MoveSets(TableToCsv):
                 by_egg = pd.DataFrame(columns=["Move", "Egg"])
             # Move learned by the tutor
             if "Move Tutor moves" in title_tables:
-                by_tutor = TableToCsv.as_dataframe(HTMLTable(title_tables["Move Tutor moves"]))
+                by_tutor = TableToCsv.as_dataframe(FastHTMLTable(title_tables["Move Tutor moves"]))
                 # Set 'Tutor' col as true if tutor moves were found
                 by_tutor.insert(len(by_tutor.columns), "Tutor", [True for i in range(len(by_tutor))])
                 by_tutor = by_tutor[["Move", "Tutor"]]
@@ -332,7 +335,7 @@ class MoveSets(TableToCsv):
                 by_tutor = pd.DataFrame(columns=["Move", "Tutor"])
             # Technical Records in Pokémon Sword & Shield
             if "Moves learnt by TR" in title_tables:
-                by_tr = TableToCsv.as_dataframe(HTMLTable(title_tables["Moves learnt by TR"]))[["Move", "TR"]]
+                by_tr = TableToCsv.as_dataframe(FastHTMLTable(title_tables["Moves learnt by TR"]))[["Move", "TR"]]
             else:
                 by_tr = pd.DataFrame(columns=["Move", "TR"])
             # Transfer-only moves
@@ -378,7 +381,7 @@ class Items(TableToCsv):
                 return
             print(f"Scrapping items")
             # Parse 'moves' html table
-            table = HTMLTable(response.xpath('//*[@class="data-table block-wide"]'))
+            table = FastHTMLTable(response.xpath('//*[@class="data-table block-wide"]'))
             # Convert it to a dataframe with appropriate move catagory column
             df = TableToCsv.as_dataframe(table)
             # Concat global df
@@ -412,7 +415,7 @@ class TMPAbilities(TableToCsv):
                 return
             print(f"Scrapping abilities")
             # Parse 'abilities' html table
-            table = HTMLTable(response.xpath('//*[@id="abilities"]'))
+            table = FastHTMLTable(response.xpath('//*[@id="abilities"]'))
             # Convert it to a dataframe with appropriate move catagory column
             df = TableToCsv.as_dataframe(table)[["Name", "Gen."]]
             # Rename some cols for conveniency
@@ -445,7 +448,7 @@ class Abilities(TableToCsv):
     @staticmethod
     def as_dataframe(table: HTMLTable, ability):
         df = pd.DataFrame()
-        for d in table.as_dicts():
+        for d in table.iter_dicts():
             try:
 
                 # Clean cols who have '\n` inside for some reason
@@ -495,7 +498,7 @@ class Abilities(TableToCsv):
             if f"Pokémon with {ability}" in title_tables:
                 # Get data from the table after 'Pokémon with <Ability Name>'
                 # Some page do not have this title nor table (ex: https://pokemondb.net/ability/zen-mode)
-                df = Abilities.as_dataframe(HTMLTable(title_tables[f"Pokémon with {ability}"]), ability)
+                df = Abilities.as_dataframe(FastHTMLTable(title_tables[f"Pokémon with {ability}"]), ability)
                 # Rename some cols for conveniency
                 df = df.rename(columns={"Name": "Pokemon", "#" : "PokedexId"})
                 # Concat global df
@@ -647,4 +650,6 @@ if __name__ == "__main__":
     # Will run after spider 1 as
     # MoveSets needs PokemonStats to have written its file
     # Abilities needs Abilities.TMPAbilities to have written its file
-    run_spider2()
\ No newline at end of file
+    run_spider2()
+    # Rebuild the manifest from scratch to drop files that are no longer produced
+    write_manifest(build_manifest(DATA_DIR), DATA_DIR)
\ No newline at end of file
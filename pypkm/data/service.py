@@ -0,0 +1,414 @@
+"""
+Local HTTP/JSON query service over warm PokeData/BattleData instances.
+
+One PokeData (and its derived tables) is kept in memory per generation, so consumers do not
+pay the loading cost in each process. Queries run in a worker pool, the asyncio event loop only parses
+requests and writes responses.
+
+Usage:
+python -m pypkm.data.service --port 8765 --gens 9 --workers 4
+
+Endpoints (all POST bodies and responses are JSON):
+POST /base_stats        {"gen": 9, "pokemon": "Garchomp"}
+POST /pretty_moveset    {"gen": 9, "pokemon": "Garchomp"}
+POST /weak_against      {"gen": 9, "types": ["Fire", "Flying"]}
+POST /resist_against    {"gen": 9, "types": ["Fire", "Flying"]}
+POST /best_against      {"gen": 9, "types": ["Fire", "Flying"]}
+POST /apply_stats       {"gen": 9, "pokemon": "Garchomp", "nature": "Adamant", "level": 50, "IVs": {}, "EVs": {"Attack": 252}}
+POST /matchup           {"gen": 9, "attacker": {"pokemon": "Garchomp", ...}, "defender": {"pokemon": "Tinkaton", ...}}
+POST /batch             {"requests": [{"method": "base_stats", "params": {...}}, ...]}
+GET  /health
+GET  /metrics           Latency histograms in the Prometheus text format
+GET  /latencies         Latency histograms (with p50/p99) as json
+"""
+import json
+import time
+import bisect
+import asyncio
+import argparse
+import threading
+import concurrent.futures
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import pandas as pd
+from pypkm.data import PokeData
+from pypkm.data.scrapping.pokemondatabase import SUPPORTED_GENS
+from pypkm.data.battle_data import BattleData
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float("inf")]
+
+# Maximum size of a request body
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+HTTP_STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+class QueryError(Exception):
+    """
+    Exception raised when a query is invalid (unknown method, missing or bad parameters)
+    """
+
+class LatencyHistogram(object):
+    """
+    Cumulative latency histogram with fixed buckets
+    """
+    def __init__(self, buckets:List[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0 for _ in buckets]
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds:float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q:float) -> float:
+        """
+        Upper bound of the bucket holding the `q` quantile
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulated = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulated += n
+            if cumulated >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": {str(b): n for b, n in zip(self.buckets, self.counts)}
+        }
+
+def _jsonable(obj:Any) -> Any:
+    """
+    Convert query results (DataFrame, Series, numpy scalars) to json serializable objects
+    NaN become null
+    """
+    if isinstance(obj, pd.DataFrame):
+        return json.loads(obj.to_json(orient="records"))
+    if isinstance(obj, pd.Series):
+        return json.loads(obj.to_json())
+    return obj
+
+class QueryService(object):
+    """
+    Query methods over one warm PokeData/BattleData per generation
+    Each method takes the json parameters of the request and returns a json serializable result
+    """
+    def __init__(self, gens:List[int] = [9]) -> None:
+        self._battles: Dict[int, BattleData] = {}
+        self._lock = threading.Lock()
+        self.methods: Dict[str, Callable[[dict], Any]] = {
+            "base_stats": self.base_stats,
+            "pretty_moveset": self.pretty_moveset,
+            "weak_against": self.weak_against,
+            "resist_against": self.resist_against,
+            "best_against": self.best_against,
+            "apply_stats": self.apply_stats,
+            "matchup": self.matchup,
+        }
+        for gen in gens:
+            self.battle(gen)
+
+    def battle(self, gen:int) -> BattleData:
+        """
+        BattleData of generation `gen`, loaded and warmed up on first use
+        """
+        try:
+            gen = int(gen)
+        except (TypeError, ValueError):
+            raise QueryError(f"Invalid generation {gen!r}")
+        if gen not in SUPPORTED_GENS:
+            raise QueryError(f"Unknown generation {gen}, expected one of {SUPPORTED_GENS}")
+        if gen not in self._battles:
+            with self._lock:
+                if gen not in self._battles:
+                    data = PokeData(gen = gen)
+                    # Build derived tables now rather than on the first query
+                    data.defensive_matrix()
+                    self._battles[gen] = BattleData(data)
+        return self._battles[gen]
+
+    def _stats(self, battle:BattleData, params:dict) -> pd.DataFrame:
+        base_stats = battle.data.base_stats(params["pokemon"])
+        if len(base_stats) == 0:
+            raise QueryError(f"Unknown pokemon {params['pokemon']}")
+        return battle.apply_stats(
+            base_stats,
+            nature = params.get("nature", "Hardy"),
+            level = int(params.get("level", 100)),
+            IVs = params.get("IVs", {}),
+            EVs = params.get("EVs", {})
+        )
+
+    def base_stats(self, params:dict) -> Any:
+        return _jsonable(self.battle(params["gen"]).data.base_stats(params["pokemon"]))
+
+    def pretty_moveset(self, params:dict) -> Any:
+        return _jsonable(self.battle(params["gen"]).data.pretty_moveset(params["pokemon"]))
+
+    def weak_against(self, params:dict) -> Any:
+        return _jsonable(self.battle(params["gen"]).data.weak_against(params["types"]).rename_axis("Type Defense").reset_index())
+
+    def resist_against(self, params:dict) -> Any:
+        return _jsonable(self.battle(params["gen"]).data.resist_against(params["types"]).rename_axis("Type Defense").reset_index())
+
+    def best_against(self, params:dict) -> Any:
+        return _jsonable(self.battle(params["gen"]).data.best_against(params["types"]))
+
+    def apply_stats(self, params:dict) -> Any:
+        return _jsonable(self._stats(self.battle(params["gen"]), params))
+
+    def matchup(self, params:dict) -> Any:
+        battle = self.battle(params["gen"])
+        attacker = self._stats(battle, params["attacker"]).iloc[0]
+        defender = self._stats(battle, params["defender"]).iloc[0]
+        return _jsonable(battle.matchup(attacker, defender))
+
+    def call(self, method:str, params:dict) -> Any:
+        if method not in self.methods:
+            raise QueryError(f"Unknown method {method}")
+        if not isinstance(params, dict):
+            raise QueryError("Parameters should be a json object")
+        try:
+            return self.methods[method](params)
+        except KeyError as e:
+            raise QueryError(f"Missing or unknown parameter {e}")
+        except (ValueError, TypeError, IndexError) as e:
+            raise QueryError(str(e))
+
+    def batch(self, requests:List[dict]) -> List[dict]:
+        """
+        Run several queries in a row, errors are reported per query
+        """
+        results = []
+        for r in requests:
+            try:
+                results.append({"result": self.call(r.get("method"), r.get("params", {}))})
+            except QueryError as e:
+                results.append({"error": str(e)})
+        return results
+
+def _label_value(value:str) -> str:
+    """
+    Prometheus label value with its backslashes, double quotes and line feeds escaped
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class QueryServer(object):
+    """
+    Minimal asyncio HTTP/1.1 server exposing a QueryService
+    Queries are run in a thread pool of `workers` threads
+    """
+    def __init__(self, service:QueryService, host:str = "127.0.0.1", port:int = 8765, workers:int = 4) -> None:
+        self.service = service
+        self.host = host
+        self.port = port
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pypkm-query")
+        self.latencies: Dict[str, LatencyHistogram] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Open connections, closed on stop
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Port 0 means any free port
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        # Let the connection handlers see the end of their stream and exit
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections.keys(), return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    def metrics(self) -> str:
+        """
+        Latency histograms in the Prometheus text exposition format
+        """
+        lines = [
+            "# HELP pypkm_service_latency_seconds Latency of the queries by method",
+            "# TYPE pypkm_service_latency_seconds histogram"
+        ]
+        for method, h in self.latencies.items():
+            cumulated = 0
+            for bound, n in zip(h.buckets, h.counts):
+                cumulated += n
+                le = "+Inf" if bound == float("inf") else str(bound)
+                lines.append(f'pypkm_service_latency_seconds_bucket{{method="{_label_value(method)}",le="{le}"}} {cumulated}')
+            lines.append(f'pypkm_service_latency_seconds_sum{{method="{_label_value(method)}"}} {h.sum}')
+            lines.append(f'pypkm_service_latency_seconds_count{{method="{_label_value(method)}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def _latency_label(self, path:str) -> str:
+        """
+        Latency histogram of a request path: its method for queries, "other" for anything else
+        (so that clients cannot create a histogram per distinct URL)
+        """
+        method = path.strip("/")
+        return method if method == "batch" or method in self.service.methods else "other"
+
+    async def _run(self, func:Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _dispatch(self, verb:str, path:str, body:bytes) -> Tuple[int, str, bytes]:
+        if path == "/health":
+            return 200, "application/json", b'{"status": "ok"}'
+        if path == "/metrics":
+            return 200, "text/plain; version=0.0.4", self.metrics().encode("utf-8")
+        if path == "/latencies":
+            return 200, "application/json", json.dumps({m: h.as_dict() for m, h in self.latencies.items()}).encode("utf-8")
+
+        method = path.strip("/")
+        if method != "batch" and method not in self.service.methods:
+            return 404, "application/json", json.dumps({"error": f"Unknown method {method}"}).encode("utf-8")
+        if verb != "POST":
+            return 405, "application/json", json.dumps({"error": "Queries should be POST requests"}).encode("utf-8")
+        try:
+            params = json.loads(body or b"{}")
+            if method == "batch":
+                result = {"results": await self._run(self.service.batch, params["requests"])}
+            else:
+                result = {"result": await self._run(self.service.call, method, params)}
+            return 200, "application/json", json.dumps(result).encode("utf-8")
+        except (QueryError, ValueError, KeyError, TypeError) as e:
+            return 400, "application/json", json.dumps({"error": str(e)}).encode("utf-8")
+        except Exception as e:
+            return 500, "application/json", json.dumps({"error": repr(e)}).encode("utf-8")
+
+    async def _handle_connection(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                verb, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_SIZE:
+                    status, content_type, payload = 413, "application/json", b'{"error": "Request body too large"}'
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length > 0 else b""
+                    start = time.perf_counter()
+                    path = path.split("?")[0]
+                    status, content_type, payload = await self._dispatch(verb, path, body)
+                    self.latencies.setdefault(self._latency_label(path), LatencyHistogram()).observe(time.perf_counter() - start)
+                    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            # Malformed request or client gone
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+class ServiceClient(object):
+    """
+    Asyncio client of a QueryServer, keeping a single keep-alive connection
+
+    client = ServiceClient("127.0.0.1", 8765)
+    stats = await client.call("base_stats", gen = 9, pokemon = "Garchomp")
+    """
+    def __init__(self, host:str = "127.0.0.1", port:int = 8765) -> None:
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def request(self, verb:str, path:str, payload:Optional[dict] = None) -> Tuple[int, bytes]:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        async with self._lock:
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._writer.write(
+                f"{verb} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+            )
+            await self._writer.drain()
+            status = int((await self._reader.readline()).split()[1])
+            headers = {}
+            while True:
+                line = await self._reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            data = await self._reader.readexactly(int(headers.get("content-length", 0)))
+            if headers.get("connection", "").lower() == "close":
+                await self.close()
+            return status, data
+
+    async def call(self, method:str, **params) -> Any:
+        status, data = await self.request("POST", f"/{method}", params)
+        response = json.loads(data)
+        if status != 200:
+            raise QueryError(response["error"])
+        return response["result"]
+
+    async def batch(self, requests:List[Tuple[str, dict]]) -> List[dict]:
+        """
+        Send several (method, params) queries in a single request
+        """
+        status, data = await self.request("POST", "/batch", {"requests": [{"method": m, "params": p} for m, p in requests]})
+        response = json.loads(data)
+        if status != 200:
+            raise QueryError(response["error"])
+        return response["results"]
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._reader = None
+
+async def serve(host:str, port:int, gens:List[int], workers:int) -> None:
+    service = QueryService(gens)
+    server = QueryServer(service, host, port, workers)
+    await server.start()
+    print(f"Serving generations {gens} on http://{server.host}:{server.port}")
+    await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--gens", type=int, nargs="+", default=[9], help="Generations loaded at startup (others are loaded on first query)")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker threads running the queries")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.gens, args.workers))
@@ -0,0 +1,108 @@
+"""
+Read-only data plane for multi-process workers.
+
+Forked workers touching the pandas tables of a PokeData end up with their own copy of them (reference counting
+writes to every object of the object columns, so copy-on-write duplicates the pages).
+Instead, the numeric arrays of PokeData.encoded() can be exported once and attached to zero-copy by each worker,
+so that N workers cost about the memory of one dataset:
+
+- `SharedTables` puts them in `multiprocessing.shared_memory` blocks, for the worker processes of a pool
+- `export_npy` writes them as .npy files that any process can memory-map with `load_npy`
+
+    with SharedTables(data.encoded()) as shared:
+        pool = multiprocessing.Pool(4, initializer=init, initargs=(shared.handle,))
+        ...
+    def init(handle):
+        global enc
+        enc = attach(handle)
+
+Attached arrays are read-only.
+"""
+import os
+import json
+import numpy as np
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional
+from pypkm.data.encoded import EncodedTables, ARRAYS
+
+NAMES_FILE = "names.json"
+
+def export_npy(enc:EncodedTables, directory:str) -> List[str]:
+    """
+    Write the arrays of `enc` in `directory` as .npy files (and the names as json), return the written files
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for key, array in enc.arrays().items():
+        files.append(os.path.join(directory, f"{key}.npy"))
+        np.save(files[-1], np.ascontiguousarray(array))
+    files.append(os.path.join(directory, NAMES_FILE))
+    with open(files[-1], "w", encoding="utf-8") as f:
+        json.dump(enc.names(), f, ensure_ascii=False)
+    return files
+
+def load_npy(directory:str, mmap_mode:Optional[str] = "r") -> EncodedTables:
+    """
+    Tables exported with `export_npy`, memory-mapped read-only by default
+    (pages are then shared by all the processes loading the same directory)
+    """
+    arrays = {key: np.load(os.path.join(directory, f"{key}.npy"), mmap_mode=mmap_mode) for key in ARRAYS}
+    with open(os.path.join(directory, NAMES_FILE), "r", encoding="utf-8") as f:
+        names = json.load(f)
+    return EncodedTables.from_arrays(arrays, names)
+
+class SharedTables(object):
+    """
+    Owner of shared memory copies of the arrays of an EncodedTables.
+    `handle` is a small picklable description of the blocks, to give to `attach` in the workers.
+    The blocks are freed by `close()` (or at the end of the `with` block), after the workers are done.
+    """
+    def __init__(self, enc:EncodedTables) -> None:
+        self._blocks: List[SharedMemory] = []
+        arrays = {}
+        for key, array in enc.arrays().items():
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            self._blocks.append(block)
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[...] = array
+            arrays[key] = {"name": block.name, "shape": array.shape, "dtype": array.dtype.str}
+        self.handle: dict = {"arrays": arrays, "names": enc.names()}
+
+    def close(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> "SharedTables":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def attach(handle:dict) -> EncodedTables:
+    """
+    Tables backed by the shared memory blocks of `handle` (see `SharedTables.handle`), without copy.
+    Meant for processes started by the owner of the blocks: they share its resource tracker,
+    so the blocks are only unlinked by the owner.
+    """
+    arrays = {}
+    blocks: Dict[str, SharedMemory] = {}
+    for key, spec in handle["arrays"].items():
+        blocks[key] = SharedMemory(name=spec["name"])
+        arrays[key] = np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=blocks[key].buf)
+        arrays[key].flags.writeable = False
+    enc = EncodedTables.from_arrays(arrays, handle["names"])
+    # Keep the blocks mapped as long as the tables are alive
+    enc._shared_blocks = blocks
+    return enc
+
+if __name__ == "__main__":
+    import argparse
+    from pypkm.data import PokeData
+    parser = argparse.ArgumentParser(description="Export the encoded tables of a generation as .npy files")
+    parser.add_argument("directory")
+    parser.add_argument("--gen", type=int, default=9)
+    args = parser.parse_args()
+    for file in export_npy(PokeData(gen = args.gen).encoded(), args.directory):
+        print(file)
@@ -0,0 +1,113 @@
+"""
+Nearest-neighbour search over pokemon profiles, for replacement suggestions ("pokemons most similar to X").
+
+Each pokemon of the roster (stats_gen_all) has three feature blocks:
+- `stats`: base stat distribution (base stats divided by their total)
+- `types`: its row of the defensive matrix (type factor of each attack type)
+- `moves`: bitset of the moves it can learn in the generation of the PokeData
+Blocks are L2-normalized and weighted, and their norms precomputed, so that a query is one matrix-vector product:
+- "cosine": cosine similarity of the concatenated weighted blocks
+- "jaccard": Jaccard similarity of the move bitsets
+
+    index = SimilarityIndex(PokeData(gen = 9))
+    index.most_similar("Garchomp", k=5, types=["Dragon"])
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Sequence, Union
+from pypkm.data.schema import TYPES
+
+class SimilarityIndex(object):
+    BLOCKS = ["stats", "types", "moves"]
+
+    def __init__(self, data, weights:Optional[Dict[str, float]] = None) -> None:
+        self.data = data
+        self.enc = data.encoded()
+        enc = self.enc
+        n = len(enc.pokemon_names)
+        self.weights = {block: 1.0 for block in SimilarityIndex.BLOCKS}
+        self.weights.update(weights or {})
+
+        stats = enc.stats.astype(np.float32)
+        self.blocks: Dict[str, np.ndarray] = {
+            "stats": stats / np.maximum(stats.sum(axis=1, keepdims=True), 1),
+            "types": enc.defensive.astype(np.float32),
+        }
+        # Move bitset of the generation (a move learnt several ways is counted once)
+        moves = np.zeros((n, len(enc.move_names)), dtype=np.float32)
+        owners = np.repeat(np.arange(n), np.diff(enc.moveset_indptr))
+        moves[owners, enc.moveset_indices] = 1.0
+        self.blocks["moves"] = moves
+        self.move_counts: np.ndarray = moves.sum(axis=1)
+
+        # Concatenation of the unit-norm blocks, scaled by the square root of their weight
+        # so that the dot product of two rows is the weighted sum of the cosine similarities of their blocks
+        parts = []
+        for block in SimilarityIndex.BLOCKS:
+            b = self.blocks[block]
+            norms = np.linalg.norm(b, axis=1, keepdims=True)
+            parts.append(np.sqrt(self.weights[block]) * np.divide(b, norms, out=np.zeros_like(b), where=norms > 0))
+        self.features: np.ndarray = np.hstack(parts)
+        self.norms: np.ndarray = np.linalg.norm(self.features, axis=1)
+
+    def similarities(self, pokemon:Union[int, str], metric:str = "cosine") -> np.ndarray:
+        """
+        Similarity of `pokemon` with every pokemon of the roster (in the order of EncodedTables.pokemon_names)
+        """
+        p = self.enc.pokemon_id(pokemon)
+        if metric == "cosine":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                similarity = (self.features @ self.features[p]) / (self.norms * self.norms[p])
+        elif metric == "jaccard":
+            moves = self.blocks["moves"]
+            common = moves @ moves[p]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                similarity = common / (self.move_counts + self.move_counts[p] - common)
+        else:
+            raise ValueError(f"Unknown metric {metric}, expected 'cosine' or 'jaccard'")
+        return np.nan_to_num(similarity, nan=0.0)
+
+    def mask(
+        self, types:Optional[Sequence[str]] = None, with_moves:bool = True, exclude:Optional[Sequence[str]] = None,
+        min_total:Optional[int] = None, max_total:Optional[int] = None
+    ) -> np.ndarray:
+        """
+        Pokemons of the roster kept by the filters:
+        having one of `types`, having a moveset in this generation, not in `exclude`, base stat total within bounds
+        """
+        enc = self.enc
+        keep = np.ones(len(enc.pokemon_names), dtype=bool)
+        if types is not None:
+            ids = [TYPES.index(t) for t in types]
+            keep &= np.isin(enc.type1, ids) | np.isin(enc.type2, ids)
+        if with_moves:
+            keep &= self.move_counts > 0
+        if exclude is not None:
+            keep[[enc.pokemon_id(e) for e in exclude]] = False
+        total = enc.stats.sum(axis=1)
+        if min_total is not None:
+            keep &= total >= min_total
+        if max_total is not None:
+            keep &= total <= max_total
+        return keep
+
+    def most_similar(
+        self, pokemon:Union[int, str], k:int = 10, metric:str = "cosine", mask:Optional[np.ndarray] = None, **filters
+    ) -> pd.DataFrame:
+        """
+        The `k` pokemons most similar to `pokemon` (itself excluded) among those kept by `mask` or by the filters of `mask()`
+        """
+        p = self.enc.pokemon_id(pokemon)
+        similarity = self.similarities(p, metric)
+        keep = self.mask(**filters) if mask is None else mask.copy()
+        keep[p] = False
+        candidates = np.flatnonzero(keep)
+        k = min(k, len(candidates))
+        top = candidates[np.argpartition(-similarity[candidates], k - 1)[:k]] if k > 0 else candidates[:0]
+        top = top[np.argsort(-similarity[top], kind="stable")]
+        return pd.DataFrame({
+            "Name": self.enc.pokemon_names[top],
+            "Type1": [TYPES[t] for t in self.enc.type1[top]],
+            "Type2": [TYPES[t] if t >= 0 else None for t in self.enc.type2[top]],
+            "Similarity": similarity[top]
+        })
@@ -0,0 +1,153 @@
+"""
+Team analysis against a list of threats, updated incrementally when the team is edited.
+
+For each member, the batched engine computes vectors over the threats once:
+- `offense`: one-sided score of the member attacking each threat
+- `defense`: one-sided score of each threat attacking the member
+- `score`: BattleData.matchup_score(member, threat)
+The team aggregates (sums over members and number of members winning each matchup) are kept up to date
+by removing the old contribution of an edited member and adding the new one: an edit costs O(threats)
+instead of re-scoring the whole team.
+
+    analysis = TeamAnalysis(BattleData(PokeData(gen = 9)), threats=[{"pokemon": n} for n in top_threats])
+    analysis.add({"pokemon": "Garchomp", "nature": "Jolly", "EVs": {"Attack": 252, "Speed": 252}})
+    analysis.update(0, nature="Adamant")
+    analysis.coverage()
+"""
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+from pypkm.data.battle_data import BattleData
+from pypkm.data.batch import BatchBattle
+
+class TeamAnalysis(object):
+    def __init__(
+        self, battle:BattleData, threats:List[dict], team:Optional[List[dict]] = None,
+        atk_bias:float = 0.25, def_bias:float = 0.75
+    ) -> None:
+        self.battle = battle
+        self.engine = BatchBattle(battle.data)
+        self.atk_bias = atk_bias
+        self.def_bias = def_bias
+        self.threats: List[dict] = list(threats)
+        self._threats = self.engine.encode_sets(self.threats)
+        self._threat_stats = self.engine.stats(self._threats)
+        n = len(self.threats)
+        # Members and their vectors over the threats, in the same order
+        self.members: List[dict] = []
+        self.offense: List[np.ndarray] = []
+        self.defense: List[np.ndarray] = []
+        self.score: List[np.ndarray] = []
+        # Team aggregates over the threats (NaN scores count as 0)
+        self.offense_total = np.zeros(n)
+        self.defense_total = np.zeros(n)
+        self.score_total = np.zeros(n)
+        self.wins = np.zeros(n, dtype=np.int64)
+        for member in team or []:
+            self.add(member)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def _vectors(self, member:dict) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Scores of one member against every threat, O(threats)
+        n = len(self.threats)
+        sets = self.engine.encode_sets([member])
+        stats = self.engine.stats(sets)
+        ids = np.repeat(sets.ids, n)
+        rows = np.repeat(sets.rows, n)
+        stats = np.repeat(stats, n, axis=0)
+        levels = np.repeat(sets.levels, n)
+        t = self._threats
+        offense = self.engine.scores(ids, stats, levels, t.ids, self._threat_stats, rows, t.rows)
+        defense = self.engine.scores(t.ids, self._threat_stats, t.levels, ids, stats, t.rows, rows)
+        score = self.def_bias * offense + self.atk_bias * defense
+        return offense, defense, score
+
+    def _wins(self, offense:np.ndarray, defense:np.ndarray) -> np.ndarray:
+        # The member wins a matchup if it scores better against the threat than the threat against it
+        return np.nan_to_num(self.def_bias * offense + self.atk_bias * defense) > np.nan_to_num(self.def_bias * defense + self.atk_bias * offense)
+
+    def _apply(self, i:int, sign:int) -> None:
+        self.offense_total += sign * np.nan_to_num(self.offense[i])
+        self.defense_total += sign * np.nan_to_num(self.defense[i])
+        self.score_total += sign * np.nan_to_num(self.score[i])
+        self.wins += sign * self._wins(self.offense[i], self.defense[i])
+
+    def add(self, member:dict) -> int:
+        """
+        Add a member (a set as in BatchBattle.encode_sets), return its position
+        """
+        offense, defense, score = self._vectors(member)
+        self.members.append(dict(member))
+        self.offense.append(offense)
+        self.defense.append(defense)
+        self.score.append(score)
+        self._apply(len(self.members) - 1, +1)
+        return len(self.members) - 1
+
+    def remove(self, i:int) -> dict:
+        """
+        Remove the member at position `i`, return its set
+        """
+        self._apply(i, -1)
+        self.offense.pop(i)
+        self.defense.pop(i)
+        self.score.pop(i)
+        return self.members.pop(i)
+
+    def replace(self, i:int, member:dict) -> None:
+        """
+        Swap the member at position `i` for another set
+        """
+        offense, defense, score = self._vectors(member)
+        self._apply(i, -1)
+        self.members[i] = dict(member)
+        self.offense[i], self.defense[i], self.score[i] = offense, defense, score
+        self._apply(i, +1)
+
+    def update(self, i:int, **changes) -> None:
+        """
+        Change some fields of the set of the member at position `i`, ex: update(0, nature="Adamant", EVs={"Attack": 252})
+        """
+        member = dict(self.members[i])
+        member.update(changes)
+        self.replace(i, member)
+
+    def best_members(self) -> np.ndarray:
+        """
+        Position of the member with the best matchup score against each threat (-1 if the team is empty)
+        """
+        if len(self.members) == 0:
+            return np.full(len(self.threats), -1)
+        return np.nanargmax(np.nan_to_num(np.vstack(self.score), nan=-np.inf), axis=0)
+
+    def coverage(self) -> pd.DataFrame:
+        """
+        One row per threat: team totals, number of members winning the matchup and the best member against it
+        """
+        best = self.best_members()
+        return pd.DataFrame({
+            "Threat": [t["pokemon"] for t in self.threats],
+            "Offense": self.offense_total,
+            "Defense": self.defense_total,
+            "Score": self.score_total,
+            "Wins": self.wins,
+            "Best": [self.members[b]["pokemon"] if b >= 0 else None for b in best]
+        })
+
+    def uncovered(self) -> List[str]:
+        """
+        Threats no member of the team wins against
+        """
+        return [t["pokemon"] for t, w in zip(self.threats, self.wins) if w == 0]
+
+    def members_summary(self) -> pd.DataFrame:
+        """
+        One row per member: mean matchup score and number of matchups won over the threats
+        """
+        return pd.DataFrame({
+            "Pokemon": [m["pokemon"] for m in self.members],
+            "Score": [np.nanmean(s) if np.isfinite(s).any() else np.nan for s in self.score],
+            "Wins": [int(self._wins(o, d).sum()) for o, d in zip(self.offense, self.defense)]
+        })
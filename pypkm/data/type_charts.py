@@ -0,0 +1,89 @@
+"""
+Type charts of each era of the games, stacked in one (era, defense type, attack type) tensor.
+
+Only the chart of generation 6 onwards is scrapped (types_matrix_gen6plus.csv),
+the older ones are derived from it with the changes between eras:
+- generations 2 to 5: no Fairy type, Steel resists Ghost and Dark
+- generation 1: no Dark nor Steel type either, Bug and Poison are super effective on each other,
+  Ghost has no effect on Psychic and Fire does not resist Ice
+Types that do not exist in an era are neutral (factor 1) in its chart.
+
+PokeData(gen) uses the chart of the era of `gen`. Batched analyses over several eras index the tensor
+instead of loading one PokeData per generation (see `defensive_by_era` and BatchBattle.era_scores).
+Only type effectiveness changes between eras: stats, movesets and move categories are those of the loaded generation.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple, Union
+from pypkm.data.schema import TYPES
+
+ERAS = ["gen1", "gen2-5", "gen6+"]
+GEN1, GEN2_5, GEN6_PLUS = range(len(ERAS))
+
+# Types that do not exist in each era
+MISSING_TYPES: Dict[int, Tuple[str, ...]] = {
+    GEN1: ("Dark", "Steel", "Fairy"),
+    GEN2_5: ("Fairy",),
+    GEN6_PLUS: ()
+}
+# (attack type, defense type) -> factor that differs from the next era
+CHART_CHANGES: Dict[int, Dict[Tuple[str, str], float]] = {
+    GEN1: {
+        ("Bug", "Poison"): 2.0,
+        ("Poison", "Bug"): 2.0,
+        ("Ghost", "Psychic"): 0.0,
+        ("Ice", "Fire"): 1.0
+    },
+    GEN2_5: {
+        ("Ghost", "Steel"): 0.5,
+        ("Dark", "Steel"): 0.5
+    }
+}
+
+def era_of(gen:Union[int, str]) -> int:
+    """
+    Era (index in ERAS) of a generation, the latest one for "all" or unknown generations
+    """
+    try:
+        gen = int(gen)
+    except (TypeError, ValueError):
+        return GEN6_PLUS
+    if gen <= 1:
+        return GEN1
+    if gen <= 5:
+        return GEN2_5
+    return GEN6_PLUS
+
+def type_chart_tensor(types_matrix:pd.DataFrame) -> np.ndarray:
+    """
+    (era, defense type, attack type) type factors, types in the order of TYPES,
+    from the gen 6+ types matrix (one row per attack type, one column per defense type)
+    """
+    latest = types_matrix.set_index("Attack Type").loc[TYPES, TYPES].to_numpy(dtype=np.float64).T
+    charts = np.empty((len(ERAS),) + latest.shape)
+    charts[GEN6_PLUS] = latest
+    for era in [GEN2_5, GEN1]:
+        chart = charts[era + 1].copy()
+        for (atk, dfn), factor in CHART_CHANGES[era].items():
+            chart[TYPES.index(dfn), TYPES.index(atk)] = factor
+        for t in MISSING_TYPES[era]:
+            chart[TYPES.index(t), :] = 1.0
+            chart[:, TYPES.index(t)] = 1.0
+        charts[era] = chart
+    return charts
+
+def types_matrix(charts:np.ndarray, era:int) -> pd.DataFrame:
+    """
+    Types matrix of an era in the layout of types_matrix_gen6plus.csv (PokeData.types_matix)
+    """
+    df = pd.DataFrame(charts[era].T, columns=TYPES)
+    df.insert(0, "Attack Type", TYPES)
+    return df
+
+def defensive_by_era(charts:np.ndarray, type1:np.ndarray, type2:np.ndarray) -> np.ndarray:
+    """
+    (era, n, n_types) type factor of each attack type against pokemons of type ids `type1`/`type2` (negative if monotype),
+    in every era at once
+    """
+    second = np.where((type2 < 0)[None, :, None], 1.0, charts[:, type2])
+    return charts[:, type1] * second
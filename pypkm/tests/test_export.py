@@ -0,0 +1,25 @@
+import pytest
+import numpy as np
+from pypkm.data import PokeData
+from pypkm.data.export import FORMATS, write_batches, read_table, speed_tiers_batches, learnability_batches
+
+pa = pytest.importorskip("pyarrow")
+
+@pytest.mark.parametrize("format", list(FORMATS))
+def test_round_trip(tmp_path, format):
+    data = PokeData(gen = 9)
+    expected = pa.Table.from_batches(list(learnability_batches(data, chunk_size = 1000)))
+    files = write_batches(learnability_batches(data, chunk_size = 1000), str(tmp_path), format, rows_per_file = 1000)
+    assert len(files) > 1
+    assert read_table(str(tmp_path)).equals(expected)
+
+@pytest.mark.parametrize("format", list(FORMATS))
+def test_export_replaces_previous_parts(tmp_path, format):
+    data = PokeData(gen = 9)
+    # A first export split in more parts than the second one
+    write_batches(learnability_batches(data, chunk_size = 1000), str(tmp_path), format, rows_per_file = 1000)
+    files = write_batches(speed_tiers_batches(data, levels = (50,)), str(tmp_path), format)
+    assert len(files) == 1
+    table = read_table(str(tmp_path))
+    assert table.num_rows == len(data.encoded().pokemon_names)
+    assert np.all(table.column("Level").to_numpy() == 50)
@@ -23,11 +23,15 @@ setuptools.setup(
     packages = ["pypkm", "pypkm.data"],
     package_data={
     # Install all csv scrapped data
-        "data": ["scrapping/*/*.csv"]
+        "data": ["scrapping/*/*.csv", "scrapping/manifest.json"]
     },
     test_suite="pypkm.tests",
     python_requires=">=3.0",
     install_requires=[
        "pandas"
    ],
+    extras_require={
+        # Arrow IPC / Parquet export of derived results (pypkm.data.export)
+        "arrow": ["pyarrow"]
+    },
 )